@@ -0,0 +1,169 @@
+"""
+Incremental normalisation of esimdb plan payloads.
+
+Each scraper normalises raw API plans into CSV rows. `ingest` remembers, per
+output (scraped_data/ingest/<name>.state.pkl), the content hash of every raw
+plan (by `_id`) and the frame of rows it produced. On the next scrape:
+
+- an unchanged payload (same SHA-256 from http_cache) reuses every row as-is
+- otherwise only added or changed plans are normalised again, in one batch;
+  rows for unchanged plans are reused and plans missing from the payload are
+  dropped
+- a different normalisation context (provider names, row layout) rebuilds
+  every row
+
+`IngestResult.dirty` is False when nothing changed. If `outputs_current` also
+confirms the output files are the ones recorded by `record_outputs` (another
+scraper may write the same CSV), callers can leave them, and the caches keyed
+on them, untouched.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+import pandas as pd
+
+STATE_DIR = os.path.join("scraped_data", "ingest")
+
+
+@dataclass
+class IngestResult:
+    frame: pd.DataFrame
+    added: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    def summary(self) -> str:
+        return (
+            f"Delta: {len(self.added)} added, {len(self.changed)} changed, "
+            f"{len(self.removed)} removed, {self.unchanged} unchanged"
+        )
+
+
+def plan_hash(plan: dict) -> str:
+    return hashlib.sha1(json.dumps(plan, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")).hexdigest()
+
+
+def context_key(*parts: Any) -> str:
+    """Hash of everything besides the raw plan that a normalised row depends on."""
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _state_path(name: str) -> str:
+    return os.path.join(STATE_DIR, f"{name}.state.pkl")
+
+
+def _load_state(name: str) -> dict:
+    try:
+        with open(_state_path(name), "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        return {}
+
+
+def _save_state(name: str, state: dict) -> None:
+    os.makedirs(STATE_DIR, exist_ok=True)
+    path = _state_path(name)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def ingest(
+    name: str,
+    raw_plans: list[dict],
+    normalize: Callable[[list[dict]], pd.DataFrame],
+    context: str,
+    payload_sha: Optional[str] = None,
+) -> IngestResult:
+    """Normalise `raw_plans`, reusing the previous row for every plan whose raw content is unchanged.
+
+    `normalize(plans)` returns a frame with one row per plan, in order; it is
+    called once with every plan that needs normalising. Rows come back in
+    payload order.
+    """
+    state = _load_state(name)
+    same_context = state.get("context") == context
+
+    if (
+        same_context and payload_sha and state.get("payload_sha") == payload_sha
+        and not state.get("anonymous") and state.get("frame") is not None
+    ):
+        frame = state["frame"].loc[state["order"]].reset_index(drop=True)
+        return IngestResult(frame, unchanged=len(state["hashes"]))
+
+    previous = state.get("hashes", {})
+    prior = state.get("frame") if same_context else None
+    hashes: dict[str, str] = {}
+    order: list[str] = []
+    reused: list[str] = []
+    pending_keys: list[str] = []
+    pending: list[dict] = []
+    result = IngestResult(frame=pd.DataFrame())
+    anonymous = 0
+
+    for i, plan in enumerate(raw_plans):
+        plan_id = plan.get("_id")
+        if not plan_id:
+            anonymous += 1
+            plan_id = f"\0{i}"  # no stable key: normalised on every scrape
+            pending_keys.append(plan_id)
+            pending.append(plan)
+        elif plan_id not in hashes:  # a duplicate in this payload reuses the first row
+            digest = plan_hash(plan)
+            hashes[plan_id] = digest
+            if prior is not None and previous.get(plan_id) == digest:
+                reused.append(plan_id)
+                result.unchanged += 1
+            else:
+                pending_keys.append(plan_id)
+                pending.append(plan)
+                (result.changed if plan_id in previous else result.added).append(plan_id)
+        order.append(plan_id)
+
+    parts = [prior.loc[reused]] if reused else []
+    if pending:
+        fresh = normalize(pending)
+        fresh.index = pd.Index(pending_keys)
+        parts.append(fresh)
+    frame = pd.concat(parts) if parts else pd.DataFrame()
+    if order:
+        result.frame = frame.loc[order].reset_index(drop=True)
+
+    result.removed = [plan_id for plan_id in previous if plan_id not in hashes]
+    stored = frame.drop(index=[key for key in pending_keys if key not in hashes]) if anonymous else frame
+    _save_state(
+        name,
+        {
+            "context": context, "payload_sha": payload_sha, "hashes": hashes, "frame": stored, "order": order,
+            "anonymous": anonymous, "outputs": {} if result.dirty else state.get("outputs", {}),
+        },
+    )
+    return result
+
+
+def record_outputs(name: str, paths: list[str]) -> None:
+    """Remember the output files written from the current state."""
+    state = _load_state(name)
+    if state:
+        state["outputs"] = {path: os.path.getmtime(path) for path in paths if os.path.exists(path)}
+        _save_state(name, state)
+
+
+def outputs_current(name: str, paths: list[str]) -> bool:
+    """True when every path still is the file recorded by `record_outputs`."""
+    recorded = _load_state(name).get("outputs", {})
+    return all(os.path.exists(path) and recorded.get(path) == os.path.getmtime(path) for path in paths)
@@ -2,16 +2,17 @@
 Dump full API response to CSV for review.
 This extracts ALL fields from the ESIMDB API without filtering.
 """
-import requests
 import pandas as pd
 import json
 
+import http_client
+
 def main():
     url = "https://esimdb.com/api/client/regions/europe/data-plans?locale=en"
     headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
 
     print("Fetching Europe plans from API...")
-    resp = requests.get(url, headers=headers, timeout=60)
+    resp = http_client.get(url, headers=headers)
     resp.raise_for_status()
     data = resp.json()
 
@@ -3,7 +3,8 @@ from bs4 import BeautifulSoup
 import asyncio
 import json
 import os
-import requests
+
+import http_client
 
 async def scrape_esimdb_playwright(url):
     async with async_playwright() as p:
@@ -65,7 +66,7 @@ async def main():
     country_url = 'https://esimdb.com/usa'
     print(f"Fetching provider list from {country_url}...")
     headers = {'User-Agent': 'Mozilla/5.0'}
-    resp = requests.get(country_url, headers=headers, timeout=60)
+    resp = http_client.get(country_url, headers=headers)
     soup = BeautifulSoup(resp.text, 'html.parser')
     provider_urls = set()
     for a in soup.find_all('a', href=True):
@@ -1,92 +1,145 @@
-import requests
+import argparse
+import concurrent.futures
 import json
 import os
+import threading
 from bs4 import BeautifulSoup
 
+import http_client
+
+MAX_WORKERS = 8
+# Keys that mark a list of dicts in pageProps as plans (reviews, FAQs etc. have none of them)
+PLAN_KEYS = {'price', 'usdPrice', 'cost', 'capacity', 'data', 'dataAmount', 'validity', 'period', 'pricePerGb'}
+
 # Realistic User-Agent header
 def get_user_agent():
     return {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
 
-# Extract provider slugs from main page links
-def get_provider_slugs(country_url='https://esimdb.com/usa'):
-    resp = requests.get(country_url, headers=get_user_agent(), timeout=60)
+# One fetch of the country page yields both the provider slugs and the Next.js buildId
+def fetch_country_page(country_url='https://esimdb.com/usa'):
+    """Return (provider slugs, buildId) from a single GET of the country page."""
+    resp = http_client.get(country_url, headers=get_user_agent())
     resp.raise_for_status()
     soup = BeautifulSoup(resp.text, 'html.parser')
+    country_path = '/' + country_url.rstrip('/').split('/')[-1] + '/'
     slugs = set()
     for a in soup.find_all('a', href=True):
         href = a['href']
-        if href.startswith('/usa/') and href.count('/') == 2:
+        if href.startswith(country_path) and href.count('/') == 2:
             slugs.add(href.rstrip('/').split('/')[-1])
-    return sorted(slugs)
+    script = soup.find('script', id='__NEXT_DATA__')
+    if not script or not script.string:
+        raise RuntimeError('Could not find __NEXT_DATA__ script on main page')
+    build_id = json.loads(script.string).get('buildId')
+    if not build_id:
+        raise RuntimeError('Could not extract buildId from __NEXT_DATA__')
+    return sorted(slugs), build_id
+
+def get_provider_slugs(country_url='https://esimdb.com/usa'):
+    return fetch_country_page(country_url)[0]
+
+def get_build_id(country_url='https://esimdb.com/usa'):
+    """Parse __NEXT_DATA__ JSON from main page to retrieve buildId."""
+    return fetch_country_page(country_url)[1]
 
-# Recursive search for plan arrays in JSON
-def find_plan_list(obj):
+# Recursive search for every plan-like array in JSON
+def find_plan_lists(obj):
+    """Yield each list of dicts in `obj` whose items carry plan fields (see PLAN_KEYS)."""
     if isinstance(obj, list):
-        if obj and isinstance(obj[0], dict):
-            return obj
+        if obj and all(isinstance(item, dict) for item in obj) and any(PLAN_KEYS & item.keys() for item in obj):
+            yield obj
+            return
         for item in obj:
-            res = find_plan_list(item)
-            if res:
-                return res
+            yield from find_plan_lists(item)
     elif isinstance(obj, dict):
         for val in obj.values():
-            res = find_plan_list(val)
-            if res:
-                return res
-    return []
+            yield from find_plan_lists(val)
 
-# Extract Next.js buildId via parsing __NEXT_DATA__ script
-def get_build_id(country_url='https://esimdb.com/usa'):
-    """Parse __NEXT_DATA__ JSON from main page to retrieve buildId."""
-    resp = requests.get(country_url, headers=get_user_agent(), timeout=60)
-    resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, 'html.parser')
-    script = soup.find('script', id='__NEXT_DATA__')
-    if not script or not script.string:
-        raise RuntimeError('Could not find __NEXT_DATA__ script on main page')
-    data = json.loads(script.string)
-    build_id = data.get('buildId')
-    if not build_id:
-        raise RuntimeError('Could not extract buildId from __NEXT_DATA__')
-    return build_id
+class BuildId:
+    """The current buildId, refreshed from the country page when Next.js rotates it."""
+
+    def __init__(self, country_url, build_id):
+        self.country_url = country_url
+        self.value = build_id
+        self.refreshes = 0
+        self._lock = threading.Lock()
+
+    def refresh(self, stale):
+        """New buildId after `stale` stopped working, or None when the page still serves `stale`."""
+        with self._lock:
+            if self.value != stale:  # another worker already refreshed it
+                return self.value
+            _, build_id = fetch_country_page(self.country_url)
+            if build_id == stale:
+                return None
+            print(f'buildId rotated: {stale} -> {build_id}')
+            self.value = build_id
+            self.refreshes += 1
+            return build_id
 
 # Fetch plan data via Next.js JSON API endpoint
-def fetch_provider_plans(build_id, slug):
-    data_url = f'https://esimdb.com/_next/data/{build_id}/usa/{slug}.json'
-    resp = requests.get(data_url, headers=get_user_agent(), timeout=60)
-    resp.raise_for_status()
-    data = resp.json()
+def fetch_provider_plans(build_id, slug, country='usa'):
+    """Plans for one provider; `build_id` may be a BuildId, which is refreshed on rotation."""
+    current = build_id.value if isinstance(build_id, BuildId) else build_id
+    while True:
+        data_url = f'https://esimdb.com/_next/data/{current}/{country}/{slug}.json'
+        resp = http_client.get(data_url, headers=get_user_agent())
+        # A stale buildId gets a 404 (or the HTML page) instead of JSON
+        stale = resp.status_code == 404 or 'json' not in resp.headers.get('Content-Type', '')
+        if stale and isinstance(build_id, BuildId):
+            fresh = build_id.refresh(current)
+            if fresh is not None:
+                current = fresh
+                continue
+        resp.raise_for_status()
+        data = resp.json()
+        break
     # pageProps may live under data['pageProps'] or data['props']['pageProps']
     page_props = data.get('props', {}).get('pageProps') or data.get('pageProps', {})
-    plans_raw = find_plan_list(page_props)
     plans = []
-    for p in plans_raw:
-        plans.append({
-            'provider': slug,
-            'plan_name': p.get('title') or p.get('name') or '',
-            'capacity': p.get('data') or p.get('dataAmount') or '',
-            'period': p.get('validity') or p.get('period') or '',
-            'price_per_gb': p.get('pricePerGb') or '',
-            'price': p.get('price') or p.get('cost') or ''
-        })
+    seen = set()
+    for plans_raw in find_plan_lists(page_props):
+        for p in plans_raw:
+            key = p.get('_id') or json.dumps(p, sort_keys=True, default=str)
+            if key in seen:
+                continue
+            seen.add(key)
+            plans.append({
+                'provider': slug,
+                'plan_name': p.get('title') or p.get('name') or '',
+                'capacity': p.get('data') or p.get('dataAmount') or p.get('capacity') or '',
+                'period': p.get('validity') or p.get('period') or '',
+                'price_per_gb': p.get('pricePerGb') or '',
+                'price': p.get('price') or p.get('cost') or p.get('usdPrice') or ''
+            })
     return plans
 
 # Main script
-def main():
-    country_url = 'https://esimdb.com/usa'
-    slugs = get_provider_slugs(country_url)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Scrape provider plans from esimdb Next.js data routes')
+    parser.add_argument('--country', default='usa', help='Country slug (default: usa)')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help=f'Provider pages fetched at once (default: {MAX_WORKERS})')
+    args = parser.parse_args(argv)
+
+    country_url = f'https://esimdb.com/{args.country}'
+    slugs, build_id = fetch_country_page(country_url)
     print(f'Found {len(slugs)} providers')
-    build_id = get_build_id(country_url)
     print(f'Using buildId={build_id}')
-    all_plans = []
-    for slug in slugs:
-        print(f'Fetching {slug}...')
-        try:
-            plans = fetch_provider_plans(build_id, slug)
-            print(f'  -> {len(plans)} plans')
-            all_plans.extend(plans)
-        except Exception as e:
-            print(f'Error fetching {slug}: {e}')
+    build = BuildId(country_url, build_id)
+    plans_by_slug = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {executor.submit(fetch_provider_plans, build, slug, args.country): slug for slug in slugs}
+        for fut in concurrent.futures.as_completed(futures):
+            slug = futures[fut]
+            try:
+                plans_by_slug[slug] = fut.result()
+                print(f'{slug}: {len(plans_by_slug[slug])} plans')
+            except Exception as e:
+                print(f'Error fetching {slug}: {e}')
+    # Keep the output in slug order regardless of completion order
+    all_plans = [p for slug in slugs for p in plans_by_slug.get(slug, [])]
+    if build.refreshes:
+        print(f'buildId refreshed {build.refreshes} time(s) during the run')
     os.makedirs('scraped_data', exist_ok=True)
     out_path = os.path.join('scraped_data', 'esimdb_plans.json')
     with open(out_path, 'w', encoding='utf-8') as f:
@@ -0,0 +1,312 @@
+"""
+Local stand-in for esimdb.com, for offline runs, load tests and CI.
+
+Serves the endpoints the scrapers use:
+
+  /api/client/regions/{slug}/data-plans     {"plans": [...]}
+  /api/client/countries/{slug}/data-plans   {"plans": [...]}
+  /api/client/providers                     [{"_id", "name", "slug"}, ...]
+  /api/client/countries, /api/client/regions  slug lists (crawl mode)
+  /region/europe/{provider}, /usa/{provider}  provider pages with promo badges
+  /{country}, /                             pages linking to providers / countries
+                                            (country pages carry __NEXT_DATA__ with the buildId)
+  /_next/data/{buildId}/{country}/{provider}.json   Next.js page data (404 for a stale buildId)
+
+Payloads are generated deterministically from --seed (plan fields follow
+esim_api_full_dump.json when it is present), or taken from recorded
+http_client fixtures with --fixtures DIR when a matching recording exists.
+JSON responses carry an ETag and honour If-None-Match, and are gzipped
+when the client accepts it.
+
+Load knobs:
+  --latency S / --jitter S   delay every response
+  --error-rate P             answer this fraction of requests with 503 (Retry-After: 1)
+  --max-concurrent N         answer 429 (Retry-After: 1) above N requests in flight
+  --plans N / --scale F      plans per data-plans endpoint (N * F)
+  --rotate-build N           move to a new buildId after every N Next.js data requests
+
+Point the scrapers at it through http_client:
+  python esimdb_standin.py --port 8765 --latency 0.05 &
+  ESIMDB_URL=http://127.0.0.1:8765 python scrape_all_regions_plans.py --all
+
+Ctrl-C (or SIGTERM) prints what was served.
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import gzip
+import hashlib
+import json
+import random
+import re
+import signal
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import http_client
+
+TEMPLATE_FILE = "esim_api_full_dump.json"
+DEFAULT_PLANS = 500
+PROVIDER_COUNT = 120
+COUNTRIES = {
+    "usa": "US", "canada": "CA", "mexico": "MX", "france": "FR", "germany": "DE", "austria": "AT",
+    "czechia": "CZ", "slovakia": "SK", "italy": "IT", "spain": "ES", "portugal": "PT", "united-kingdom": "GB",
+    "japan": "JP", "australia": "AU", "turkey": "TR", "thailand": "TH",
+}
+REGIONS = {
+    "europe": ["AT", "BE", "CZ", "DE", "DK", "ES", "FI", "FR", "GR", "HU", "IE", "IT", "NL", "PL", "PT", "SE", "SK"],
+    "north-america": ["US", "CA", "MX"],
+    "global": sorted(set(COUNTRIES.values()) | {"BR", "CN", "IN", "KR", "SG", "ZA"}),
+}
+PROMO_BADGES = ("One-time", "Unlimited", "")
+
+DATA_PLANS_RE = re.compile(r"^/api/client/(regions|countries)/([a-z0-9-]+)/data-plans$")
+PROVIDER_PAGE_RE = re.compile(r"^/(?:region/europe|usa)/([a-z0-9-]+)$")
+NEXT_DATA_RE = re.compile(r"^/_next/data/([^/]+)/([a-z0-9-]+)/([a-z0-9-]+)\.json$")
+
+
+def _load_template() -> dict:
+    try:
+        with open(TEMPLATE_FILE, "r", encoding="utf-8") as f:
+            plans = json.load(f)
+        return dict(plans[0])
+    except (OSError, ValueError, IndexError, KeyError):
+        return {"numberCoveredCountry": 0, "prices": {}, "promoPrices": {}}
+
+
+class StandIn:
+    def __init__(self, seed: int = 0, plans: int = DEFAULT_PLANS, fixtures: str | None = None, rotate_build: int = 0):
+        self.seed = seed
+        self.plan_count = plans
+        self.fixtures = fixtures
+        self.rotate_build = rotate_build
+        self.next_requests = 0
+        self._build_lock = threading.Lock()
+        self.template = _load_template()
+        self.providers = [
+            {"_id": hashlib.sha1(f"{seed}:provider:{i}".encode()).hexdigest()[:24], "name": f"Provider {i}", "slug": f"provider-{i}"}
+            for i in range(PROVIDER_COUNT)
+        ]
+
+    def _plans(self, scope: str, slug: str) -> list[dict]:
+        rng = random.Random(f"{self.seed}:{scope}:{slug}")
+        coverage = REGIONS.get(slug, []) if scope == "regions" else [COUNTRIES.get(slug, slug[:2].upper())]
+        plans = []
+        for i in range(self.plan_count):
+            capacity = rng.choice([500, 1024, 2048, 3072, 5120, 10240, 20480, 51200, -1])
+            price = round(rng.uniform(1, 60), 2)
+            promo = round(price * rng.uniform(0.3, 0.95), 2) if rng.random() < 0.3 else None
+            plan = dict(self.template)
+            plan.update({
+                "_id": hashlib.sha1(f"{self.seed}:{scope}:{slug}:{i}".encode()).hexdigest()[:24],
+                "provider": rng.choice(self.providers)["_id"],
+                "enName": f"{slug.title()} {capacity if capacity > 0 else 'Unlimited'} MB plan {i}",
+                "name": f"{slug.title()} plan {i}",
+                "capacity": capacity,
+                "period": rng.choice([1, 3, 7, 10, 15, 30, 60, 90, 180, 365]),
+                "usdPrice": price,
+                "usdPromoPrice": promo,
+                "promoEnabled": promo is not None,
+                "newUserOnly": rng.random() < 0.1,
+                "canTopUp": rng.choice([True, False, None]),
+                "eKYC": rng.choice([True, False, None]),
+                "has5G": rng.random() < 0.5,
+                "hasAds": rng.random() < 0.05,
+                "dataCapPer": "day" if rng.random() < 0.1 else None,
+                "coverages": coverage,
+                "numberCoveredCountry": len(coverage),
+            })
+            plans.append(plan)
+        return plans
+
+    def _provider_page(self, slug: str) -> str | None:
+        provider = next((p for p in self.providers if p["slug"] == slug), None)
+        if provider is None:
+            return None
+        rng = random.Random(f"{self.seed}:page:{slug}")
+        badge = rng.choice(PROMO_BADGES)
+        filler = "<p>Plan details</p>" * 200
+        offer = f"<span>GET {rng.choice([5, 10, 15, 20])}% OFF with {slug.replace('-', '').upper()}ESIMDB</span>" if badge else ""
+        badge_html = f'<div class="badge rounded-full text-caption">{badge}</div>' if badge else ""
+        return f"<html><body><h1>{provider['name']}</h1>{filler}{badge_html}{offer}</body></html>"
+
+    @property
+    def build_id(self) -> str:
+        generation = self.next_requests // self.rotate_build if self.rotate_build else 0
+        return f"standin-{self.seed}-{generation}"
+
+    def _next_data(self, build_id: str, country: str, slug: str) -> tuple[int, str, bytes]:
+        with self._build_lock:
+            current = self.build_id
+            self.next_requests += 1
+        provider = next((p for p in self.providers if p["slug"] == slug), None)
+        if build_id != current or provider is None:
+            return 404, "text/html; charset=utf-8", b"<html><body>404</body></html>"
+        plans = [p for p in self._plans("countries", country) if p["provider"] == provider["_id"]]
+        # Regular and promo plans sit in separate lists next to non-plan lists, as on the site
+        page_props = {
+            "provider": provider,
+            "plans": [p for p in plans if not p["promoEnabled"]],
+            "offers": {"promo": [p for p in plans if p["promoEnabled"]]},
+            "reviews": [{"author": "Traveller", "rating": 4, "text": "Worked fine"}],
+        }
+        return self._json({"pageProps": page_props, "__N_SSG": True})
+
+    def dynamic(self, path: str) -> tuple[int, str, bytes] | None:
+        """Responses that depend on the current buildId (never cached); recorded fixtures take precedence."""
+        if self.fixtures and http_client.load_fixture("GET", "https://esimdb.com" + path, self.fixtures) is not None:
+            return None
+        route = urlsplit(path).path.rstrip("/")
+        match = NEXT_DATA_RE.match(route)
+        if match:
+            return self._next_data(*match.groups())
+        country = route.lstrip("/")
+        if country in COUNTRIES:
+            links = "".join(f'<a href="/{country}/{p["slug"]}">{p["name"]}</a>' for p in self.providers)
+            next_data = json.dumps({"buildId": self.build_id, "page": "/[country]", "query": {"country": country}})
+            page = f'<html><body>{links}<script id="__NEXT_DATA__" type="application/json">{next_data}</script></body></html>'
+            return 200, "text/html; charset=utf-8", page.encode("utf-8")
+        return None
+
+    @functools.lru_cache(maxsize=512)
+    def respond(self, path: str) -> tuple[int, str, bytes]:
+        """(status, content type, body) for a GET of `path` (query string included)."""
+        if self.fixtures:
+            fixture = http_client.load_fixture("GET", "https://esimdb.com" + path, self.fixtures)
+            if fixture is not None:
+                meta, body = fixture
+                content_type = next((v for k, v in meta["headers"].items() if k.lower() == "content-type"), "application/json")
+                return meta["status"], content_type, body
+
+        route = urlsplit(path).path.rstrip("/") or "/"
+        match = DATA_PLANS_RE.match(route)
+        if match:
+            return self._json({"plans": self._plans(*match.groups())})
+        if route == "/api/client/providers":
+            return self._json(self.providers)
+        if route == "/api/client/countries":
+            return self._json([{"slug": slug, "name": slug.title()} for slug in COUNTRIES])
+        if route == "/api/client/regions":
+            return self._json([{"slug": slug, "name": slug.title()} for slug in REGIONS])
+        match = PROVIDER_PAGE_RE.match(route)
+        if match:
+            page = self._provider_page(match.group(1))
+            if page is not None:
+                return 200, "text/html; charset=utf-8", page.encode("utf-8")
+        if route == "/":
+            links = "".join(f'<a href="/{slug}">{slug}</a>' for slug in COUNTRIES)
+            return 200, "text/html; charset=utf-8", f"<html><body>{links}</body></html>".encode("utf-8")
+        return 404, "application/json", b'{"error": "not found"}'
+
+    @staticmethod
+    def _json(payload) -> tuple[int, str, bytes]:
+        return 200, "application/json", json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def make_handler(standin: StandIn, latency: float, jitter: float, error_rate: float, max_concurrent: int, seed: int):
+    lock = threading.Lock()
+    rng = random.Random(seed)
+    state = {"active": 0}
+    served: Counter = Counter()
+    sent_bytes = [0]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, content_type: str = "application/json", body: bytes = b"", headers: dict | None = None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            with lock:
+                served[status] += 1
+                sent_bytes[0] += len(body)
+
+        def do_GET(self):
+            with lock:
+                state["active"] += 1
+                overloaded = max_concurrent and state["active"] > max_concurrent
+                failed = rng.random() < error_rate
+                delay = latency + (rng.uniform(-jitter, jitter) if jitter else 0)
+            try:
+                time.sleep(max(delay, 0))
+                if overloaded:
+                    return self._send(429, headers={"Retry-After": "1"})
+                if failed:
+                    return self._send(503, headers={"Retry-After": "1"})
+                status, content_type, body = standin.dynamic(self.path) or standin.respond(self.path)
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                if status == 200 and self.headers.get("If-None-Match") == etag:
+                    return self._send(304, content_type, headers={"ETag": etag})
+                headers = {"ETag": etag} if status == 200 else {}
+                if len(body) > 1024 and "gzip" in (self.headers.get("Accept-Encoding") or ""):
+                    body = _gzipped(body)
+                    headers["Content-Encoding"] = "gzip"
+                self._send(status, content_type, body, headers)
+            finally:
+                with lock:
+                    state["active"] -= 1
+
+    return Handler, served, sent_bytes
+
+
+@functools.lru_cache(maxsize=512)
+def _gzipped(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=5)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Local esimdb.com stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of random latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--max-concurrent", type=int, default=0, help="Answer 429 above this many requests in flight (0 = no limit)")
+    parser.add_argument("--plans", type=int, default=DEFAULT_PLANS, help=f"Plans per data-plans endpoint (default: {DEFAULT_PLANS})")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply --plans")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fixtures", help="Serve recorded http_client fixtures from this directory when present")
+    parser.add_argument("--rotate-build", type=int, default=0, help="New Next.js buildId after every N data requests (0 = never)")
+    args = parser.parse_args(argv)
+
+    standin = StandIn(seed=args.seed, plans=max(int(args.plans * args.scale), 0), fixtures=args.fixtures, rotate_build=args.rotate_build)
+    handler, served, sent_bytes = make_handler(
+        standin, args.latency, args.jitter, args.error_rate, args.max_concurrent, args.seed
+    )
+    ThreadingHTTPServer.daemon_threads = True
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"esimdb stand-in on http://{args.host}:{args.port} ({standin.plan_count} plans per endpoint)")
+    started = time.perf_counter()
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    # Background jobs ignore SIGINT and CI stops servers with SIGTERM; both end the run with the summary
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        elapsed = time.perf_counter() - started
+        total = sum(served.values())
+        by_status = ", ".join(f"{status}: {count}" for status, count in sorted(served.items()))
+        print(f"\nServed {total} responses in {elapsed:.1f}s ({by_status or 'none'}); {sent_bytes[0] / 1e6:.1f} MB sent")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Exchange rates for every scraper and optimizer (USD base).
+
+Rates come from https://open.er-api.com/v6/latest/USD through http_cache,
+so a copy is kept on disk and the API is only asked again once it is older
+than RATES_TTL (and then with a conditional GET). Each day's rates are also
+appended to a dated history table:
+
+  scraped_data/exchange_rates.json   {"YYYY-MM-DD": {"CAD": 1.37, "EUR": 0.92, ...}}
+
+`get_rates()` returns the current rates, then the newest stored day, then
+the built-in fallback. `get_rates(fetch=False)` never touches the network,
+which is what the optimizers use. `rates_on(date)` returns the rates
+recorded for a past (UTC) day, so historical catalogues convert with the
+rates of their own time.
+
+Conversion works on scalars, NumPy arrays and pandas Series alike:
+`rates.from_usd(df["effective_price"], "CAD")` converts a whole column.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Optional
+
+import http_cache
+import http_client
+
+RATES_URL = "https://open.er-api.com/v6/latest/USD"
+RATES_FILE = os.path.join("scraped_data", "exchange_rates.json")
+RATES_TTL = 12 * 3600
+FALLBACK_RATES = {"USD": 1.0, "CAD": 1.37, "EUR": 0.92, "GBP": 0.79, "AUD": 1.54}
+
+# Fall back quickly instead of retrying: stored or built-in rates are fine for a run
+SESSION = http_client.create_session(retries=0)
+
+_lock = threading.Lock()
+_current: Optional["Rates"] = None
+
+
+@dataclass(frozen=True)
+class Rates:
+    date: str  # day the rates apply to (YYYY-MM-DD), or "fallback"
+    per_usd: dict[str, float]  # units of each currency per 1 USD
+    source: str  # http_cache status, "history" or "fallback"
+
+    def rate(self, currency: str) -> float:
+        if currency in self.per_usd:
+            return self.per_usd[currency]
+        return FALLBACK_RATES[currency]
+
+    def from_usd(self, usd, currency: str):
+        """USD amount(s) in `currency`; `usd` may be a number, array or Series."""
+        return usd * self.rate(currency)
+
+    def to_usd(self, amount, currency: str):
+        return amount / self.rate(currency)
+
+    def usd_factors(self) -> dict[str, float]:
+        """currency -> USD per unit, for converting prices quoted in other currencies."""
+        return {cur: 1 / r for cur, r in self.per_usd.items() if r}
+
+
+def load_history(path: str = RATES_FILE) -> dict[str, dict[str, float]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _record(day: str, per_usd: dict[str, float], path: str = RATES_FILE) -> None:
+    history = load_history(path)
+    if history.get(day) == per_usd:
+        return
+    history[day] = per_usd
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(dict(sorted(history.items())), f, indent=1)
+    os.replace(tmp, path)
+
+
+def _fetch(max_age: float) -> Optional[Rates]:
+    try:
+        resp = http_cache.fetch_json(RATES_URL, timeout=5, max_age=max_age, session=SESSION)
+    except Exception:
+        return None
+    data = resp.payload
+    if data.get("result") != "success" or not data.get("rates"):
+        return None
+    updated = data.get("time_last_update_unix")
+    day = (datetime.fromtimestamp(updated, timezone.utc) if updated else datetime.now(timezone.utc)).date().isoformat()
+    per_usd = {cur: float(r) for cur, r in data["rates"].items()}
+    _record(day, per_usd)
+    return Rates(day, per_usd, resp.status)
+
+
+def _latest_stored() -> Optional[Rates]:
+    history = load_history()
+    if not history:
+        return None
+    day = max(history)
+    return Rates(day, history[day], "history")
+
+
+@functools.lru_cache(maxsize=1)
+def stored_rates() -> Rates:
+    """Newest stored rates (or the fallback), read once per process."""
+    return _latest_stored() or Rates("fallback", dict(FALLBACK_RATES), "fallback")
+
+
+def get_rates(fetch: bool = True, max_age: float = RATES_TTL) -> Rates:
+    """Current rates (fetched once per process); `fetch=False` uses only stored rates."""
+    global _current
+    if not fetch:
+        return _current or stored_rates()
+    with _lock:
+        if _current is None:
+            rates = _fetch(max_age)
+            if rates is not None:
+                print(f"✓ Exchange rates for {rates.date} ({rates.source})")
+            else:
+                rates = _latest_stored()
+                if rates is not None:
+                    print(f"⚠ Using stored exchange rates from {rates.date}")
+                else:
+                    rates = Rates("fallback", dict(FALLBACK_RATES), "fallback")
+                    print("⚠ Using fallback exchange rates")
+            _current = rates
+        return _current
+
+
+def rates_on(when) -> Rates:
+    """Rates recorded for the day of `when` (date, datetime, ISO string or Unix time), or the closest earlier day.
+
+    Days are UTC, as recorded by `_fetch`; aware datetimes are converted, naive ones taken as UTC.
+    """
+    if isinstance(when, (int, float)):
+        day = datetime.fromtimestamp(when, timezone.utc).date().isoformat()
+    elif isinstance(when, datetime) and when.tzinfo is not None:
+        day = when.astimezone(timezone.utc).date().isoformat()
+    elif isinstance(when, (date, datetime)):
+        day = when.isoformat()[:10]
+    else:
+        day = str(when)[:10]
+    history = load_history()
+    earlier = [d for d in history if d <= day]
+    if earlier:
+        return Rates(max(earlier), history[max(earlier)], "history")
+    if history:
+        return Rates(min(history), history[min(history)], "history")
+    return Rates("fallback", dict(FALLBACK_RATES), "fallback")
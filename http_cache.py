@@ -0,0 +1,210 @@
+"""
+Shared HTTP cache for the esimdb API scrapers.
+
+Every JSON GET goes through `fetch_json` (over the pooled http_client
+session), which:
+- sends If-None-Match / If-Modified-Since from the per-URL metadata store
+- on 304 reuses the stored body
+- on 200 hashes the body (SHA-256); if the hash matches the stored one the
+  previously parsed payload is reused instead of parsing the body again
+- falls back to the stored body when the network is unavailable
+
+Layout (scraped_data/http_cache/, one set of files per URL):
+  <key>.meta.json  url, etag, last_modified, sha256, fetched_at, validated_at
+  <key>.body       raw response bytes
+  <key>.pkl        parsed payload for the body with meta["sha256"]
+
+Payloads may be shared between callers, so treat them as read-only.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import requests
+
+import http_client
+
+CACHE_DIR = os.path.join("scraped_data", "http_cache")
+
+# Response states reported in CachedResponse.status
+FETCHED = "fetched"            # new or changed body downloaded and parsed
+NOT_MODIFIED = "not_modified"  # 304, stored payload reused
+UNCHANGED = "unchanged"        # 200 but same hash as stored, stored payload reused
+FRESH = "fresh"                # within max_age, no request made
+STALE = "stale"                # request failed, stored payload reused
+
+_PARSED: dict[str, Any] = {}  # sha256 -> parsed payload
+_LOCK = threading.Lock()
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    payload: Any
+    sha256: str
+    status: str
+    downloaded: int = 0  # response body bytes transferred by this call
+
+    @property
+    def changed(self) -> bool:
+        """True when the payload differs from what the cache held before this call."""
+        return self.status == FETCHED
+
+
+def _cache_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+
+
+def _paths(url: str) -> tuple[str, str, str]:
+    base = os.path.join(CACHE_DIR, _cache_key(url))
+    return base + ".meta.json", base + ".body", base + ".pkl"
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def load_meta(url: str) -> dict:
+    meta_path, _, _ = _paths(url)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def _save_meta(url: str, meta: dict) -> None:
+    meta_path, _, _ = _paths(url)
+    _write_atomic(meta_path, json.dumps(meta, indent=2).encode("utf-8"))
+
+
+def _load_stored_payload(url: str, sha: str) -> Any:
+    """Return the parsed payload for the stored body with hash `sha`, or None if unavailable."""
+    with _LOCK:
+        if sha in _PARSED:
+            return _PARSED[sha]
+    _, body_path, pkl_path = _paths(url)
+    payload = None
+    try:
+        with open(pkl_path, "rb") as f:
+            stored_sha, payload = pickle.load(f)
+        if stored_sha != sha:
+            payload = None
+    except Exception:
+        payload = None
+    if payload is None:
+        try:
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except OSError:
+            return None
+        if hashlib.sha256(body).hexdigest() != sha:
+            return None
+        payload = json.loads(body)
+        _write_atomic(pkl_path, pickle.dumps((sha, payload), protocol=pickle.HIGHEST_PROTOCOL))
+    with _LOCK:
+        _PARSED[sha] = payload
+    return payload
+
+
+def _store(url: str, body: bytes, sha: str, payload: Any, meta: dict) -> None:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    _, body_path, pkl_path = _paths(url)
+    _write_atomic(body_path, body)
+    _write_atomic(pkl_path, pickle.dumps((sha, payload), protocol=pickle.HIGHEST_PROTOCOL))
+    _save_meta(url, meta)
+    with _LOCK:
+        _PARSED[sha] = payload
+
+
+def _drop(url: str) -> None:
+    """Forget the metadata for `url` so the next fetch is unconditional."""
+    meta_path, _, _ = _paths(url)
+    try:
+        os.remove(meta_path)
+    except OSError:
+        pass
+
+
+def fetch_json(
+    url: str,
+    headers: Optional[dict] = None,
+    timeout=http_client.DEFAULT_TIMEOUT,
+    max_age: Optional[float] = None,
+    session: Optional[requests.Session] = None,
+) -> CachedResponse:
+    """GET `url` as JSON through the revalidating cache.
+
+    `max_age` (seconds) skips the request entirely while the stored copy was
+    validated recently enough. Raises the underlying request error only when
+    there is no stored copy to fall back on.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    meta = load_meta(url)
+    stored_sha = meta.get("sha256")
+
+    if stored_sha and max_age is not None and time.time() - meta.get("validated_at", 0) < max_age:
+        payload = _load_stored_payload(url, stored_sha)
+        if payload is not None:
+            return CachedResponse(url, payload, stored_sha, FRESH)
+
+    req_headers = dict(headers or {})
+    if stored_sha:
+        if meta.get("etag"):
+            req_headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            req_headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        resp = (session or http_client.SESSION).get(url, headers=req_headers, timeout=timeout)
+        if resp.status_code != 304:
+            resp.raise_for_status()
+    except Exception as e:
+        payload = _load_stored_payload(url, stored_sha) if stored_sha else None
+        if payload is None:
+            raise
+        print(f"⚠ {url}: {e}; using cached copy")
+        return CachedResponse(url, payload, stored_sha, STALE)
+
+    now = time.time()
+    if resp.status_code == 304:
+        payload = _load_stored_payload(url, stored_sha)
+        if payload is not None:
+            meta["validated_at"] = now
+            _save_meta(url, meta)
+            return CachedResponse(url, payload, stored_sha, NOT_MODIFIED)
+        # Stored copy lost: fetch unconditionally.
+        _drop(url)
+        return fetch_json(url, headers=headers, timeout=timeout, session=session)
+
+    body = resp.content
+    sha = hashlib.sha256(body).hexdigest()
+    new_meta = {
+        "url": url,
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "sha256": sha,
+        "fetched_at": now,
+        "validated_at": now,
+    }
+    if sha == stored_sha:
+        payload = _load_stored_payload(url, sha)
+        if payload is not None:
+            new_meta["fetched_at"] = meta.get("fetched_at", now)
+            _save_meta(url, new_meta)
+            return CachedResponse(url, payload, sha, UNCHANGED, len(body))
+
+    payload = json.loads(body)
+    _store(url, body, sha, payload, new_meta)
+    return CachedResponse(url, payload, sha, FETCHED, len(body))
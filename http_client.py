@@ -0,0 +1,260 @@
+"""
+Shared HTTP client for every scraper.
+
+One pooled `requests.Session` (`SESSION`) carries all plain GETs and the
+http_cache.py conditional GETs:
+
+- keep-alive connection pools per host (`pool_size` connections each)
+- retries with exponential backoff on connection errors and 5xx,
+  honouring Retry-After; a 429 is retried as soon as the scheduler's pause
+  for its Retry-After ends (`retries=0` leaves all of that to the caller,
+  as promo_scraper's AIMD fetcher does)
+- Accept-Encoding negotiated from the decoders urllib3 has: gzip and
+  deflate always, br with `brotli` installed, zstd with `zstandard`
+- a default User-Agent and DEFAULT_TIMEOUT for `get`
+
+Every HTTP exchange, retries included, first takes a slot from
+request_scheduler.SCHEDULER (per-host token bucket, global concurrency cap,
+Retry-After pauses), so all scrapers in the process share one polite
+budget per host. Every session made by `create_session` counts requests
+and newly opened connections per host; `print_stats()` reports how often
+connections were reused and how long requests waited for the scheduler,
+and runs at interpreter exit when anything was fetched.
+
+Offline runs (set in the environment, or with `configure`):
+
+  ESIMDB_URL=http://127.0.0.1:8765   send esimdb.com requests to a stand-in
+                                     server (esimdb_standin.py)
+  HTTP_FIXTURES=record               save every response under HTTP_FIXTURE_DIR
+  HTTP_FIXTURES=replay               serve every response from HTTP_FIXTURE_DIR;
+                                     a request that was never recorded fails
+                                     like a network error
+  HTTP_FIXTURE_DIR=http_fixtures
+
+Fixtures are keyed by method and the URL as the scraper requested it, and
+stored as <key>.json (url, status, headers) plus <key>.body (decoded body).
+A replayed request whose If-None-Match matches the recorded ETag gets a 304.
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import defaultdict
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.response import HTTPResponse
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+import request_scheduler
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+DEFAULT_TIMEOUT = (10, 60)  # (connect, read) seconds
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+ESIMDB_HOSTS = ("esimdb.com", "www.esimdb.com")
+# Hop-by-hop and body-encoding headers are not stored with a (decoded) fixture body
+_UNRECORDED_HEADERS = {"connection", "content-encoding", "content-length", "keep-alive", "transfer-encoding"}
+
+ESIMDB_URL = os.environ.get("ESIMDB_URL", "").rstrip("/")
+FIXTURE_MODE = os.environ.get("HTTP_FIXTURES", "")
+FIXTURE_DIR = os.environ.get("HTTP_FIXTURE_DIR", "http_fixtures")
+
+_stats_lock = threading.Lock()
+_requests: dict[str, int] = defaultdict(int)  # host -> HTTP exchanges (retries included)
+_connections: dict[str, int] = defaultdict(int)  # host -> connections opened
+
+
+class _CountingPoolMixin:
+    def _new_conn(self):
+        with _stats_lock:
+            _connections[self.host] += 1
+        return super()._new_conn()
+
+    def _make_request(self, *args, **kwargs):
+        with _stats_lock:
+            _requests[self.host] += 1
+        scheduler = request_scheduler.SCHEDULER
+        scheduler.acquire(self.host)
+        status = retry_after = None
+        try:
+            response = super()._make_request(*args, **kwargs)
+            status, retry_after = response.status, response.headers.get("Retry-After")
+            return response
+        finally:
+            scheduler.release(self.host, status, retry_after)
+
+
+class _CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+def configure(esimdb_url: Optional[str] = None, fixtures: Optional[str] = None, fixture_dir: Optional[str] = None) -> None:
+    """Override the ESIMDB_URL / HTTP_FIXTURES / HTTP_FIXTURE_DIR settings for this process."""
+    global ESIMDB_URL, FIXTURE_MODE, FIXTURE_DIR
+    if fixtures not in (None, "", "record", "replay"):
+        raise ValueError(f"unknown fixture mode: {fixtures}")
+    if esimdb_url is not None:
+        ESIMDB_URL = esimdb_url.rstrip("/")
+    if fixtures is not None:
+        FIXTURE_MODE = fixtures
+    if fixture_dir is not None:
+        FIXTURE_DIR = fixture_dir
+
+
+def fixture_key(method: str, url: str) -> str:
+    return hashlib.sha256(f"{method.upper()} {url}".encode("utf-8")).hexdigest()[:32]
+
+
+def redirect_url(url: str) -> str:
+    """`url` with an esimdb.com origin replaced by ESIMDB_URL (when set)."""
+    if not ESIMDB_URL:
+        return url
+    parts = urlsplit(url)
+    if parts.hostname not in ESIMDB_HOSTS:
+        return url
+    return ESIMDB_URL + url[len(f"{parts.scheme}://{parts.netloc}"):]
+
+
+def record_fixture(method: str, url: str, status: int, reason: str, headers: dict, body: bytes, fixture_dir: Optional[str] = None) -> None:
+    base = os.path.join(fixture_dir or FIXTURE_DIR, fixture_key(method, url))
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    meta = {
+        "method": method.upper(),
+        "url": url,
+        "status": status,
+        "reason": reason,
+        "headers": {k: v for k, v in headers.items() if k.lower() not in _UNRECORDED_HEADERS},
+    }
+    with open(base + ".body", "wb") as f:
+        f.write(body)
+    with open(base + ".json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+
+def load_fixture(method: str, url: str, fixture_dir: Optional[str] = None) -> Optional[tuple[dict, bytes]]:
+    """(meta, body) recorded for `method url`, or None."""
+    base = os.path.join(fixture_dir or FIXTURE_DIR, fixture_key(method, url))
+    try:
+        with open(base + ".json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(base + ".body", "rb") as f:
+            return meta, f.read()
+    except OSError:
+        return None
+
+
+class _CountingAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        url = request.url
+        if FIXTURE_MODE == "replay":
+            return self._replay(request, url)
+        request.url = redirect_url(url)
+        resp = super().send(request, **kwargs)
+        if FIXTURE_MODE == "record":
+            record_fixture(request.method, url, resp.status_code, resp.reason, resp.headers, resp.content)
+        return resp
+
+    def _replay(self, request, url: str) -> requests.Response:
+        fixture = load_fixture(request.method, url)
+        if fixture is None:
+            raise requests.ConnectionError(f"no recorded response for {request.method} {url}", request=request)
+        meta, body = fixture
+        headers = dict(meta["headers"])
+        status = meta["status"]
+        etag = next((v for k, v in headers.items() if k.lower() == "etag"), None)
+        if etag and request.headers.get("If-None-Match") == etag:
+            status, body = 304, b""
+        headers["Content-Length"] = str(len(body))
+        raw = HTTPResponse(
+            body=io.BytesIO(body), headers=headers, status=status, reason=meta.get("reason"),
+            preload_content=False, decode_content=False,
+        )
+        return self.build_response(request, raw)
+
+
+class _SchedulerRetry(Retry):
+    """urllib3 Retry that leaves waiting out a 429 to the request scheduler.
+
+    `_make_request` has already paused the host for the 429's Retry-After when
+    the retry is scheduled, and the retried request's `acquire` waits for that
+    pause, so sleeping here as well would wait it out twice. 5xx answers keep
+    urllib3's Retry-After / exponential backoff.
+    """
+
+    def sleep(self, response=None) -> None:
+        if response is not None and response.status == 429:
+            return
+        super().sleep(response)
+
+
+def create_session(retries: int = 3, backoff: float = 1.0, pool_size: int = 10) -> requests.Session:
+    """Pooled keep-alive session; `retries=0` leaves 429/5xx handling to the caller."""
+    session = requests.Session()
+    session.headers.update({"User-Agent": USER_AGENT, "Accept-Encoding": ACCEPT_ENCODING})
+    retry = (
+        _SchedulerRetry(total=retries, backoff_factor=backoff, status_forcelist=RETRY_STATUSES, allowed_methods=("GET", "HEAD"))
+        if retries
+        else 0
+    )
+    adapter = _CountingAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+SESSION = create_session()
+
+
+def get(
+    url: str,
+    headers: Optional[dict] = None,
+    timeout=DEFAULT_TIMEOUT,
+    session: Optional[requests.Session] = None,
+    **kwargs,
+) -> requests.Response:
+    """GET through the shared session (or `session`)."""
+    return (session or SESSION).get(url, headers=headers, timeout=timeout, **kwargs)
+
+
+def connection_stats() -> dict[str, tuple[int, int]]:
+    """host -> (requests sent, connections opened) so far in this process."""
+    with _stats_lock:
+        return {host: (count, _connections.get(host, 0)) for host, count in _requests.items()}
+
+
+def print_stats() -> None:
+    stats = connection_stats()
+    if not stats:
+        return
+    scheduled = request_scheduler.SCHEDULER.stats()
+    print("HTTP connection reuse:")
+    for host, (count, opened) in sorted(stats.items(), key=lambda item: -item[1][0]):
+        reused = max(count - opened, 0)
+        line = f"  {host}: {count} requests over {opened} connection{'s' if opened != 1 else ''} ({reused / count:.0%} reused)"
+        limits = scheduled.get(host)
+        if limits and (limits["throttled"] or limits["waited"] >= 0.1):
+            line += f", {limits['throttled']} throttled, {limits['waited'] / max(limits['requests'], 1):.2f}s average wait"
+        print(line)
+
+
+atexit.register(print_stats)
@@ -8,7 +8,7 @@ Features:
 - Max eSIM activations and max top-ups limits
 - Per-plan inline warnings
 """
-import pandas as pd
+import argparse
 import json
 import os
 import time
@@ -24,6 +24,11 @@ except ImportError:
     def tqdm(iterable, **kwargs):
         return iterable
 
+import exchange_rates
+import plan_snapshot
+import plan_store
+import promo_scraper
+
 # --- CONFIGURATION ---
 TRIP_DAYS = 15
 TOTAL_DATA_GB = 8.6
@@ -47,6 +52,14 @@ DEFAULT_HASSLE_PENALTY = 0.50  # Per additional account needed
 LOW_SPEED_THRESHOLD = 1000  # 1 Mbps - below this, streaming may buffer
 # ---------------------
 
+# Plan columns the optimizer reads (the plan store loads only these)
+PLAN_COLUMNS = [
+    "plan_id", "provider_id", "provider_name", "plan_name", "data_mb", "validity_days",
+    "usd_price", "usd_promo_price", "effective_price", "new_user_only", "can_top_up",
+    "subscription", "pay_as_you_go", "ekyc", "speed_limit", "reduced_speed",
+    "possible_throttling", "tethering", "has_ads",
+]
+
 TOTAL_DATA_MB = TOTAL_DATA_GB * 1024
 DAILY_DATA_NEED = TOTAL_DATA_MB / TRIP_DAYS
 
@@ -72,24 +85,24 @@ def load_overrides_config():
                 config["hassle_penalty"] = data.get("default_hassle_penalty", DEFAULT_HASSLE_PENALTY)
         except:
             pass
+    config["manual_promo_providers"] = set(config["provider_promo_overrides"])
             
     # Load scraped cache and merge (manual overrides take precedence)
+    # (load_cache includes entries still in the journal of a running or interrupted scrape)
     cache_file = "promo_recurrence_cache.json"
-    if os.path.exists(cache_file):
-        try:
-            with open(cache_file, "r") as f:
-                scrape_cache = json.load(f)
-                for pid, info in scrape_cache.items():
-                    # Only add if not manually overridden and we found a specific type
-                    if pid not in config["provider_promo_overrides"]:
-                        p_type = info.get("promo_type", "unknown")
-                        if p_type in ["one-time", "unlimited"]:
-                            config["provider_promo_overrides"][pid] = {
-                                "promo_type": p_type,
-                                "name": info.get("name", "")
-                            }
-        except:
-            pass
+    try:
+        scrape_cache = promo_scraper.load_cache(cache_file)
+        for pid, info in scrape_cache.items():
+            # Only add if not manually overridden and we found a specific type
+            if pid not in config["provider_promo_overrides"]:
+                p_type = info.get("promo_type", "unknown")
+                if p_type in ["one-time", "unlimited"]:
+                    config["provider_promo_overrides"][pid] = {
+                        "promo_type": p_type,
+                        "name": info.get("name", "")
+                    }
+    except:
+        pass
             
     return config
     return config
@@ -310,7 +323,7 @@ def evaluate_combination(combo_data):
         return {
             "display_cost": display_cost,  # Actual cost to show
             "ranking_cost": ranking_cost,  # Cost for sorting (includes hassle)
-            "cad": display_cost * 1.37,
+            "cad": exchange_rates.get_rates(fetch=False).from_usd(display_cost, "CAD"),
             "info": info,
             "gb": data / 1024,
             "days": dur,
@@ -324,7 +337,12 @@ def evaluate_combination(combo_data):
 
     return None
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="eSIM Plan Optimizer - Europe")
+    parser.add_argument("--no-promo-fetch", action="store_true",
+                        help="Don't fetch promo rules missing from the cache for the searched providers")
+    args = parser.parse_args(argv)
+
     start_time = time.perf_counter()
     
     print("="*80)
@@ -349,58 +367,69 @@ def main():
     
     # Load data
     file_to_load = INPUT_FILE
-    if not os.path.exists(file_to_load):
-        if os.path.exists("esim_plans_europe.csv"):
+    if not plan_store.plans_exist(file_to_load):
+        if plan_store.plans_exist("esim_plans_europe.csv"):
             file_to_load = "esim_plans_europe.csv"
             print(f"Note: {INPUT_FILE} not found, using esim_plans_europe.csv")
         else:
             print(f"ERROR: No input CSV found. Run scrape_europe_plans.py first.")
             return
 
-    df = pd.read_csv(file_to_load)
-    print(f"Loaded plans: {len(df)}")
-    
-    if overrides:
-        print(f"Loaded {len(overrides)} plan overrides")
+    def prepare_plans():
+        df = plan_store.load_plans(file_to_load, columns=PLAN_COLUMNS)
+        print(f"Loaded plans: {len(df)}")
     
-    # Convert to dict and apply overrides
-    plans_list = df.to_dict('records')
-    plans_list = [apply_overrides(p, overrides) for p in plans_list]
+        if overrides:
+            print(f"Loaded {len(overrides)} plan overrides")
     
-    # Apply provider promo type to each plan
-    for p in plans_list:
-        provider_id = p.get("provider_id", "")
-        if provider_id in provider_promo_overrides:
-            p["provider_promo_type"] = provider_promo_overrides[provider_id].get("promo_type", default_promo_type)
-        else:
-            p["provider_promo_type"] = default_promo_type
-    
-    # Filter valid plans
-    valid_plans = [
-        p for p in plans_list
-        if p.get("usd_price") is not None and p.get("data_mb", 0) > 0 and p.get("validity_days", 0) > 0
-    ]
-    
-    # Sort by cost per day (value metric)
-    for p in valid_plans:
-        effective = p.get("effective_price") or p.get("usd_price") or 0
-        days_covered = min(p["data_mb"] / DAILY_DATA_NEED, p["validity_days"])
-        p["cpd"] = effective / max(days_covered, 0.1)
+        # Convert to dict and apply overrides
+        plans_list = df.to_dict('records')
+        plans_list = [apply_overrides(p, overrides) for p in plans_list]
     
-    valid_plans.sort(key=lambda x: x["cpd"])
-    
-    # Take free plans + top paid plans for search space
-    free_plans = [p for p in valid_plans if (p.get("usd_price") or 0) == 0]
-    paid_plans = [p for p in valid_plans if (p.get("usd_price") or 0) > 0][:SEARCH_SPACE_SIZE]
-    search_plans = free_plans + paid_plans
-
-    print(f"Search space: {len(search_plans)} plans ({len(free_plans)} free)")
+        # Apply provider promo type to each plan
+        for p in plans_list:
+            provider_id = p.get("provider_id", "")
+            if provider_id in provider_promo_overrides:
+                p["provider_promo_type"] = provider_promo_overrides[provider_id].get("promo_type", default_promo_type)
+            else:
+                p["provider_promo_type"] = default_promo_type
+    
+        # Filter valid plans
+        valid_plans = [
+            p for p in plans_list
+            if p.get("usd_price") is not None and (p.get("data_mb") or 0) > 0 and (p.get("validity_days") or 0) > 0
+        ]
+        return valid_plans
+
+    snapshot = plan_snapshot.load_or_compile(
+        "europe_legacy",
+        [file_to_load, plan_store.store_path(file_to_load), OVERRIDES_FILE,
+         "promo_recurrence_cache.json", promo_scraper.journal_path("promo_recurrence_cache.json")],
+        prepare_plans,
+    )
+    if snapshot.cached:
+        print(f"Loaded {len(snapshot)} prepared plans from snapshot")
+
+    # Free plans + top paid plans by cost per day (value metric)
+    search_plans, free_count, cpd, order = snapshot.search_space(DAILY_DATA_NEED, SEARCH_SPACE_SIZE)
+
+    print(f"Search space: {len(search_plans)} plans ({free_count} free)")
+
+    # Fetch promo rules the search needs but the cache lacks in the background;
+    # combinations with those providers are evaluated once the rules are in
+    candidate_providers = {p.get("provider_id") for p in search_plans} - config["manual_promo_providers"]
+    promo_refresh = promo_scraper.PromoRefresh("europe", set() if args.no_promo_fetch else candidate_providers)
+    pending_idx = {i for i, p in enumerate(search_plans) if p.get("provider_id") in promo_refresh.due}
+    if promo_refresh.due:
+        print(f"Fetching promo rules for {len(promo_refresh.due)} providers in the background")
     print()
 
     # Find all valid single-plan solutions
     single_plan_solutions = []
 
-    for plan in valid_plans:
+    # Only plans that cover the whole trip alone need a dict, in cost-per-day order
+    single_idx = order[(snapshot.column("data_mb")[order] >= TOTAL_DATA_MB) & (snapshot.column("validity_days")[order] >= TRIP_DAYS)]
+    for plan in snapshot.records(single_idx, cpd):
         # Check if this single plan meets requirements
         if plan.get("data_mb", 0) >= TOTAL_DATA_MB and plan.get("validity_days", 0) >= TRIP_DAYS:
             # Valid single plan solution
@@ -418,7 +447,7 @@ def main():
             solution = {
                 "display_cost": display_price,
                 "ranking_cost": display_price,  # No hassle penalty for single plan
-                "cad": display_price * 1.37,
+                "cad": exchange_rates.get_rates(fetch=False).from_usd(display_price, "CAD"),
                 "info": [{
                     "plan": plan.get("plan_name", "Unknown"),
                     "provider": plan.get("provider_name", "Unknown"),
@@ -476,23 +505,34 @@ def main():
     # Evaluate combinations with progress bar
     # Use RANKING_COST for heap ordering, but store display_cost for showing
     solutions = []
-    counter = 0
 
     # Collect more combo solutions to ensure we don't miss good ones when merging with singles
     COMBO_SEARCH_LIMIT = TOP_N_SOLUTIONS * 5
 
-    for combo_data in tqdm(combo_data_list, desc="Checking combinations", unit="combo"):
-        result = evaluate_combination(combo_data)
+    def keep(index, result):
+        # Sort by ranking_cost (includes hassle penalty), but display_cost is shown;
+        # ties go to the earlier combination, whatever order they were evaluated in
         if result:
-            counter += 1
-            # Sort by ranking_cost (includes hassle penalty), but display_cost is shown
+            entry = (-result["ranking_cost"], -index, result)
             if len(solutions) < COMBO_SEARCH_LIMIT:
-                heapq.heappush(solutions, (-result["ranking_cost"], counter, result))
-            elif result["ranking_cost"] < -solutions[0][0]:
-                heapq.heapreplace(solutions, (-result["ranking_cost"], counter, result))
+                heapq.heappush(solutions, entry)
+            elif entry[:2] > solutions[0][:2]:
+                heapq.heapreplace(solutions, entry)
+
+    deferred = []
+    for index, combo_data in enumerate(tqdm(combo_data_list, desc="Checking combinations", unit="combo")):
+        if pending_idx and not pending_idx.isdisjoint(combo_data[0]):
+            deferred.append((index, combo_data))
+            continue
+        keep(index, evaluate_combination(combo_data))
+
+    if deferred:
+        promo_refresh.apply(search_plans, default_promo_type)
+        for index, combo_data in tqdm(deferred, desc="Checking combinations (fetched promos)", unit="combo"):
+            keep(index, evaluate_combination(combo_data))
     
     # Extract and sort solutions by ranking_cost
-    solutions = [s[2] for s in sorted(solutions, key=lambda x: -x[0])]
+    solutions = [s[2] for s in sorted(solutions, key=lambda x: (-x[0], -x[1]))]
 
     # Combine single-plan and combo solutions
     all_solutions = single_plan_solutions + solutions
@@ -10,7 +10,6 @@ Features:
 - Max eSIM activations and max top-ups limits
 - Per-plan inline warnings
 """
-import pandas as pd
 import json
 import os
 import time
@@ -27,6 +26,11 @@ except ImportError:
     def tqdm(iterable, **kwargs):
         return iterable
 
+import exchange_rates
+import plan_snapshot
+import plan_store
+import promo_scraper
+
 # --- CONFIGURATION ---
 TRIP_DAYS = 15
 TOTAL_DATA_GB = 8.6
@@ -51,6 +55,14 @@ DAILY_DATA_NEED = TOTAL_DATA_MB / TRIP_DAYS
 
 LOG_FILE = "optimizer_run.log"
 
+# Plan columns the optimizer reads (the plan store loads only these)
+PLAN_COLUMNS = [
+    "plan_id", "provider_id", "provider_name", "plan_name", "data_mb", "validity_days",
+    "usd_price", "usd_promo_price", "effective_price", "new_user_only", "can_top_up",
+    "subscription", "pay_as_you_go", "ekyc", "speed_limit", "reduced_speed",
+    "possible_throttling", "tethering", "has_ads",
+]
+
 # Region-specific file paths
 REGION_CONFIG = {
     "europe": {
@@ -93,23 +105,23 @@ def load_overrides_config(overrides_file, promo_cache_file):
                 config["hassle_penalty"] = data.get("default_hassle_penalty", DEFAULT_HASSLE_PENALTY)
         except:
             pass
+    config["manual_promo_providers"] = set(config["provider_promo_overrides"])
             
     # Load scraped cache and merge (manual overrides take precedence)
-    if os.path.exists(promo_cache_file):
-        try:
-            with open(promo_cache_file, "r") as f:
-                scrape_cache = json.load(f)
-                for pid, info in scrape_cache.items():
-                    # Only add if not manually overridden and we found a specific type
-                    if pid not in config["provider_promo_overrides"]:
-                        p_type = info.get("promo_type", "unknown")
-                        if p_type in ["one-time", "unlimited"]:
-                            config["provider_promo_overrides"][pid] = {
-                                "promo_type": p_type,
-                                "name": info.get("name", "")
-                            }
-        except:
-            pass
+    # (load_cache includes entries still in the journal of a running or interrupted scrape)
+    try:
+        scrape_cache = promo_scraper.load_cache(promo_cache_file)
+        for pid, info in scrape_cache.items():
+            # Only add if not manually overridden and we found a specific type
+            if pid not in config["provider_promo_overrides"]:
+                p_type = info.get("promo_type", "unknown")
+                if p_type in ["one-time", "unlimited"]:
+                    config["provider_promo_overrides"][pid] = {
+                        "promo_type": p_type,
+                        "name": info.get("name", "")
+                    }
+    except:
+        pass
             
     return config
 
@@ -329,7 +341,7 @@ def evaluate_combination(combo_data):
         return {
             "display_cost": display_cost,  # Actual cost to show
             "ranking_cost": ranking_cost,  # Cost for sorting (includes hassle)
-            "cad": display_cost * 1.37,
+            "cad": exchange_rates.get_rates(fetch=False).from_usd(display_cost, "CAD"),
             "info": info,
             "gb": data / 1024,
             "days": dur,
@@ -350,6 +362,8 @@ def main():
                         help=f"Trip duration in days (default: {TRIP_DAYS})")
     parser.add_argument("--data-gb", type=float, default=TOTAL_DATA_GB,
                         help=f"Total data needed in GB (default: {TOTAL_DATA_GB})")
+    parser.add_argument("--no-promo-fetch", action="store_true",
+                        help="Don't fetch promo rules missing from the cache for the searched providers")
     
     args = parser.parse_args()
     
@@ -394,7 +408,7 @@ def main():
     print(f"Default promo type: {default_promo_type}")
     
     # Load data
-    if not os.path.exists(input_file):
+    if not plan_store.plans_exist(input_file):
         print(f"ERROR: Input file not found: {input_file}")
         print(f"Run the appropriate scraper first:")
         if region == "europe":
@@ -403,44 +417,52 @@ def main():
             print(f"  python scrape_usa_plans.py")
         return
 
-    df = pd.read_csv(input_file)
-    print(f"Loaded plans: {len(df)}")
-    
-    if overrides:
-        print(f"Loaded {len(overrides)} plan overrides")
-    
-    # Convert to dict and apply overrides
-    plans_list = df.to_dict('records')
-    plans_list = [apply_overrides(p, overrides) for p in plans_list]
-    
-    # Apply provider promo type to each plan
-    for p in plans_list:
-        provider_id = p.get("provider_id", "")
-        if provider_id in provider_promo_overrides:
-            p["provider_promo_type"] = provider_promo_overrides[provider_id].get("promo_type", default_promo_type)
-        else:
-            p["provider_promo_type"] = default_promo_type
-    
-    # Filter valid plans
-    valid_plans = [
-        p for p in plans_list
-        if p.get("usd_price") is not None and p.get("data_mb", 0) > 0 and p.get("validity_days", 0) > 0
-    ]
-    
-    # Sort by cost per day (value metric)
-    for p in valid_plans:
-        effective = p.get("effective_price") or p.get("usd_price") or 0
-        days_covered = min(p["data_mb"] / daily_data_need, p["validity_days"])
-        p["cpd"] = effective / max(days_covered, 0.1)
-    
-    valid_plans.sort(key=lambda x: x["cpd"])
-    
-    # Take free plans + top paid plans for search space
-    free_plans = [p for p in valid_plans if (p.get("usd_price") or 0) == 0]
-    paid_plans = [p for p in valid_plans if (p.get("usd_price") or 0) > 0][:SEARCH_SPACE_SIZE]
-    search_plans = free_plans + paid_plans
-    
-    print(f"Search space: {len(search_plans)} plans ({len(free_plans)} free)")
+    def prepare_plans():
+        df = plan_store.load_plans(input_file, columns=PLAN_COLUMNS)
+        print(f"Loaded plans: {len(df)}")
+    
+        if overrides:
+            print(f"Loaded {len(overrides)} plan overrides")
+    
+        # Convert to dict and apply overrides
+        plans_list = df.to_dict('records')
+        plans_list = [apply_overrides(p, overrides) for p in plans_list]
+    
+        # Apply provider promo type to each plan
+        for p in plans_list:
+            provider_id = p.get("provider_id", "")
+            if provider_id in provider_promo_overrides:
+                p["provider_promo_type"] = provider_promo_overrides[provider_id].get("promo_type", default_promo_type)
+            else:
+                p["provider_promo_type"] = default_promo_type
+    
+        # Filter valid plans
+        valid_plans = [
+            p for p in plans_list
+            if p.get("usd_price") is not None and (p.get("data_mb") or 0) > 0 and (p.get("validity_days") or 0) > 0
+        ]
+        return valid_plans
+
+    snapshot = plan_snapshot.load_or_compile(
+        f"multi_region_{region}",
+        [input_file, plan_store.store_path(input_file), overrides_file, promo_cache, promo_scraper.journal_path(promo_cache)],
+        prepare_plans,
+    )
+    if snapshot.cached:
+        print(f"Loaded {len(snapshot)} prepared plans from snapshot")
+
+    # Free plans + top paid plans by cost per day (value metric)
+    search_plans, free_count, _, _ = snapshot.search_space(daily_data_need, SEARCH_SPACE_SIZE)
+
+    print(f"Search space: {len(search_plans)} plans ({free_count} free)")
+
+    # Fetch promo rules the search needs but the cache lacks in the background;
+    # combinations with those providers are evaluated once the rules are in
+    candidate_providers = {p.get("provider_id") for p in search_plans} - overrides_config["manual_promo_providers"]
+    promo_refresh = promo_scraper.PromoRefresh(region, set() if args.no_promo_fetch else candidate_providers)
+    pending_idx = {i for i, p in enumerate(search_plans) if p.get("provider_id") in promo_refresh.due}
+    if promo_refresh.due:
+        print(f"Fetching promo rules for {len(promo_refresh.due)} providers in the background")
     print()
     
     # Generate all combinations to evaluate
@@ -472,20 +494,31 @@ def main():
     # Evaluate combinations with progress bar
     # Use RANKING_COST for heap ordering, but store display_cost for showing
     solutions = []
-    counter = 0
-    
-    for combo_data in tqdm(combo_data_list, desc="Checking combinations", unit="combo"):
-        result = evaluate_combination(combo_data)
+
+    def keep(index, result):
+        # Sort by ranking_cost (includes hassle penalty), but display_cost is shown;
+        # ties go to the earlier combination, whatever order they were evaluated in
         if result:
-            counter += 1
-            # Sort by ranking_cost (includes hassle penalty), but display_cost is shown
+            entry = (-result["ranking_cost"], -index, result)
             if len(solutions) < TOP_N_SOLUTIONS:
-                heapq.heappush(solutions, (-result["ranking_cost"], counter, result))
-            elif result["ranking_cost"] < -solutions[0][0]:
-                heapq.heapreplace(solutions, (-result["ranking_cost"], counter, result))
+                heapq.heappush(solutions, entry)
+            elif entry[:2] > solutions[0][:2]:
+                heapq.heapreplace(solutions, entry)
+
+    deferred = []
+    for index, combo_data in enumerate(tqdm(combo_data_list, desc="Checking combinations", unit="combo")):
+        if pending_idx and not pending_idx.isdisjoint(combo_data[0]):
+            deferred.append((index, combo_data))
+            continue
+        keep(index, evaluate_combination(combo_data))
+
+    if deferred:
+        promo_refresh.apply(search_plans, default_promo_type)
+        for index, combo_data in tqdm(deferred, desc="Checking combinations (fetched promos)", unit="combo"):
+            keep(index, evaluate_combination(combo_data))
     
     # Extract and sort solutions by ranking_cost
-    solutions = [s[2] for s in sorted(solutions, key=lambda x: -x[0])]
+    solutions = [s[2] for s in sorted(solutions, key=lambda x: (-x[0], -x[1]))]
     
     elapsed = time.perf_counter() - start_time
     
@@ -8,7 +8,6 @@ Germany -> Austria -> Czechia -> Slovakia
 Mixes LOCAL plans (specific country) and REGIONAL plans (Europe).
 Checks coverage of Data and Days.
 """
-import pandas as pd
 import json
 import os
 import itertools
@@ -18,11 +17,20 @@ import time
 import logging
 from math import comb
 
+import exchange_rates
+import plan_store
+
 # Configuration
 INPUT_FILE = "esim_plans_itinerary.csv"
 OVERRIDES_FILE = "plan_overrides.json"
 FULL_API_CACHE = "promo_recurrence_cache.json"
 
+# Plan columns the optimizer reads (the plan store loads only these)
+PLAN_COLUMNS = [
+    "plan_id", "provider_id", "provider_name", "plan_name", "data_mb", "validity_days",
+    "data_cap_per", "usd_price", "usd_promo_price", "scope", "new_user_only", "countries",
+]
+
 LOG_FILE = "optimizer_itinerary.log"
 SEARCH_SPACE_SIZE = 40
 MAX_COMBO_SIZE = 4
@@ -77,7 +85,7 @@ def load_config():
 
 def main():
     print(f"Loading plans from {INPUT_FILE}...")
-    df = pd.read_csv(INPUT_FILE)
+    df = plan_store.load_plans(INPUT_FILE, columns=PLAN_COLUMNS)
     config = load_config()
     
     # Process Plans
@@ -94,16 +102,9 @@ def main():
         p["provider_promo_type"] = config["provider_promo_overrides"].get(pid, {}).get("promo_type", "unlimited")
         
         # Filter
-        if p.get("usd_price") is not None and p.get("data_mb", 0) > 0 and p.get("validity_days") > 0:
-            # Parse coverage countries
-            try:
-                # Handle CSV string conversion
-                if isinstance(p["countries"], str):
-                     p["coverage"] = set(json.loads(p["countries"]))
-                else:
-                     p["coverage"] = set()
-            except:
-                p["coverage"] = set()
+        if p.get("usd_price") is not None and (p.get("data_mb") or 0) > 0 and (p.get("validity_days") or 0) > 0:
+            # Coverage countries (list column from the plan store)
+            p["coverage"] = set(p.get("countries") or [])
             valid_plans.append(p)
 
     # Sort checks: Value (Price/GB)
@@ -398,7 +399,7 @@ def print_solution(rank, res):
     
     # Currency
     usd = res['display_cost']
-    cad = usd * 1.42
+    cad = exchange_rates.get_rates(fetch=False).from_usd(usd, "CAD")
     free_cnt = sum(1 for p in res['plans'] if p['_final_price'] == 0)
     free_txt = f" [{free_cnt} FREE]" if free_cnt > 0 else ""
     
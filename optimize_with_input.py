@@ -10,6 +10,7 @@ Features:
 - All other optimizer features preserved (promo tracking, hassle penalties, warnings, etc.)
 """
 
+import argparse
 import heapq
 import json
 import logging
@@ -19,7 +20,11 @@ import time
 from collections import defaultdict
 from itertools import combinations
 
-import pandas as pd
+
+import exchange_rates
+import plan_snapshot
+import plan_store
+import promo_scraper
 
 try:
     from tqdm import tqdm
@@ -44,6 +49,14 @@ LOW_SPEED_THRESHOLD = 1000
 LOG_FILE = "optimizer_run.log"
 # ---------------------
 
+# Plan columns the optimizer reads (the plan store loads only these)
+PLAN_COLUMNS = [
+    "plan_id", "provider_id", "provider_name", "plan_name", "data_mb", "validity_days",
+    "usd_price", "usd_promo_price", "effective_price", "new_user_only", "can_top_up",
+    "subscription", "pay_as_you_go", "ekyc", "speed_limit", "reduced_speed",
+    "possible_throttling", "tethering", "has_ads",
+]
+
 logging.basicConfig(filename=LOG_FILE, level=logging.INFO, format="%(asctime)s - %(message)s")
 
 
@@ -55,6 +68,7 @@ REGIONS = {
         "promo_cache": "promo_recurrence_cache.json",
         "overrides": "plan_overrides.json",
         "provider_key": "provider_promo_overrides",
+        "promo_region": "europe",
     },
     2: {
         "name": "USA",
@@ -62,6 +76,7 @@ REGIONS = {
         "promo_cache": "promo_recurrence_cache_usa.json",
         "overrides": "plan_overrides.json",
         "provider_key": "usa_provider_promo_overrides",
+        "promo_region": "usa",
     },
     3: {
         "name": "North America",
@@ -69,6 +84,7 @@ REGIONS = {
         "promo_cache": "promo_recurrence_cache_usa.json",
         "overrides": "plan_overrides.json",
         "provider_key": "usa_provider_promo_overrides",
+        "promo_region": "usa",
     },
     4: {
         "name": "Global",
@@ -76,6 +92,7 @@ REGIONS = {
         "promo_cache": "promo_recurrence_cache.json",
         "overrides": "plan_overrides.json",
         "provider_key": "provider_promo_overrides",
+        "promo_region": "europe",
     },
 }
 
@@ -167,21 +184,21 @@ def load_overrides_config(overrides_file, promo_cache_file, provider_key):
                 config["hassle_penalty"] = data.get("default_hassle_penalty", DEFAULT_HASSLE_PENALTY)
         except Exception:
             pass
-
-    if os.path.exists(promo_cache_file):
-        try:
-            with open(promo_cache_file, "r") as f:
-                scrape_cache = json.load(f)
-                for pid, info in scrape_cache.items():
-                    if pid not in config["provider_promo_overrides"]:
-                        p_type = info.get("promo_type", "unknown")
-                        if p_type in ["one-time", "unlimited"]:
-                            config["provider_promo_overrides"][pid] = {
-                                "promo_type": p_type,
-                                "name": info.get("name", ""),
-                            }
-        except Exception:
-            pass
+    config["manual_promo_providers"] = set(config["provider_promo_overrides"])
+
+    # load_cache includes entries still in the journal of a running or interrupted scrape
+    try:
+        scrape_cache = promo_scraper.load_cache(promo_cache_file)
+        for pid, info in scrape_cache.items():
+            if pid not in config["provider_promo_overrides"]:
+                p_type = info.get("promo_type", "unknown")
+                if p_type in ["one-time", "unlimited"]:
+                    config["provider_promo_overrides"][pid] = {
+                        "promo_type": p_type,
+                        "name": info.get("name", ""),
+                    }
+    except Exception:
+        pass
 
     return config
 
@@ -388,7 +405,7 @@ def evaluate_combination(combo_data):
         return {
             "display_cost": display_cost,
             "ranking_cost": ranking_cost,
-            "cad": display_cost * 1.37,
+            "cad": exchange_rates.get_rates(fetch=False).from_usd(display_cost, "CAD"),
             "info": info,
             "gb": data / 1024,
             "days": dur,
@@ -403,7 +420,12 @@ def evaluate_combination(combo_data):
     return None
 
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="eSIM Plan Optimizer - Interactive Mode")
+    parser.add_argument("--no-promo-fetch", action="store_true",
+                        help="Don't fetch promo rules missing from the cache for the searched providers")
+    args = parser.parse_args(argv)
+
     start_time = time.perf_counter()
 
     print("=" * 80)
@@ -433,7 +455,7 @@ def main():
     print("=" * 80)
     print()
 
-    if not os.path.exists(input_file):
+    if not plan_store.plans_exist(input_file):
         print(f"ERROR: Input file not found: {input_file}")
         print(f"\nPlease run the appropriate scraper first:")
         print(f"  python scrape_all_regions_plans.py --region {region_name.lower().replace(' ', '-')}")
@@ -456,48 +478,60 @@ def main():
         print(f"One-time promo providers: {display_list}")
     print(f"Default promo type: {default_promo_type}")
 
-    df = pd.read_csv(input_file)
-    print(f"Loaded plans: {len(df)}")
-
-    if overrides:
-        print(f"Loaded {len(overrides)} plan overrides")
+    def prepare_plans():
+        df = plan_store.load_plans(input_file, columns=PLAN_COLUMNS)
+        print(f"Loaded plans: {len(df)}")
 
-    plans_list = df.to_dict("records")
-    plans_list = [apply_overrides(p, overrides) for p in plans_list]
+        if overrides:
+            print(f"Loaded {len(overrides)} plan overrides")
 
-    for p in plans_list:
-        provider_id = p.get("provider_id", "")
-        if provider_id in provider_promo_overrides:
-            p["provider_promo_type"] = provider_promo_overrides[provider_id].get(
-                "promo_type", default_promo_type
-            )
-        else:
-            p["provider_promo_type"] = default_promo_type
-
-    valid_plans = [
-        p
-        for p in plans_list
-        if p.get("usd_price") is not None and p.get("data_mb", 0) > 0 and p.get("validity_days", 0) > 0
-    ]
-
-    for p in valid_plans:
-        effective = p.get("effective_price") or p.get("usd_price") or 0
-        days_covered = min(p["data_mb"] / daily_data_need, p["validity_days"])
-        p["cpd"] = effective / max(days_covered, 0.1)
+        plans_list = df.to_dict("records")
+        plans_list = [apply_overrides(p, overrides) for p in plans_list]
 
-    valid_plans.sort(key=lambda x: x["cpd"])
-
-    free_plans = [p for p in valid_plans if (p.get("usd_price") or 0) == 0]
-    paid_plans = [p for p in valid_plans if (p.get("usd_price") or 0) > 0][:SEARCH_SPACE_SIZE]
-    search_plans = free_plans + paid_plans
-
-    print(f"Search space: {len(search_plans)} plans ({len(free_plans)} free)")
+        for p in plans_list:
+            provider_id = p.get("provider_id", "")
+            if provider_id in provider_promo_overrides:
+                p["provider_promo_type"] = provider_promo_overrides[provider_id].get(
+                    "promo_type", default_promo_type
+                )
+            else:
+                p["provider_promo_type"] = default_promo_type
+
+        valid_plans = [
+            p
+            for p in plans_list
+            if p.get("usd_price") is not None and (p.get("data_mb") or 0) > 0 and (p.get("validity_days") or 0) > 0
+        ]
+        return valid_plans
+
+    snapshot = plan_snapshot.load_or_compile(
+        f"interactive_{region_name.lower().replace(' ', '_')}",
+        [input_file, plan_store.store_path(input_file), overrides_file, promo_cache, promo_scraper.journal_path(promo_cache)],
+        prepare_plans,
+    )
+    if snapshot.cached:
+        print(f"Loaded {len(snapshot)} prepared plans from snapshot")
+
+    # Free plans + top paid plans by cost per day (value metric)
+    search_plans, free_count, cpd, order = snapshot.search_space(daily_data_need, SEARCH_SPACE_SIZE)
+
+    print(f"Search space: {len(search_plans)} plans ({free_count} free)")
+
+    # Fetch promo rules the search needs but the cache lacks in the background;
+    # combinations with those providers are evaluated once the rules are in
+    candidate_providers = {p.get("provider_id") for p in search_plans} - config["manual_promo_providers"]
+    promo_refresh = promo_scraper.PromoRefresh(region_data["promo_region"], set() if args.no_promo_fetch else candidate_providers)
+    pending_idx = {i for i, p in enumerate(search_plans) if p.get("provider_id") in promo_refresh.due}
+    if promo_refresh.due:
+        print(f"Fetching promo rules for {len(promo_refresh.due)} providers in the background")
     print()
 
     # Find all valid single-plan solutions
     single_plan_solutions = []
 
-    for plan in valid_plans:
+    # Only plans that cover the whole trip alone need a dict, in cost-per-day order
+    single_idx = order[(snapshot.column("data_mb")[order] >= total_data_mb) & (snapshot.column("validity_days")[order] >= trip_days)]
+    for plan in snapshot.records(single_idx, cpd):
         # Check if this single plan meets requirements
         if plan.get("data_mb", 0) >= total_data_mb and plan.get("validity_days", 0) >= trip_days:
             # Valid single plan solution
@@ -515,7 +549,7 @@ def main():
             solution = {
                 "display_cost": display_price,
                 "ranking_cost": display_price,  # No hassle penalty for single plan
-                "cad": display_price * 1.37,
+                "cad": exchange_rates.get_rates(fetch=False).from_usd(display_price, "CAD"),
                 "info": [{
                     "plan": plan.get("plan_name", "Unknown"),
                     "provider": plan.get("provider_name", "Unknown"),
@@ -569,21 +603,32 @@ def main():
     ]
 
     solutions = []
-    counter = 0
 
     # Collect more combo solutions to ensure we don't miss good ones when merging with singles
     COMBO_SEARCH_LIMIT = TOP_N_SOLUTIONS * 5
 
-    for combo_data in tqdm(combo_data_list, desc="Checking combinations", unit="combo"):
-        result = evaluate_combination(combo_data)
+    def keep(index, result):
+        # Ties go to the earlier combination, whatever order they were evaluated in
         if result:
-            counter += 1
+            entry = (-result["ranking_cost"], -index, result)
             if len(solutions) < COMBO_SEARCH_LIMIT:
-                heapq.heappush(solutions, (-result["ranking_cost"], counter, result))
-            elif result["ranking_cost"] < -solutions[0][0]:
-                heapq.heapreplace(solutions, (-result["ranking_cost"], counter, result))
-
-    solutions = [s[2] for s in sorted(solutions, key=lambda x: -x[0])]
+                heapq.heappush(solutions, entry)
+            elif entry[:2] > solutions[0][:2]:
+                heapq.heapreplace(solutions, entry)
+
+    deferred = []
+    for index, combo_data in enumerate(tqdm(combo_data_list, desc="Checking combinations", unit="combo")):
+        if pending_idx and not pending_idx.isdisjoint(combo_data[0]):
+            deferred.append((index, combo_data))
+            continue
+        keep(index, evaluate_combination(combo_data))
+
+    if deferred:
+        promo_refresh.apply(search_plans, default_promo_type)
+        for index, combo_data in tqdm(deferred, desc="Checking combinations (fetched promos)", unit="combo"):
+            keep(index, evaluate_combination(combo_data))
+
+    solutions = [s[2] for s in sorted(solutions, key=lambda x: (-x[0], -x[1]))]
 
     # Combine single-plan and combo solutions
     all_solutions = single_plan_solutions + solutions
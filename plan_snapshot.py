@@ -0,0 +1,182 @@
+"""
+Compiled, memory-mapped plan snapshots for fast optimizer startup.
+
+The optimizers spend most of their startup preparing the same plan list on
+every run: loading the plans, applying plan_overrides.json, tagging promo
+types and filtering. `load_or_compile` runs that preparation once and saves
+the result under scraped_data/snapshots/:
+
+  <tag>_<key>.npy           numeric/bool columns as a NumPy structured array (memory-mapped on load)
+  <tag>_<key>.strings.json  every other column, stored sparsely (row -> value)
+
+<key> hashes the snapshot version, the tag and the contents of the input
+files (plans CSV/store, overrides, promo cache and its journal). When a
+file changes the snapshot is rebuilt. While they are unchanged the optimizer maps the
+arrays, ranks plans by cost per day with NumPy and builds dicts only for
+the plans it actually searches.
+"""
+
+from __future__ import annotations
+
+import glob
+import hashlib
+import json
+import os
+from typing import Callable, Optional
+
+import numpy as np
+
+SNAPSHOT_DIR = os.path.join("scraped_data", "snapshots")
+SNAPSHOT_VERSION = 1
+
+
+def _file_digest(path: str) -> str:
+    if not os.path.exists(path):
+        return "missing"
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def snapshot_key(tag: str, paths: list[str]) -> str:
+    h = hashlib.sha256(f"{SNAPSHOT_VERSION}|{tag}".encode("utf-8"))
+    for path in paths:
+        h.update(f"|{path}={_file_digest(path)}".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _numeric_dtype(values: list) -> Optional[str]:
+    """NumPy dtype for a column whose values are all bool, all int, or int/float; else None."""
+    if all(type(v) is bool for v in values):
+        return "?"
+    if all(type(v) is int for v in values):
+        return "i8"
+    if all(type(v) in (int, float) for v in values):
+        return "f8"
+    return None
+
+
+class PlanSnapshot:
+    def __init__(self, numeric: np.ndarray, objects: dict[str, dict[int, object]], fields: list[str], cached: bool):
+        self.numeric = numeric
+        self.objects = objects
+        self.fields = fields
+        self.cached = cached
+
+    def __len__(self) -> int:
+        return len(self.numeric)
+
+    def column(self, name: str) -> Optional[np.ndarray]:
+        if self.numeric.dtype.names and name in self.numeric.dtype.names:
+            return np.asarray(self.numeric[name])
+        return None
+
+    def record(self, i: int) -> dict:
+        """Rebuild the prepared plan dict for row `i` (same keys and Python types as before compiling)."""
+        i = int(i)
+        row = self.numeric[i]
+        rec = {}
+        for name in self.fields:
+            if self.numeric.dtype.names and name in self.numeric.dtype.names:
+                rec[name] = row[name].item()
+            else:
+                col = self.objects.get(name, {})
+                if i in col:
+                    rec[name] = col[i]
+        return rec
+
+    def cost_per_day(self, daily_data_need: float) -> np.ndarray:
+        """Vectorised `cpd` exactly as the optimizers compute it per plan dict."""
+        n = len(self)
+        usd = self.column("usd_price")
+        eff = self.column("effective_price")
+        usd = usd.astype(float) if usd is not None else np.zeros(n)
+        # `effective_price or usd_price or 0`: NaN is truthy in Python, zero is not
+        fallback = np.where(usd != 0, usd, 0.0)
+        effective = np.where(eff != 0, eff, fallback) if eff is not None else fallback
+        days_covered = np.minimum(self.column("data_mb") / daily_data_need, self.column("validity_days"))
+        return effective / np.maximum(days_covered, 0.1)
+
+    def search_space(self, daily_data_need: float, size: int) -> tuple[list[dict], int, np.ndarray, np.ndarray]:
+        """Free plans plus the `size` cheapest paid plans by cost per day.
+
+        Returns (search_plans, free_count, cpd, order) where `order` is the
+        stable cpd ranking of all plans, matching `valid_plans.sort(key=cpd)`.
+        """
+        cpd = self.cost_per_day(daily_data_need)
+        order = np.argsort(cpd, kind="stable")
+        usd = self.column("usd_price")
+        price = usd.astype(float) if usd is not None else np.zeros(len(self))
+        ranked_price = price[order]
+        free_idx = order[ranked_price == 0]
+        paid_idx = order[ranked_price > 0][:size]
+        plans = self.records(np.concatenate([free_idx, paid_idx]), cpd)
+        return plans, len(free_idx), cpd, order
+
+    def records(self, indices, cpd: Optional[np.ndarray] = None) -> list[dict]:
+        out = []
+        for i in indices:
+            rec = self.record(i)
+            if cpd is not None:
+                rec["cpd"] = float(cpd[i])
+            out.append(rec)
+        return out
+
+
+def _save(base: str, plans: list[dict]) -> None:
+    fields: list[str] = []
+    seen = set()
+    for p in plans:
+        for k in p:
+            if k not in seen:
+                seen.add(k)
+                fields.append(k)
+
+    numeric_fields = []
+    for name in fields:
+        if all(name in p for p in plans):
+            dtype = _numeric_dtype([p[name] for p in plans])
+            if dtype:
+                numeric_fields.append((name, dtype))
+    numeric = np.zeros(len(plans), dtype=numeric_fields)
+    for name, _ in numeric_fields:
+        numeric[name] = [p[name] for p in plans]
+
+    numeric_names = {name for name, _ in numeric_fields}
+    objects = {
+        name: {str(i): p[name] for i, p in enumerate(plans) if name in p}
+        for name in fields if name not in numeric_names
+    }
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    np.save(base + ".npy", numeric, allow_pickle=False)
+    with open(base + ".strings.json", "w", encoding="utf-8") as f:
+        json.dump({"fields": fields, "objects": objects}, f, ensure_ascii=False)
+
+
+def _load(base: str, cached: bool) -> PlanSnapshot:
+    numeric = np.load(base + ".npy", mmap_mode="r", allow_pickle=False)
+    with open(base + ".strings.json", "r", encoding="utf-8") as f:
+        side = json.load(f)
+    objects = {name: {int(i): v for i, v in col.items()} for name, col in side["objects"].items()}
+    return PlanSnapshot(numeric, objects, side["fields"], cached)
+
+
+def load_or_compile(tag: str, input_paths: list[str], prepare: Callable[[], list[dict]]) -> PlanSnapshot:
+    """Return the snapshot for `tag`, rebuilding it with `prepare()` when any input file changed."""
+    base = os.path.join(SNAPSHOT_DIR, f"{tag}_{snapshot_key(tag, input_paths)}")
+    if os.path.exists(base + ".npy") and os.path.exists(base + ".strings.json"):
+        try:
+            return _load(base, cached=True)
+        except (OSError, ValueError, KeyError):
+            pass  # corrupt snapshot: rebuild below
+
+    plans = prepare()
+    for stale in glob.glob(os.path.join(SNAPSHOT_DIR, f"{tag}_*")):
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
+    _save(base, plans)
+    return _load(base, cached=False)
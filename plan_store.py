@@ -0,0 +1,217 @@
+"""
+Typed columnar plan store shared by the scrapers and optimizers.
+
+Scrapers call `save_plans(df, csv_path)`, which writes `<name>.parquet` next to
+the CSV: explicit dtypes, categorical provider columns and native list columns
+for coverage. Integer and flag columns are nullable (Int64 / boolean), so a
+value the source left out stays missing (blank in the CSV) instead of becoming
+0 or False. The CSV is kept as an export (`write_csv=False` skips it).
+
+Optimizers call `load_plans(csv_path, columns=[...])`, which reads only the
+requested columns from the store and falls back to the CSV when the store is
+missing or older than the CSV. Either way list columns come back as lists, and
+`covers_all(df["coverages"], ["DE", "AT"])` filters them by any target set.
+
+Parquet needs pyarrow (or fastparquet). Without one, the store is a pickled
+DataFrame (`<name>.pkl`) with the same dtypes.
+
+Usage (load time / peak RSS, each loader in a fresh process):
+  python plan_store.py bench esim_plans_itinerary.csv
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Explicit schema for the columns the scrapers produce; unknown columns keep their inferred dtype.
+PLAN_DTYPES: dict[str, str] = {
+    "plan_id": "str",
+    "provider_id": "category",
+    "provider_name": "category",
+    "plan_name": "str",
+    "data_mb": "Int64",
+    "validity_days": "Int64",
+    "data_cap_per": "category",
+    "usd_price": "float64",
+    "usd_promo_price": "float64",
+    "effective_price": "float64",
+    "price_cad": "float64",
+    "is_promo": "boolean",
+    "new_user_only": "boolean",
+    "promo_enabled": "boolean",
+    "subscription": "boolean",
+    "pay_as_you_go": "boolean",
+    "possible_throttling": "boolean",
+    "has_5g": "boolean",
+    "has_ads": "boolean",
+    "covers_all_target": "boolean",
+    "covers_usa": "boolean",
+    "speed_limit": "float64",
+    "reduced_speed": "float64",
+    "num_countries": "Int64",
+    "scope": "category",
+    "can_top_up": "boolean",
+    "ekyc": "boolean",
+    "tethering": "boolean",
+}
+LIST_COLUMNS = ["countries", "raw_coverages", "coverages"]
+
+
+def _parquet_engine() -> str | None:
+    for engine in ("pyarrow", "fastparquet"):
+        if importlib.util.find_spec(engine) is not None:
+            return engine
+    return None
+
+
+def store_path(csv_path: str) -> str:
+    base = os.path.splitext(csv_path)[0]
+    return base + (".parquet" if _parquet_engine() else ".pkl")
+
+
+def decode_list(value) -> list:
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str):
+        try:
+            decoded = json.loads(value)
+            return list(decoded) if isinstance(decoded, (list, tuple)) else []
+        except ValueError:
+            return []
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return []
+    return list(value)  # sets, tuples, numpy arrays from Parquet
+
+
+def covers_all(coverages: pd.Series, targets) -> pd.Series:
+    """True where a plan's coverage list contains every code in `targets` (vectorised over all plans)."""
+    targets = set(targets)
+    if not targets:
+        return pd.Series(True, index=coverages.index)
+    exploded = coverages.reset_index(drop=True).explode()
+    hits = exploded[exploded.isin(targets)].groupby(level=0).nunique()
+    covered = hits.reindex(range(len(coverages)), fill_value=0).to_numpy() == len(targets)
+    return pd.Series(covered, index=coverages.index)
+
+
+def coerce_plan_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Apply PLAN_DTYPES and turn JSON-in-CSV coverage columns into lists."""
+    df = df.copy()
+    for col in LIST_COLUMNS:
+        if col in df.columns:
+            df[col] = [decode_list(v) for v in df[col]]
+    for col, dtype in PLAN_DTYPES.items():
+        if col not in df.columns:
+            continue
+        try:
+            if dtype == "boolean":
+                df[col] = df[col].astype("boolean")
+            elif dtype == "Int64":
+                df[col] = np.trunc(pd.to_numeric(df[col], errors="coerce")).astype("Int64")
+            elif dtype == "float64":
+                df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+            else:
+                df[col] = df[col].astype(dtype)
+        except (TypeError, ValueError):
+            pass  # leave an unexpected column as-is rather than failing the scrape
+    return df
+
+
+def save_plans(df: pd.DataFrame, csv_path: str, write_csv: bool = True) -> str:
+    """Write the typed store (and optionally the CSV export) for `csv_path`. Returns the store path."""
+    typed = coerce_plan_dtypes(df)
+    if write_csv:
+        export = typed.copy()
+        for col in LIST_COLUMNS:
+            if col in export.columns:
+                export[col] = [json.dumps(v) for v in export[col]]
+        export.to_csv(csv_path, index=False)
+    # Written after the CSV so the store is never considered stale relative to its own export
+    path = store_path(csv_path)
+    engine = _parquet_engine()
+    if engine:
+        typed.to_parquet(path, index=False, engine=engine)
+    else:
+        typed.to_pickle(path)
+    return path
+
+
+def _fresh_store(csv_path: str) -> str | None:
+    candidates = [os.path.splitext(csv_path)[0] + ".pkl"]
+    if _parquet_engine():
+        candidates.insert(0, os.path.splitext(csv_path)[0] + ".parquet")
+    csv_mtime = os.path.getmtime(csv_path) if os.path.exists(csv_path) else None
+    for path in candidates:
+        if os.path.exists(path) and (csv_mtime is None or os.path.getmtime(path) >= csv_mtime):
+            return path
+    return None
+
+
+def plans_exist(csv_path: str) -> bool:
+    return os.path.exists(csv_path) or _fresh_store(csv_path) is not None
+
+
+def load_plans(csv_path: str, columns: list[str] | None = None) -> pd.DataFrame:
+    """Load plans for `csv_path`, preferring the typed store and reading only `columns` if given."""
+    path = _fresh_store(csv_path)
+    if path and path.endswith(".parquet"):
+        if columns is not None:
+            try:
+                return pd.read_parquet(path, engine=_parquet_engine(), columns=columns)
+            except (KeyError, ValueError):
+                pass  # some requested column is absent in this store; read all and select below
+        df = pd.read_parquet(path, engine=_parquet_engine())
+    elif path:
+        df = pd.read_pickle(path)
+    else:
+        header = pd.read_csv(csv_path, nrows=0).columns
+        usecols = [c for c in columns if c in header] if columns is not None else None
+        return coerce_plan_dtypes(pd.read_csv(csv_path, usecols=usecols))
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    return df
+
+
+def _bench_one(mode: str, csv_path: str) -> None:
+    import resource
+    import time
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if mode == "csv":
+        df = pd.read_csv(csv_path)
+        for col in LIST_COLUMNS:
+            if col in df.columns:
+                df[col] = [decode_list(v) for v in df[col]]
+    else:
+        df = load_plans(csv_path)
+    records = df.to_dict("records")
+    elapsed = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{mode:>5}: {len(records)} rows in {elapsed * 1000:.0f} ms, peak RSS +{(after - before) / 1024:.1f} MB")
+
+
+def bench(csv_path: str) -> None:
+    if not _fresh_store(csv_path):
+        save_plans(pd.read_csv(csv_path), csv_path, write_csv=False)
+    engine = _parquet_engine()
+    fmt = f"Parquet via {engine}" if engine else "pickle fallback; install pyarrow to measure Parquet"
+    print(f"Store: {_fresh_store(csv_path)} ({fmt})")
+    for mode in ("csv", "store"):
+        subprocess.run([sys.executable, __file__, "_bench_one", mode, csv_path], check=False)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "bench":
+        bench(sys.argv[2])
+    elif len(sys.argv) >= 4 and sys.argv[1] == "_bench_one":
+        _bench_one(sys.argv[2], sys.argv[3])
+    else:
+        print(__doc__)
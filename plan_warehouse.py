@@ -0,0 +1,467 @@
+"""
+Local SQLite warehouse for every scraped plan, queryable across regions.
+
+The scrapers upsert into scraped_data/esim_plans.db after writing their CSV:
+
+  providers      provider_id -> provider_name
+  plans          one row per plan_id (latest scrape wins)
+  plan_sources   which scrape (europe, usa, itinerary, ...) last returned each plan
+  plan_coverage  plan_id x country (ISO code), with data_mb / validity_days /
+                 usd_price copied in so a country + capacity + price query is
+                 answered from the (country, data_mb, validity_days, usd_price) index
+
+Price history is append-only and stores deltas only:
+
+  scrapes        one row per upsert (source, time, plans seen / changed / removed)
+  plan_hashes    current content hash of each (source, plan_id)
+  plan_history   a row only when a plan's price/promo/capacity fields change,
+                 appears, or disappears (removed = 1)
+
+Unchanged plans match their stored hash and add nothing, so history grows
+with churn rather than catalogue size. `plans_as_of(source, when)` rebuilds
+the catalogue at any past time from the latest version <= `when` of each plan.
+
+The database runs in WAL mode so an optimizer can read while a scraper writes.
+Each upsert (history included) is a single transaction of executemany batches.
+
+Usage:
+  python plan_warehouse.py import                       (load existing esim_plans_*.csv)
+  python plan_warehouse.py query --country DE --country AT --min-data-gb 5 --days 10
+  python plan_warehouse.py stats
+  python plan_warehouse.py history <plan_id>
+  python plan_warehouse.py as-of europe 2026-01-10
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Iterable, Optional
+
+import pandas as pd
+
+import exchange_rates
+import plan_store
+
+DB_PATH = os.path.join("scraped_data", "esim_plans.db")
+
+# plans table columns (besides plan_id) with their SQLite types
+PLAN_FIELDS: dict[str, str] = {
+    "provider_id": "TEXT",
+    "plan_name": "TEXT",
+    "data_mb": "INTEGER",
+    "validity_days": "INTEGER",
+    "data_cap_per": "TEXT",
+    "usd_price": "REAL",
+    "usd_promo_price": "REAL",
+    "effective_price": "REAL",
+    "price_cad": "REAL",
+    "is_promo": "INTEGER",
+    "new_user_only": "INTEGER",
+    "promo_enabled": "INTEGER",
+    "can_top_up": "INTEGER",
+    "subscription": "INTEGER",
+    "pay_as_you_go": "INTEGER",
+    "ekyc": "INTEGER",
+    "speed_limit": "REAL",
+    "reduced_speed": "REAL",
+    "possible_throttling": "INTEGER",
+    "has_5g": "INTEGER",
+    "tethering": "INTEGER",
+    "has_ads": "INTEGER",
+    "num_countries": "INTEGER",
+    "scope": "TEXT",
+}
+
+# Fields whose changes are recorded in plan_history
+HISTORY_FIELDS = [
+    "usd_price", "usd_promo_price", "effective_price", "is_promo", "promo_enabled",
+    "new_user_only", "data_mb", "validity_days", "data_cap_per",
+]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS providers (
+    provider_id   TEXT PRIMARY KEY,
+    provider_name TEXT,
+    updated_at    REAL
+);
+CREATE TABLE IF NOT EXISTS plans (
+    plan_id    TEXT PRIMARY KEY,
+    {", ".join(f"{name} {sql_type}" for name, sql_type in PLAN_FIELDS.items())},
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS plan_sources (
+    source  TEXT NOT NULL,
+    plan_id TEXT NOT NULL,
+    PRIMARY KEY (source, plan_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS plan_coverage (
+    plan_id       TEXT NOT NULL,
+    country       TEXT NOT NULL,
+    data_mb       INTEGER,
+    validity_days INTEGER,
+    usd_price     REAL,
+    PRIMARY KEY (plan_id, country)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_coverage_lookup ON plan_coverage (country, data_mb, validity_days, usd_price);
+CREATE INDEX IF NOT EXISTS idx_plans_provider ON plans (provider_id);
+CREATE INDEX IF NOT EXISTS idx_plans_price ON plans (usd_price);
+CREATE INDEX IF NOT EXISTS idx_plans_capacity ON plans (data_mb, validity_days, usd_price);
+CREATE TABLE IF NOT EXISTS scrapes (
+    scrape_id  INTEGER PRIMARY KEY,
+    source     TEXT NOT NULL,
+    scraped_at REAL NOT NULL,
+    plans      INTEGER,
+    changed    INTEGER,
+    removed    INTEGER
+);
+CREATE TABLE IF NOT EXISTS plan_hashes (
+    source       TEXT NOT NULL,
+    plan_id      TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    PRIMARY KEY (source, plan_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS plan_history (
+    source       TEXT NOT NULL,
+    plan_id      TEXT NOT NULL,
+    scraped_at   REAL NOT NULL,
+    content_hash TEXT,
+    removed      INTEGER NOT NULL DEFAULT 0,
+    {", ".join(f"{name} {PLAN_FIELDS[name]}" for name in HISTORY_FIELDS)},
+    PRIMARY KEY (source, plan_id, scraped_at)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_history_plan ON plan_history (plan_id, scraped_at);
+"""
+
+
+def connect(db_path: str = DB_PATH) -> sqlite3.Connection:
+    """Open (creating if needed) the warehouse in WAL mode."""
+    if os.path.dirname(db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _sql_value(value):
+    """Plain Python value for sqlite3 (NaN/None -> NULL, NumPy scalars unwrapped)."""
+    if value is None:
+        return None
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def content_hash(values: list) -> str:
+    """Stable hash of a plan's HISTORY_FIELDS values."""
+    return hashlib.sha1(json.dumps(values, separators=(",", ":")).encode("utf-8")).hexdigest()[:16]
+
+
+def _record_history(conn: sqlite3.Connection, source: str, rows: dict[str, list], now: float) -> tuple[int, int]:
+    """Append deltas for `source` to plan_history; returns (changed, removed).
+
+    `rows` maps plan_id -> HISTORY_FIELDS values for the current scrape.
+    """
+    previous = dict(conn.execute("SELECT plan_id, content_hash FROM plan_hashes WHERE source = ?", (source,)))
+    hashes = {pid: content_hash(values) for pid, values in rows.items()}
+    changed = [pid for pid, h in hashes.items() if previous.get(pid) != h]
+    removed = [pid for pid in previous if pid not in hashes]
+
+    columns = ["source", "plan_id", "scraped_at", "content_hash", "removed"] + HISTORY_FIELDS
+    conn.executemany(
+        f"INSERT OR REPLACE INTO plan_history ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        [[source, pid, now, hashes[pid], 0] + rows[pid] for pid in changed]
+        + [[source, pid, now, None, 1] + [None] * len(HISTORY_FIELDS) for pid in removed],
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO plan_hashes (source, plan_id, content_hash) VALUES (?, ?, ?)",
+        ((source, pid, hashes[pid]) for pid in changed),
+    )
+    conn.executemany("DELETE FROM plan_hashes WHERE source = ? AND plan_id = ?", ((source, pid) for pid in removed))
+    conn.execute(
+        "INSERT INTO scrapes (source, scraped_at, plans, changed, removed) VALUES (?, ?, ?, ?, ?)",
+        (source, now, len(rows), len(changed), len(removed)),
+    )
+    return len(changed), len(removed)
+
+
+def coverage_from_raw(raw_plans: Iterable[dict]) -> dict[str, list[str]]:
+    """plan_id -> ISO country codes, from raw esimdb API plans."""
+    return {p["_id"]: list(p.get("coverages") or []) for p in raw_plans if p.get("_id")}
+
+
+def upsert_plans(
+    df: pd.DataFrame,
+    source: str,
+    coverages: Optional[dict[str, list[str]]] = None,
+    db_path: str = DB_PATH,
+) -> int:
+    """Insert or update every plan in `df` and record it under `source`.
+
+    `coverages` maps plan_id to ISO country codes; when omitted a
+    `coverages` (or `raw_coverages`) column is used if present. Plans from a previous scrape
+    of `source` that are missing now are dropped from that source only.
+    Price/promo/capacity changes are appended to plan_history.
+    Returns the number of plans written.
+    """
+    if len(df) == 0 or "plan_id" not in df.columns:
+        return 0
+    coverage_column = next((c for c in ("coverages", "raw_coverages") if c in df.columns), None)
+    if coverages is None and coverage_column:
+        coverages = {pid: plan_store.decode_list(cov) for pid, cov in zip(df["plan_id"], df[coverage_column])}
+
+    now = time.time()
+    records = df.to_dict("records")
+    fields = [name for name in PLAN_FIELDS if name in df.columns]
+
+    plan_rows = []
+    provider_rows = {}
+    for rec in records:
+        plan_id = _sql_value(rec.get("plan_id"))
+        if not plan_id:
+            continue
+        plan_rows.append([plan_id] + [_sql_value(rec.get(name)) for name in fields] + [now])
+        provider_id = _sql_value(rec.get("provider_id"))
+        if provider_id:
+            provider_rows[provider_id] = (provider_id, _sql_value(rec.get("provider_name")), now)
+
+    columns = ["plan_id"] + fields + ["updated_at"]
+    updates = ", ".join(f"{name} = excluded.{name}" for name in columns[1:])
+    plan_sql = (
+        f"INSERT INTO plans ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT(plan_id) DO UPDATE SET {updates}"
+    )
+    plan_ids = [row[0] for row in plan_rows]
+    capacity = {row[0]: dict(zip(columns, row)) for row in plan_rows}
+    history_rows = {pid: [values.get(name) for name in HISTORY_FIELDS] for pid, values in capacity.items()}
+
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT INTO providers (provider_id, provider_name, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(provider_id) DO UPDATE SET provider_name = excluded.provider_name, updated_at = excluded.updated_at",
+                provider_rows.values(),
+            )
+            conn.executemany(plan_sql, plan_rows)
+
+            conn.execute("DELETE FROM plan_sources WHERE source = ?", (source,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO plan_sources (source, plan_id) VALUES (?, ?)",
+                ((source, pid) for pid in plan_ids),
+            )
+
+            # Keep the denormalised capacity/price columns of existing coverage rows current
+            conn.executemany(
+                "UPDATE plan_coverage SET data_mb = ?, validity_days = ?, usd_price = ? WHERE plan_id = ?",
+                (
+                    (capacity[pid].get("data_mb"), capacity[pid].get("validity_days"), capacity[pid].get("usd_price"), pid)
+                    for pid in plan_ids
+                ),
+            )
+            if coverages:
+                known = [pid for pid in plan_ids if pid in coverages]
+                conn.executemany("DELETE FROM plan_coverage WHERE plan_id = ?", ((pid,) for pid in known))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO plan_coverage (plan_id, country, data_mb, validity_days, usd_price) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (
+                        (pid, country, capacity[pid].get("data_mb"), capacity[pid].get("validity_days"), capacity[pid].get("usd_price"))
+                        for pid in known
+                        for country in coverages[pid]
+                    ),
+                )
+
+            changed, removed = _record_history(conn, source, history_rows, now)
+        print(f"Price history ({source}): {changed} new/changed, {removed} removed, {len(plan_ids) - changed} unchanged")
+    finally:
+        conn.close()
+    return len(plan_rows)
+
+
+def query_plans(
+    countries: Optional[list[str]] = None,
+    source: Optional[str] = None,
+    min_data_mb: float = 0,
+    min_validity_days: float = 0,
+    max_price: Optional[float] = None,
+    provider_id: Optional[str] = None,
+    db_path: str = DB_PATH,
+) -> pd.DataFrame:
+    """Candidate plans covering every country in `countries` (ISO codes) with enough data and days.
+
+    Returns the plan columns plus provider_name and a `coverages` list column,
+    cheapest first.
+    """
+    where = ["p.data_mb >= ?", "p.validity_days >= ?"]
+    params: list = [min_data_mb, min_validity_days]
+    if max_price is not None:
+        where.append("p.usd_price <= ?")
+        params.append(max_price)
+    if countries:
+        countries = sorted({c.upper() for c in countries})
+        price_filter = " AND usd_price <= ?" if max_price is not None else ""
+        where.append(
+            "p.plan_id IN (SELECT plan_id FROM plan_coverage "
+            f"WHERE country IN ({', '.join('?' * len(countries))}) AND data_mb >= ? AND validity_days >= ?{price_filter} "
+            "GROUP BY plan_id HAVING COUNT(*) = ?)"
+        )
+        params += countries + [min_data_mb, min_validity_days]
+        if max_price is not None:
+            params.append(max_price)
+        params.append(len(countries))
+    if source:
+        where.append("p.plan_id IN (SELECT plan_id FROM plan_sources WHERE source = ?)")
+        params.append(source)
+    if provider_id:
+        where.append("p.provider_id = ?")
+        params.append(provider_id)
+
+    sql = (
+        "SELECT p.*, pr.provider_name, "
+        "(SELECT group_concat(c.country, ',') FROM plan_coverage c WHERE c.plan_id = p.plan_id) AS coverages "
+        "FROM plans p LEFT JOIN providers pr ON pr.provider_id = p.provider_id "
+        f"WHERE {' AND '.join(where)} ORDER BY p.usd_price"
+    )
+    conn = connect(db_path)
+    try:
+        df = pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+    df["coverages"] = [sorted(c.split(",")) if c else [] for c in df["coverages"]]
+    return df.drop(columns=["updated_at"])
+
+
+def _as_timestamp(when) -> float:
+    if isinstance(when, (int, float)):
+        return float(when)
+    if isinstance(when, datetime):
+        return when.timestamp()
+    return datetime.fromisoformat(str(when)).timestamp()
+
+
+def plans_as_of(source: str, when, db_path: str = DB_PATH) -> pd.DataFrame:
+    """The `source` catalogue (HISTORY_FIELDS per plan) as it was at `when`.
+
+    `when` is a Unix timestamp, datetime or ISO date string. Each plan's row is
+    its latest history entry at or before `when`; plans removed by then are
+    excluded. `price_cad` uses the exchange rates recorded for that day.
+    """
+    sql = (
+        "SELECT h.* FROM plan_history h "
+        "WHERE h.source = ? AND h.scraped_at = ("
+        "  SELECT MAX(scraped_at) FROM plan_history "
+        "  WHERE source = h.source AND plan_id = h.plan_id AND scraped_at <= ?"
+        ") AND h.removed = 0 ORDER BY h.plan_id"
+    )
+    conn = connect(db_path)
+    try:
+        df = pd.read_sql_query(sql, conn, params=[source, _as_timestamp(when)])
+    finally:
+        conn.close()
+    price = df["effective_price"]
+    df["price_cad"] = exchange_rates.rates_on(when).from_usd(price.where(price != 0), "CAD")
+    return df.drop(columns=["removed"])
+
+
+def price_history(plan_id: str, db_path: str = DB_PATH) -> pd.DataFrame:
+    """Every recorded version of `plan_id`, oldest first."""
+    conn = connect(db_path)
+    try:
+        return pd.read_sql_query(
+            "SELECT * FROM plan_history WHERE plan_id = ? ORDER BY scraped_at", conn, params=[plan_id]
+        )
+    finally:
+        conn.close()
+
+
+def import_existing(pattern: str = "esim_plans_*.csv", db_path: str = DB_PATH) -> None:
+    """Load already-scraped plan files into the warehouse (source = file name suffix)."""
+    for csv_path in sorted(glob.glob(pattern)):
+        source = os.path.splitext(os.path.basename(csv_path))[0].replace("esim_plans_", "")
+        if source.endswith("_filtered"):
+            continue  # subset of the unfiltered file
+        df = plan_store.load_plans(csv_path)
+        count = upsert_plans(df, source, db_path=db_path)
+        print(f"{csv_path}: {count} plans -> {db_path} ({source})")
+
+
+def stats(db_path: str = DB_PATH) -> None:
+    conn = connect(db_path)
+    try:
+        for table in ("providers", "plans", "plan_sources", "plan_coverage", "scrapes", "plan_history"):
+            (count,) = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+            print(f"{table:>14}: {count}")
+        for source, count in conn.execute("SELECT source, COUNT(*) FROM plan_sources GROUP BY source ORDER BY source"):
+            print(f"{'':>14}  {source}: {count}")
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite plan warehouse")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("import", help="Load existing esim_plans_*.csv files")
+    sub.add_parser("stats", help="Row counts per table and source")
+    q = sub.add_parser("query", help="Plans covering the given countries")
+    q.add_argument("--country", action="append", default=[], help="ISO country code (repeatable)")
+    q.add_argument("--source", help="Scrape source, e.g. europe or usa")
+    q.add_argument("--min-data-gb", type=float, default=0)
+    q.add_argument("--days", type=float, default=0, help="Minimum validity in days")
+    q.add_argument("--max-price", type=float)
+    q.add_argument("--limit", type=int, default=20)
+    h = sub.add_parser("history", help="Recorded price/capacity versions of one plan")
+    h.add_argument("plan_id")
+    a = sub.add_parser("as-of", help="Catalogue of a source at a past time")
+    a.add_argument("source")
+    a.add_argument("when", help="ISO date/time or Unix timestamp")
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+
+    if args.command == "import":
+        import_existing(db_path=args.db)
+    elif args.command == "stats":
+        stats(args.db)
+    elif args.command == "history":
+        df = price_history(args.plan_id, db_path=args.db)
+        df["scraped_at"] = pd.to_datetime(df["scraped_at"], unit="s")
+        print(df.to_string(index=False) if len(df) else f"No history for {args.plan_id}")
+    elif args.command == "as-of":
+        when = float(args.when) if args.when.replace(".", "", 1).isdigit() else args.when
+        start = time.perf_counter()
+        df = plans_as_of(args.source, when, db_path=args.db)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{len(df)} {args.source} plans as of {args.when} ({elapsed:.1f} ms)")
+        if len(df):
+            print(df[["plan_id", "data_mb", "validity_days", "usd_price", "usd_promo_price"]].head(20).to_string(index=False))
+    else:
+        start = time.perf_counter()
+        df = query_plans(
+            countries=args.country,
+            source=args.source,
+            min_data_mb=args.min_data_gb * 1024,
+            min_validity_days=args.days,
+            max_price=args.max_price,
+            db_path=args.db,
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{len(df)} plans ({elapsed:.1f} ms)")
+        if len(df):
+            cols = ["provider_name", "plan_name", "data_mb", "validity_days", "usd_price"]
+            print(df[cols].head(args.limit).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,651 @@
+"""
+PROMO RECURRENCE SCRAPER - all regions, async, adaptive concurrency.
+
+Visits esimdb provider pages to find whether each provider's promo code is
+"One-time" or "Unlimited" use (not available in the API), plus the code and
+discount. Results go to the per-region caches the optimizers read:
+
+  europe -> promo_recurrence_cache.json       (https://esimdb.com/region/europe/{slug})
+  usa    -> promo_recurrence_cache_usa.json   (https://esimdb.com/usa/{slug})
+
+Requesting several regions fetches each provider page once and writes the
+result to every region cache that is missing it (the badge is per provider,
+not per region). Requests share one pooled session and run under an AIMD
+limit: the number in flight grows by one per window of fast successes and
+halves on 429/5xx or a response much slower than the running average.
+Every request also passes through the process-wide request_scheduler
+(per-host token bucket, global cap, Retry-After pauses), so the AIMD limit
+only ever lowers what that budget allows; a 429 is waited out there alone.
+
+Cached entries carry `scraped_at` plus the page's ETag / Last-Modified. A
+run fetches only providers that are missing or older than --ttl-days
+(default 7); stale ones are revalidated with a conditional GET, and a 304
+just refreshes `scraped_at`. A provider whose fetch fails keeps its last
+good entry and is not tried again for an hour, doubling per consecutive
+failure (capped at the TTL). Entries from before TTLs get the cache file's
+mtime as `scraped_at`. Results are appended to
+<cache>.journal.jsonl as they arrive and compacted into the JSON cache
+when the run ends (or replayed by the next run after a crash). Appends and
+compactions take <cache>.lock, and a compaction re-reads the journal first,
+so lines another process wrote meanwhile are kept. The optimizers' on-demand
+fetches (`PromoRefresh`) only append.
+
+Pages are parsed with lxml: one compiled XPath finds the badge on lxml's C
+tree and precompiled regexes pick out the code and discount. No
+BeautifulSoup tree is built; BeautifulSoup remains the fallback when lxml
+is missing or rejects a page.
+
+Usage:
+  python promo_scraper.py --region europe
+  python promo_scraper.py --region europe --region usa
+  python promo_scraper.py --all [--max-concurrency 32] [--ttl-days 7]
+  python promo_scraper.py --all --save-html scraped_data/promo_html   (keep the pages)
+  python promo_scraper.py --bench scraped_data/promo_html             (parse time per page)
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import json
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+try:
+    from tqdm import tqdm
+except ImportError:
+    tqdm = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: journal writers are not serialised across processes
+    fcntl = None
+
+import http_client
+import provider_directory
+import request_scheduler
+
+USER_AGENT = "Mozilla/5.0"
+
+INITIAL_CONCURRENCY = 4
+MAX_CONCURRENCY = 32
+MAX_ATTEMPTS = 4
+PROMO_TTL_DAYS = 7
+FAILURE_BACKOFF = 3600  # seconds before a failed provider is tried again; doubles per consecutive failure
+
+
+@dataclass(frozen=True)
+class PromoRegion:
+    url_template: str
+    cache_file: str
+
+
+PROMO_REGIONS: dict[str, PromoRegion] = {
+    "europe": PromoRegion("https://esimdb.com/region/europe/{slug}", "promo_recurrence_cache.json"),
+    "usa": PromoRegion("https://esimdb.com/usa/{slug}", "promo_recurrence_cache_usa.json"),
+}
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for the page fetches.
+
+    Starts by doubling the limit every round trip until the first decrease,
+    then additive increase: +1 slot per `limit` successful, not-slow responses.
+    Multiplicative decrease: halve on 429/5xx/errors or when a response takes
+    more than `slow_factor` x the running average, at most once per average
+    latency so a burst of failures from one window counts once.
+    """
+
+    def __init__(self, initial: int = INITIAL_CONCURRENCY, minimum: int = 1, maximum: int = MAX_CONCURRENCY, slow_factor: float = 3.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.slow_factor = slow_factor
+        self.in_flight = 0
+        self.avg_latency: Optional[float] = None
+        self.peak = initial
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, ok: bool, latency: float) -> None:
+        async with self._cond:
+            self.in_flight -= 1
+            slow = self.avg_latency is not None and latency > self.slow_factor * self.avg_latency
+            if ok:
+                self.avg_latency = latency if self.avg_latency is None else 0.8 * self.avg_latency + 0.2 * latency
+            now = time.monotonic()
+            if not ok or slow:
+                if now - self._last_decrease > (self.avg_latency or 1.0):
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self.decreases += 1
+                    self._last_decrease = now
+            elif self.decreases == 0:
+                self.limit = min(self.maximum, self.limit + 1)  # slow start: double per round trip
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.peak = max(self.peak, int(self.limit))
+            self._cond.notify_all()
+
+
+# The promo type is in a div with classes: badge rounded-full text-caption
+BADGE_CLASSES = ("badge", "rounded-full", "text-caption")
+PROMO_CODE_RE = re.compile(r"([A-Z0-9]+ESIMDB[A-Z0-9]*|ESIMDB[A-Z0-9]+)")
+PERCENT_RE = re.compile(r"GET\s+(\d+)\s*%\s*OFF", re.IGNORECASE)
+DOLLAR_RE = re.compile(r"\$(\d+(?:\.\d+)?)\s*(?:off|discount)", re.IGNORECASE)
+
+if etree is not None:
+    # Same match as the soup filter below: the class attribute contains all three names
+    BADGE_XPATH = etree.XPath("//*[" + " and ".join(f"contains(@class, '{c}')" for c in BADGE_CLASSES) + "]")
+    TEXT_XPATH = etree.XPath(".//text()")
+
+
+def _badge_texts_lxml(html: str) -> list[str]:
+    """Badge texts via lxml's C tree and one compiled XPath (no Python object per element)."""
+    if not all(c in html for c in BADGE_CLASSES):
+        return []
+    root = etree.HTML(html)
+    if root is None:
+        return []
+    return ["".join(t.strip() for t in TEXT_XPATH(badge)) for badge in BADGE_XPATH(root)]
+
+
+def _badge_texts_soup(html: str) -> list[str]:
+    soup = BeautifulSoup(html, "lxml" if etree is not None else "html.parser")
+    badges = soup.find_all(class_=lambda c: c and all(name in c for name in BADGE_CLASSES))
+    return [badge.get_text(strip=True) for badge in badges]
+
+
+def parse_promo_html(html: str, fast: bool = True) -> tuple[str, Optional[str], object]:
+    """(promo_type, promo_code, promo_discount) from a provider page.
+
+    `fast` uses the lxml XPath path and falls back to BeautifulSoup if lxml
+    is missing or rejects the page; `fast=False` always uses BeautifulSoup.
+    """
+    texts = None
+    if fast and etree is not None:
+        try:
+            texts = _badge_texts_lxml(html)
+        except (ValueError, etree.LxmlError):
+            texts = None
+    if texts is None:
+        texts = _badge_texts_soup(html)
+
+    promo_type = "unknown"
+    for text in texts:
+        text = text.lower()
+        if "one-time" in text or "one time" in text:
+            promo_type = "one-time"
+            break
+        elif "unlimited" in text:
+            promo_type = "unlimited"
+            break
+
+    promo_code = None
+    code_match = PROMO_CODE_RE.search(html)
+    if code_match:
+        promo_code = code_match.group(1)
+
+    promo_discount = None
+    discount_match = PERCENT_RE.search(html)
+    if discount_match:
+        promo_discount = int(discount_match.group(1))
+
+    # Look for dollar discount
+    if not promo_discount:
+        dollar_match = DOLLAR_RE.search(html)
+        if dollar_match:
+            promo_discount = f"${dollar_match.group(1)}"
+
+    return promo_type, promo_code, promo_discount
+
+
+def bench(corpus_dir: str) -> None:
+    """Parse every saved page in `corpus_dir` with both paths; report time per page and disagreements."""
+    pages = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.endswith(".html"):
+            with open(os.path.join(corpus_dir, name), "r", encoding="utf-8") as f:
+                pages.append((name, f.read()))
+    if not pages:
+        print(f"No .html pages in {corpus_dir} (capture some with --save-html {corpus_dir})")
+        return
+
+    results = {}
+    for label, fast in (("BeautifulSoup", False), ("lxml XPath", True)):
+        times, parsed = [], []
+        for _, html in pages:
+            start = time.perf_counter()
+            parsed.append(parse_promo_html(html, fast=fast))
+            times.append(time.perf_counter() - start)
+        times.sort()
+        results[label] = parsed
+        print(
+            f"{label:14s}: {len(pages)} pages, mean {sum(times) / len(times) * 1000:7.2f} ms/page, "
+            f"median {times[len(times) // 2] * 1000:7.2f} ms, max {times[-1] * 1000:7.2f} ms"
+        )
+    mismatches = [name for (name, _), a, b in zip(pages, results["BeautifulSoup"], results["lxml XPath"]) if a != b]
+    print(f"Disagreements: {len(mismatches)}" + (f" ({', '.join(mismatches[:5])})" if mismatches else ""))
+
+
+def get_all_providers() -> list[dict]:
+    """Provider records (`_id`, `name`, `slug`, ...) from the shared provider directory."""
+    return provider_directory.get_directory().records()
+
+
+def journal_path(cache_path: str) -> str:
+    return cache_path + ".journal.jsonl"
+
+
+def load_cache(path: str) -> dict:
+    """Compacted cache plus any journal entries an interrupted run left behind.
+
+    Entries written before TTLs existed get the cache file's mtime as
+    `scraped_at`; the next compaction stores it, so the backfill happens once.
+    """
+    cache = {}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            cache = json.load(f)
+        mtime = os.path.getmtime(path)
+        for entry in cache.values():
+            entry.setdefault("scraped_at", mtime)
+    journal = journal_path(path)
+    if os.path.exists(journal):
+        with open(journal, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from a crash
+                cache[record["id"]] = record["entry"]
+    return cache
+
+
+def is_stale(entry: dict, ttl_seconds: float, now: float) -> bool:
+    """Whether `entry` should be fetched again.
+
+    After a failed fetch (`failed_at`) the provider waits FAILURE_BACKOFF,
+    doubled per consecutive failure and capped at the TTL; after that, error
+    entries are stale and kept good entries follow their `scraped_at`.
+    """
+    failed_at = entry.get("failed_at")
+    if failed_at is not None:
+        backoff = min(FAILURE_BACKOFF * 2 ** (entry.get("failures", 1) - 1), ttl_seconds)
+        if now - failed_at < backoff:
+            return False
+    if entry.get("promo_type") == "error":
+        return True
+    return now - entry.get("scraped_at", 0) >= ttl_seconds
+
+
+@contextlib.contextmanager
+def journal_lock(cache_path: str):
+    """Exclusive lock, across processes, on `cache_path` and its journal."""
+    if fcntl is None:
+        yield
+        return
+    with open(cache_path + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class CacheJournal:
+    """Append-only writes for one region cache; `compact` folds them back into the JSON file.
+
+    Each result is one JSONL line, written under `journal_lock` (so a crash
+    loses at most the line being written), instead of a rewrite of the
+    whole cache.
+    """
+
+    def __init__(self, path: str, cache: dict):
+        self.path = path
+        self.cache = cache
+        self.dirty = os.path.exists(journal_path(path))
+
+    def append(self, provider_id: str, entry: dict) -> None:
+        self.cache[provider_id] = entry
+        # Reopened per line: a compaction in another process may have removed the file
+        with journal_lock(self.path), open(journal_path(self.path), "a", encoding="utf-8") as f:
+            f.write(json.dumps({"id": provider_id, "entry": entry}) + "\n")
+        self.dirty = True
+
+    def compact(self) -> None:
+        """Rewrite the JSON cache from its current file plus journal, then drop the journal."""
+        if not self.dirty:
+            return
+        with journal_lock(self.path):
+            # Re-read rather than write self.cache: other processes may have appended since it was loaded
+            cache = load_cache(self.path)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(cache, f, indent=2)
+            os.replace(tmp, self.path)
+            try:
+                os.remove(journal_path(self.path))
+            except FileNotFoundError:
+                pass
+        self.cache.update(cache)
+        self.dirty = False
+
+
+class PromoFetcher:
+    """Fetches provider pages over one pooled session under an AdaptiveLimiter."""
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, initial: int = INITIAL_CONCURRENCY, save_html: Optional[str] = None):
+        self.save_html = save_html
+        if save_html:
+            os.makedirs(save_html, exist_ok=True)
+        self.session = http_client.create_session(retries=0, pool_size=max_concurrency)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency)
+        self.limiter = AdaptiveLimiter(initial=initial, maximum=max_concurrency)
+        self.pages = 0
+        self.not_modified = 0
+        self.errors = 0
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+    def _get(self, url: str, headers: dict):
+        # Latency excludes time spent queued in the shared request scheduler,
+        # so waiting out its rate limit does not read as a slow server
+        request_scheduler.SCHEDULER.pop_wait()
+        start = time.perf_counter()
+        try:
+            resp = self.session.get(url, headers={"User-Agent": USER_AGENT, **headers}, timeout=30)
+            return resp.status_code, resp.text, time.perf_counter() - start - request_scheduler.SCHEDULER.pop_wait(), resp.headers
+        except Exception as e:
+            return None, str(e), time.perf_counter() - start - request_scheduler.SCHEDULER.pop_wait(), {}
+
+    async def fetch_page(self, url: str, headers: Optional[dict] = None) -> tuple[Optional[int], str, dict]:
+        """GET `url`, retrying 429/5xx/connection errors; returns (status, body, response headers).
+
+        A 429 is retried as soon as the request scheduler's pause for it ends;
+        5xx and connection errors back off (honouring Retry-After) first.
+        """
+        loop = asyncio.get_running_loop()
+        status, body, resp_headers = None, "", {}
+        for attempt in range(MAX_ATTEMPTS):
+            await self.limiter.acquire()
+            status, body, latency, resp_headers = None, "", 0.0, {}
+            try:
+                status, body, latency, resp_headers = await loop.run_in_executor(self.executor, self._get, url, headers or {})
+            finally:
+                retryable = status is None or status == 429 or status >= 500
+                await self.limiter.release(not retryable, latency)
+            if not retryable:
+                self.pages += 1
+                return status, body, resp_headers
+            if status == 429:
+                continue  # the request scheduler has paused the host for its Retry-After
+            retry_after = resp_headers.get("Retry-After")
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else 0.5 * 2 ** attempt
+            await asyncio.sleep(delay)
+        self.errors += 1
+        return status, body, resp_headers
+
+    async def scrape_provider(self, provider: dict, targets: list[tuple[str, Optional[dict]]]) -> dict:
+        """Promo info for one provider, trying each (url_template, cached entry) until a page returns 200.
+
+        A cached entry's ETag / Last-Modified are sent as a conditional GET; on
+        304 the entry is kept and only its `scraped_at` is refreshed.
+        """
+        slug = provider.get("slug")
+        entry = {
+            "provider_id": provider.get("_id"),
+            "name": provider.get("name"),
+            "slug": slug,
+            "promo_type": "error",
+            "promo_code": None,
+            "promo_discount": None,
+        }
+        page, validators = None, {}
+        for template, previous in targets:
+            headers = {}
+            if previous and previous.get("promo_type") != "error":
+                if previous.get("etag"):
+                    headers["If-None-Match"] = previous["etag"]
+                if previous.get("last_modified"):
+                    headers["If-Modified-Since"] = previous["last_modified"]
+            status, html, resp_headers = await self.fetch_page(template.format(slug=slug), headers)
+            if status == 304 and headers:
+                self.not_modified += 1
+                kept = {k: v for k, v in previous.items() if k not in ("failed_at", "failures")}
+                return {**kept, "provider_id": entry["provider_id"], "name": entry["name"], "scraped_at": time.time()}
+            if status is not None and status < 500 and status != 429:
+                page = html
+                validators = {"etag": resp_headers.get("ETag"), "last_modified": resp_headers.get("Last-Modified")}
+                if status == 200:
+                    if self.save_html:
+                        with open(os.path.join(self.save_html, f"{slug}.html"), "w", encoding="utf-8") as f:
+                            f.write(html)
+                    break
+        if page is not None:
+            try:
+                parsed = await asyncio.get_running_loop().run_in_executor(self.executor, parse_promo_html, page)
+                entry["promo_type"], entry["promo_code"], entry["promo_discount"] = parsed
+            except Exception:
+                pass
+        entry["scraped_at"] = time.time()
+        entry.update(validators)
+        return entry
+
+
+async def scrape_regions(
+    regions: list[str],
+    max_concurrency: int = MAX_CONCURRENCY,
+    save_html: Optional[str] = None,
+    ttl_days: float = PROMO_TTL_DAYS,
+    only: Optional[set[str]] = None,
+    verbose: bool = True,
+    compact: bool = True,
+) -> dict[str, dict]:
+    """Scrape every provider missing from, or stale in, any of the `regions` caches; returns the updated caches.
+
+    `only` restricts the run to those provider ids (see `PromoRefresh`).
+    With `compact=False` results are only appended to the journals.
+    """
+    log = print if verbose else (lambda *args, **kwargs: None)
+    caches = {region: load_cache(PROMO_REGIONS[region].cache_file) for region in regions}
+    journals = {region: CacheJournal(PROMO_REGIONS[region].cache_file, caches[region]) for region in regions}
+    fetcher = None
+    try:
+        for region, cache in caches.items():
+            log(f"Existing cache ({region}): {len(cache)} providers")
+
+        log("Loading provider directory...")
+        providers = await asyncio.to_thread(get_all_providers)
+        if only is not None:
+            providers = [p for p in providers if p.get("_id") in only]
+        log(f"Found {len(providers)} providers")
+
+        now = time.time()
+        ttl_seconds = ttl_days * 86400
+        todo = []
+        missing_count = stale_count = 0
+        for p in providers:
+            pid = p.get("_id")
+            if not p.get("slug"):
+                continue
+            due = [region for region in regions if pid not in caches[region] or is_stale(caches[region][pid], ttl_seconds, now)]
+            if due:
+                todo.append((p, due))
+                if any(pid not in caches[region] for region in due):
+                    missing_count += 1
+                else:
+                    stale_count += 1
+        log(f"Providers to scrape: {len(todo)} ({missing_count} new, {stale_count} older than {ttl_days:g} days)")
+        if not todo:
+            log("All providers cached and fresh. Exiting.")
+            return caches
+
+        fetcher = PromoFetcher(max_concurrency=max_concurrency, save_html=save_html)
+        start = time.perf_counter()
+        progress = tqdm(total=len(todo), unit="provider") if tqdm and verbose else None
+
+        async def run(provider: dict, due: list[str]):
+            targets = [(PROMO_REGIONS[r].url_template, caches[r].get(provider["_id"])) for r in due]
+            return due, await fetcher.scrape_provider(provider, targets)
+
+        try:
+            for finished in asyncio.as_completed([run(p, due) for p, due in todo]):
+                due, data = await finished
+                pid = data["provider_id"]
+                entry = {k: v for k, v in data.items() if k != "provider_id"}
+                for region in due:
+                    previous = caches[region].get(pid)
+                    if entry["promo_type"] == "error":
+                        # Keep the last good answer (still stale) and back off before trying again
+                        failure = {"failed_at": time.time(), "failures": (previous or {}).get("failures", 0) + 1}
+                        if previous and previous.get("promo_type") != "error":
+                            journals[region].append(pid, {**previous, **failure})
+                        else:
+                            journals[region].append(pid, {**entry, **failure})
+                        continue
+                    journals[region].append(pid, entry)
+                if progress:
+                    progress.update(1)
+        finally:
+            if progress:
+                progress.close()
+
+        elapsed = time.perf_counter() - start
+        log(
+            f"Fetched {fetcher.pages} pages in {elapsed:.1f}s ({fetcher.pages / max(elapsed, 1e-9):.1f} pages/s), "
+            f"{fetcher.not_modified} not modified, {fetcher.errors} failed; "
+            f"concurrency peak {fetcher.limiter.peak}, {fetcher.limiter.decreases} back-offs"
+        )
+        return caches
+    finally:
+        if fetcher is not None:
+            fetcher.close()
+        if compact:
+            for journal in journals.values():
+                journal.compact()
+
+
+class PromoRefresh:
+    """On-demand promo fetch for the providers an optimizer is about to search.
+
+    Construction checks `provider_ids` against the region cache and starts
+    fetching the ones with no usable rules (`due`: missing, or failed
+    entries past their back-off) on a background thread, so the caller can
+    evaluate combinations that don't involve them meanwhile. Cached rules
+    are used as they are, however old; refreshing them is the scraper's job.
+    Results are only appended to the cache's journal; compacting it is also
+    left to the scraper, which may be writing to it at the same time.
+    Nothing is started when nothing is due. `apply` waits for the fetch and
+    sets `provider_promo_type` on the due providers' plans.
+    """
+
+    def __init__(self, region: str, provider_ids: set[str], ttl_days: float = PROMO_TTL_DAYS, max_concurrency: int = MAX_CONCURRENCY):
+        self.region = region
+        self._cache = cache = load_cache(PROMO_REGIONS[region].cache_file)
+        now = time.time()
+        ttl_seconds = ttl_days * 86400
+        self.due = {
+            pid for pid in provider_ids
+            if pid and (pid not in cache or (cache[pid].get("promo_type") == "error" and is_stale(cache[pid], ttl_seconds, now)))
+        }
+        self._future = None
+        if self.due:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+            self._future = self._executor.submit(
+                asyncio.run,
+                scrape_regions([region], max_concurrency=max_concurrency, ttl_days=ttl_days, only=self.due, verbose=False, compact=False),
+            )
+            self._executor.shutdown(wait=False)
+
+    def result(self) -> dict[str, dict]:
+        """Cache entries for the due providers once the fetch is done (the previous entries if it failed)."""
+        cache = self._cache
+        if self._future is not None:
+            try:
+                cache = self._future.result()[self.region]
+            except Exception as e:
+                print(f"Promo fetch failed: {e}")
+        return {pid: cache[pid] for pid in self.due if pid in cache}
+
+    def apply(self, plans: list[dict], default_promo_type: str) -> dict[str, dict]:
+        """Set `provider_promo_type` on every plan from a due provider; returns their cache entries."""
+        entries = self.result()
+        for p in plans:
+            pid = p.get("provider_id")
+            if pid in self.due:
+                promo_type = entries.get(pid, {}).get("promo_type")
+                p["provider_promo_type"] = promo_type if promo_type in ("one-time", "unlimited") else default_promo_type
+        # Only entries this fetch actually wrote count; failures leave the old entry (or an error one)
+        fetched = {
+            pid: e for pid, e in entries.items()
+            if e.get("promo_type") != "error" and e.get("scraped_at", 0) > self._cache.get(pid, {}).get("scraped_at", 0)
+        }
+        if fetched:
+            one_time = sum(1 for e in fetched.values() if e.get("promo_type") == "one-time")
+            rest = len(self.due) - len(fetched)
+            print(f"Promo rules fetched for {len(fetched)}/{len(self.due)} providers ({one_time} one-time)"
+                  + (f"; using cached or default rules for the other {rest}" if rest else ""))
+        else:
+            print(f"Could not fetch promo rules for {len(self.due)} providers; using cached rules ('{default_promo_type}' where none are cached)")
+        return entries
+
+
+def print_summary(region: str, cache: dict) -> None:
+    one_time = sum(1 for v in cache.values() if v.get("promo_type") == "one-time")
+    unlimited = sum(1 for v in cache.values() if v.get("promo_type") == "unlimited")
+    print()
+    print("=" * 60)
+    print(f"COMPLETE ({region}): {len(cache)} providers cached")
+    print(f"  One-time promos: {one_time}")
+    print(f"  Unlimited promos: {unlimited}")
+    print(f"  Unknown/Other: {len(cache) - one_time - unlimited}")
+    print(f"Saved to: {PROMO_REGIONS[region].cache_file}")
+    print("=" * 60)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Scrape esimdb promo recurrence (one-time vs unlimited) per provider")
+    parser.add_argument("--region", action="append", choices=sorted(PROMO_REGIONS), help="Region cache to fill (repeatable)")
+    parser.add_argument("--all", action="store_true", help="All regions")
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY, help="Upper bound for the adaptive limit")
+    parser.add_argument("--ttl-days", type=float, default=PROMO_TTL_DAYS, help="Re-check cached providers older than this (0 = all)")
+    parser.add_argument("--save-html", metavar="DIR", help="Also save every fetched provider page to DIR (corpus for `bench`)")
+    parser.add_argument("--bench", metavar="DIR", help="Only time both HTML parsers on the pages saved in DIR")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        bench(args.bench)
+        return
+
+    regions = sorted(PROMO_REGIONS) if args.all else (args.region or ["europe"])
+    print("=" * 60)
+    print(f"PROMO RECURRENCE SCRAPER ({', '.join(regions)})")
+    print("=" * 60)
+
+    caches = asyncio.run(scrape_regions(regions, max_concurrency=args.max_concurrency, save_html=args.save_html, ttl_days=args.ttl_days))
+    for region in regions:
+        print_summary(region, caches[region])
+
+
+if __name__ == "__main__":
+    main()
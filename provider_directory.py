@@ -0,0 +1,129 @@
+"""
+Provider directory shared by every scraper.
+
+The esimdb providers endpoint is global, so one directory replaces the
+per-region provider_cache*.json files:
+
+  scraped_data/provider_directory.json   {provider_id: {"name", "slug", ...other API fields}}
+
+`get_directory()` loads it once per process. The provider list comes from
+http_cache with `max_age=PROVIDER_TTL`: within the TTL no request is made,
+after it the list is revalidated with a conditional GET (an unchanged list
+costs a 304), and without network the stored copy is used. Names seen
+inline in plan payloads are merged in with `learn`. The first run seeds the
+directory from any existing provider_cache*.json files.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Optional
+
+import http_cache
+
+PROVIDERS_URL = "https://esimdb.com/api/client/providers"
+DIRECTORY_FILE = os.path.join("scraped_data", "provider_directory.json")
+PROVIDER_TTL = 24 * 3600
+LEGACY_CACHE_FILES = (
+    "provider_cache.json",
+    "provider_cache_usa.json",
+    "provider_cache_global.json",
+    "provider_cache_north_america.json",
+)
+
+_lock = threading.Lock()
+_directory: Optional["ProviderDirectory"] = None
+
+
+class ProviderDirectory:
+    def __init__(self, providers: dict[str, dict], path: str = DIRECTORY_FILE):
+        self.providers = providers
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.providers)
+
+    def names(self) -> dict[str, str]:
+        """provider_id -> name (a fresh dict the caller may extend)."""
+        return {pid: rec["name"] for pid, rec in self.providers.items() if rec.get("name")}
+
+    def name(self, provider_id: str, default: Optional[str] = None) -> Optional[str]:
+        return self.providers.get(provider_id, {}).get("name", default)
+
+    def records(self) -> list[dict]:
+        """Provider records in the API's shape (with `_id`)."""
+        return [{"_id": pid, **rec} for pid, rec in self.providers.items()]
+
+    def learn(self, names: dict[str, str]) -> int:
+        """Merge provider_id -> name pairs (e.g. from inline plan data); saves when anything is new."""
+        with self._lock:
+            added = 0
+            for pid, name in names.items():
+                if pid and name and pid not in self.providers:
+                    self.providers[pid] = {"name": name}
+                    added += 1
+            if added:
+                self.save()
+            return added
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.providers, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+
+def _read(path: str) -> dict[str, dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _seed_from_legacy() -> dict[str, dict]:
+    providers: dict[str, dict] = {}
+    for path in LEGACY_CACHE_FILES:
+        for pid, name in _read(path).items():
+            if name:
+                providers.setdefault(pid, {"name": name})
+    return providers
+
+
+def load_directory(max_age: float = PROVIDER_TTL, path: str = DIRECTORY_FILE) -> ProviderDirectory:
+    """Read the directory and refresh it from the API when the stored list is older than `max_age`."""
+    stored = os.path.exists(path)
+    providers = _read(path) if stored else _seed_from_legacy()
+    changed = not stored and bool(providers)
+    try:
+        resp = http_cache.fetch_json(PROVIDERS_URL, timeout=30, max_age=max_age)
+        if resp.changed or not stored:
+            for p in resp.payload:
+                pid = p.get("_id")
+                if pid:
+                    record = {k: v for k, v in p.items() if k != "_id"}
+                    if providers.get(pid) != record:
+                        providers[pid] = record
+                        changed = True
+            if resp.changed:
+                print(f"✓ Provider directory refreshed: {len(resp.payload)} providers")
+    except Exception as e:
+        print(f"⚠ Could not fetch providers: {e}")
+
+    directory = ProviderDirectory(providers, path)
+    if changed:
+        directory.save()
+    return directory
+
+
+def get_directory(max_age: float = PROVIDER_TTL) -> ProviderDirectory:
+    """The process-wide directory (loaded on first use)."""
+    global _directory
+    with _lock:
+        if _directory is None:
+            _directory = load_directory(max_age)
+        return _directory
@@ -0,0 +1,153 @@
+"""
+Compressed archive of raw esimdb API plans (kept for debugging and re-processing).
+
+Plans are written one per line (JSON Lines) so they can be streamed back
+without parsing the whole payload:
+
+  <base>.jsonl.zst  when `zstandard` is installed
+  <base>.jsonl.gz   otherwise
+
+Lines are encoded with `orjson` when it is installed, else the stdlib json
+module (compact separators). Readers accept either archive and the old
+pretty-printed `<base>.json`.
+
+Usage (size and write/read time for an existing payload):
+  python raw_archive.py bench esim_api_full_dump.json
+"""
+
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import os
+import sys
+import time
+from typing import Iterable, Iterator, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZSTD_LEVEL = 3
+GZIP_LEVEL = 5
+
+
+def _dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _loads(line: bytes):
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+def archive_path(base: str) -> str:
+    return base + (".jsonl.zst" if zstandard is not None else ".jsonl.gz")
+
+
+def find_archive(base: str) -> Optional[str]:
+    """Existing archive (or legacy .json) for `base`, preferring the current format."""
+    candidates = [base + ".jsonl.gz", base + ".json"]
+    if zstandard is not None:
+        candidates.insert(0, base + ".jsonl.zst")
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def write_plans(base: str, plans: Iterable[dict]) -> str:
+    """Write `plans` to the archive for `base` (atomically); returns its path."""
+    path = archive_path(base)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as raw:
+        if zstandard is not None:
+            writer = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw, closefd=False)
+        else:
+            writer = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=GZIP_LEVEL, mtime=0)
+        with writer:
+            for plan in plans:
+                writer.write(_dumps(plan) + b"\n")
+    os.replace(tmp, path)
+    # Drop other formats so readers never pick up a stale copy
+    for stale in (base + ".json", base + ".jsonl.gz", base + ".jsonl.zst"):
+        if stale != path and os.path.exists(stale):
+            os.remove(stale)
+    return path
+
+
+def iter_plans(path: str) -> Iterator[dict]:
+    """Stream plans from an archive written by `write_plans` (or a legacy JSON list)."""
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+        return
+    with open(path, "rb") as raw:
+        if path.endswith(".zst"):
+            if zstandard is None:
+                raise RuntimeError(f"{path} needs the zstandard package")
+            stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw))
+        else:
+            stream = gzip.GzipFile(fileobj=raw, mode="rb")
+        with stream:
+            for line in stream:
+                if line.strip():
+                    yield _loads(line)
+
+
+def read_plans(base: str) -> list[dict]:
+    """All archived plans for `base`, or [] when there is no archive."""
+    path = find_archive(base)
+    return list(iter_plans(path)) if path else []
+
+
+def bench(json_path: str) -> None:
+    with open(json_path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    plans = payload.get("plans", payload) if isinstance(payload, dict) else payload
+    base = os.path.join("scraped_data", "raw_archive_bench")
+    os.makedirs("scraped_data", exist_ok=True)
+
+    start = time.perf_counter()
+    with open(base + ".json", "w", encoding="utf-8") as f:
+        json.dump(plans, f, indent=2)
+    pretty_write = time.perf_counter() - start
+    pretty_size = os.path.getsize(base + ".json")
+    start = time.perf_counter()
+    with open(base + ".json", "r", encoding="utf-8") as f:
+        json.load(f)
+    pretty_read = time.perf_counter() - start
+
+    start = time.perf_counter()
+    path = write_plans(base, plans)
+    archive_write = time.perf_counter() - start
+    archive_size = os.path.getsize(path)
+    start = time.perf_counter()
+    count = sum(1 for _ in iter_plans(path))
+    archive_read = time.perf_counter() - start
+    os.remove(path)
+
+    codec = "orjson" if orjson is not None else "json"
+    print(f"{count} plans")
+    print(f"indent=2 JSON : {pretty_size / 1e6:7.2f} MB  write {pretty_write * 1000:6.0f} ms  read {pretty_read * 1000:6.0f} ms")
+    print(
+        f"{os.path.basename(path).split('.', 1)[1]} ({codec}): {archive_size / 1e6:7.2f} MB  "
+        f"write {archive_write * 1000:6.0f} ms  read {archive_read * 1000:6.0f} ms"
+    )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "bench":
+        bench(sys.argv[2])
+    else:
+        print(__doc__)
@@ -0,0 +1,170 @@
+"""
+Process-wide request scheduler: per-host token buckets, a global
+concurrency cap and Retry-After pauses.
+
+Every HTTP exchange made through http_client (retries included) asks the
+scheduler for a slot first, so concurrent scrapers in one process share a
+single budget per host instead of each running its own pool flat out:
+
+- each host refills `rate` tokens per second up to `burst`; a request
+  spends one
+- at most `max_concurrency` requests are in flight across all hosts
+- a 429 pauses the whole host until its Retry-After time
+  (RETRY_AFTER_DEFAULT seconds without one), so the other workers wait
+  out the limit instead of adding to it. The request being retried waits
+  here too; http_client's Retry and promo_scraper do not sleep on top of
+  the pause. The host then resumes with an empty bucket at half its rate,
+  which climbs back to the configured rate as requests succeed. A 5xx only delays the request being retried (the
+  session's Retry, or the caller, honours its Retry-After).
+
+Settings come from the environment:
+
+  HTTP_RATE=10              requests per second per host (0 = unlimited)
+  HTTP_BURST=20             bucket size
+  HTTP_MAX_CONCURRENCY=16   requests in flight across all hosts (0 = unlimited)
+
+Callers take a slot with `acquire` and give it back with `release`.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+DEFAULT_RATE = float(os.environ.get("HTTP_RATE", "10"))
+DEFAULT_BURST = float(os.environ.get("HTTP_BURST", "20"))
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("HTTP_MAX_CONCURRENCY", "16"))
+RETRY_AFTER_DEFAULT = 1.0
+MAX_PAUSE = 120.0
+MIN_RATE = 0.5
+RECOVERY_STEP = 0.05  # fraction of the configured rate regained per successful request
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait for a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class _Bucket:
+    limit: float  # configured requests/second (0 = unlimited)
+    burst: float
+    tokens: float
+    rate: float = 0.0  # current rate: halved on throttling, recovers towards `limit`
+    updated: float = field(default_factory=time.monotonic)
+    paused_until: float = 0.0
+    requests: int = 0
+    throttled: int = 0  # 429 answers
+    waited: float = 0.0  # seconds callers spent waiting for this host
+
+    def __post_init__(self):
+        self.rate = self.limit
+
+    def refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def throttle(self, pause: float) -> None:
+        """Stop until `pause` seconds from now, then resume one request at a time at half the rate."""
+        now = time.monotonic()
+        if self.limit > 0 and now >= self.paused_until:  # a burst of 429s halves the rate once
+            self.rate = max(self.rate / 2, MIN_RATE)
+        self.paused_until = max(self.paused_until, now + pause)
+        self.tokens = 0.0
+        self.updated = self.paused_until
+
+    def succeeded(self) -> None:
+        if self.rate < self.limit:
+            self.rate = min(self.limit, self.rate + self.limit * RECOVERY_STEP)
+
+
+class RequestScheduler:
+    def __init__(self, rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self._buckets: dict[str, _Bucket] = {}
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    def _bucket(self, host: str) -> _Bucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = _Bucket(self.rate, self.burst, self.burst)
+        return bucket
+
+    def _try_acquire(self, host: str) -> float:
+        """Take a slot for `host` and return 0, or return how long to wait before trying again."""
+        now = time.monotonic()
+        bucket = self._bucket(host)
+        if bucket.paused_until > now:
+            return bucket.paused_until - now
+        if bucket.limit > 0:
+            bucket.refill(now)
+            if bucket.tokens < 1:
+                return (1 - bucket.tokens) / bucket.rate
+        if self.max_concurrency and self.in_flight >= self.max_concurrency:
+            return 0.05  # woken early by release()
+        if bucket.limit > 0:
+            bucket.tokens -= 1
+        bucket.requests += 1
+        self.in_flight += 1
+        return 0.0
+
+    def acquire(self, host: str) -> float:
+        """Block until a request to `host` may start; returns the seconds waited."""
+        start = time.monotonic()
+        with self._cond:
+            while (wait := self._try_acquire(host)) > 0:
+                self._cond.wait(wait)
+            waited = time.monotonic() - start
+            self._buckets[host].waited += waited
+        self._local.waited = getattr(self._local, "waited", 0.0) + waited
+        return waited
+
+    def release(self, host: str, status: Optional[int] = None, retry_after: Optional[str] = None) -> None:
+        """End a request started with `acquire`; a 429 pauses the host."""
+        with self._cond:
+            self.in_flight -= 1
+            bucket = self._bucket(host)
+            if status == 429:
+                bucket.throttled += 1
+                pause = parse_retry_after(retry_after)
+                bucket.throttle(min(RETRY_AFTER_DEFAULT if pause is None else pause, MAX_PAUSE))
+            elif status is not None and status < 500:
+                bucket.succeeded()
+            self._cond.notify_all()
+
+    def pop_wait(self) -> float:
+        """Seconds the calling thread has waited in `acquire` since its last `pop_wait`."""
+        waited = getattr(self._local, "waited", 0.0)
+        self._local.waited = 0.0
+        return waited
+
+    def stats(self) -> dict[str, dict]:
+        """host -> {"requests", "throttled", "waited", "rate"} so far."""
+        with self._cond:
+            return {
+                host: {"requests": b.requests, "throttled": b.throttled, "waited": b.waited, "rate": b.rate}
+                for host, b in self._buckets.items()
+            }
+
+
+SCHEDULER = RequestScheduler()
+
@@ -18,24 +18,64 @@ Usage:
   python scrape_all_regions_plans.py --region north-america
   python scrape_all_regions_plans.py --region global
   python scrape_all_regions_plans.py --region europe
-  python scrape_all_regions_plans.py --all
+  python scrape_all_regions_plans.py --all   (regions fetched concurrently)
+  python scrape_all_regions_plans.py --crawl [--concurrency 8]
+  python scrape_all_regions_plans.py --bench-normalize payload.json
 """
 
 from __future__ import annotations
 
 import argparse
+import asyncio
+import concurrent.futures
 import json
 import os
+import re
+import time
 from dataclasses import dataclass
 
+import numpy as np
 import pandas as pd
-import requests
+
+import delta_ingest
+import exchange_rates
+import http_cache
+import http_client
+import plan_store
+import plan_warehouse
+import provider_directory
+import raw_archive
 
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
 
+GLOBAL_INDEX_FILE = os.path.join("scraped_data", "esimdb_global_index.json")
+SLUG_LIST_URLS = {
+    "countries": "https://esimdb.com/api/client/countries?locale=en",
+    "regions": "https://esimdb.com/api/client/regions?locale=en",
+}
+
 EUROPE_TARGET_COUNTRIES = ["DE", "AT", "CZ", "SK"]
 USA_COUNTRY_CODE = "US"
 
+# Bump when normalize_plans' output changes so delta_ingest rebuilds cached rows
+ROW_VERSION = 4
+
+# Flag/attribute columns copied straight from the API: column -> (API field, default when missing)
+PLAN_ATTRIBUTES = {
+    "new_user_only": ("newUserOnly", False),
+    "promo_enabled": ("promoEnabled", False),
+    "can_top_up": ("canTopUp", None),
+    "subscription": ("subscription", False),
+    "pay_as_you_go": ("payAsYouGo", False),
+    "ekyc": ("eKYC", False),
+    "speed_limit": ("speedLimit", None),
+    "reduced_speed": ("reducedSpeed", None),
+    "possible_throttling": ("possibleThrottling", False),
+    "has_5g": ("has5G", False),
+    "tethering": ("tethering", None),
+    "has_ads": ("hasAds", False),
+}
+
 
 @dataclass(frozen=True)
 class RegionSpec:
@@ -43,8 +83,7 @@ class RegionSpec:
     api_scope: str  # "regions" or "countries"
     api_slug: str
     output_csv: str
-    provider_cache_file: str
-    raw_json_file: str
+    raw_archive: str  # base path for raw_archive (extension added there)
 
 
 REGION_SPECS: dict[str, RegionSpec] = {
@@ -53,103 +92,41 @@ REGION_SPECS: dict[str, RegionSpec] = {
         api_scope="regions",
         api_slug="europe",
         output_csv="esim_plans_europe.csv",
-        provider_cache_file="provider_cache.json",
-        raw_json_file="esim_api_europe_raw.json",
+        raw_archive="esim_api_europe_raw",
     ),
     "global": RegionSpec(
         slug="global",
         api_scope="regions",
         api_slug="global",
         output_csv="esim_plans_global.csv",
-        provider_cache_file="provider_cache_global.json",
-        raw_json_file="esim_api_global_raw.json",
+        raw_archive="esim_api_global_raw",
     ),
     "north-america": RegionSpec(
         slug="north-america",
         api_scope="regions",
         api_slug="north-america",
         output_csv="esim_plans_north_america.csv",
-        provider_cache_file="provider_cache_north_america.json",
-        raw_json_file="esim_api_north_america_raw.json",
+        raw_archive="esim_api_north_america_raw",
     ),
     "usa": RegionSpec(
         slug="usa",
         api_scope="countries",
         api_slug="usa",
         output_csv="esim_plans_usa.csv",
-        provider_cache_file="provider_cache_usa.json",
-        raw_json_file="esim_api_usa_raw.json",
+        raw_archive="esim_api_usa_raw",
     ),
 }
 
 
-def get_live_rates() -> dict:
-    """Fetch live exchange rates with fallback (USD base)."""
-    try:
-        resp = requests.get("https://open.er-api.com/v6/latest/USD", timeout=5)
-        data = resp.json()
-        if data.get("result") == "success":
-            print("✓ Got live exchange rates")
-            return data["rates"]
-    except Exception:
-        pass
-
-    print("⚠ Using fallback exchange rates")
-    return {"USD": 1.0, "CAD": 1.37, "EUR": 0.92, "GBP": 0.79}
-
-
-def load_provider_cache(path: str) -> dict:
-    if os.path.exists(path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                cache = json.load(f)
-                if cache:
-                    return cache
-        except Exception:
-            pass
-    return {}
-
-
-def save_provider_cache(path: str, cache: dict) -> None:
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(cache, f, indent=2)
-
-
-def fetch_providers() -> dict:
-    """Fetch provider names from the API."""
-    print("Fetching provider names from API...")
-    try:
-        resp = requests.get(
-            "https://esimdb.com/api/client/providers",
-            headers={"User-Agent": USER_AGENT},
-            timeout=30,
-        )
-        resp.raise_for_status()
-        providers = resp.json()
-
-        cache: dict[str, str] = {}
-        for p in providers:
-            if "_id" in p and "name" in p:
-                cache[p["_id"]] = p["name"]
-
-        print(f"✓ Got {len(cache)} provider names")
-        return cache
-    except Exception as e:
-        print(f"⚠ Could not fetch providers: {e}")
-        return {}
-
-
-def extract_provider_info(provider_val, provider_cache: dict) -> tuple[str, str]:
-    if isinstance(provider_val, dict):
-        provider_id = provider_val.get("_id", "")
-        provider_name = provider_val.get("name", "")
-        if provider_name and provider_id:
-            provider_cache[provider_id] = provider_name
-        return provider_id, provider_name if provider_name else provider_id
-
-    provider_id = str(provider_val) if provider_val else ""
-    provider_name = provider_cache.get(provider_id, provider_id)
-    return provider_id, provider_name
+def provider_columns(values: list, provider_cache: dict) -> tuple[pd.Series, pd.Series]:
+    """provider_id and provider_name columns from the API `provider` values (an id, or an inline record)."""
+    ids = pd.Series([v.get("_id", "") if isinstance(v, dict) else (str(v) if v else "") for v in values])
+    inline = pd.Series([(v.get("name") or "") if isinstance(v, dict) else None for v in values])
+    named = inline.notna() & (inline != "") & (ids != "")
+    provider_cache.update(zip(ids[named], inline[named]))
+    # Inline name, else the directory's name, else the bare id
+    names = inline.where(inline.notna(), ids.map(provider_cache).fillna(ids)).where(inline != "", ids)
+    return ids, names
 
 
 def build_api_url(api_scope: str, api_slug: str) -> str:
@@ -169,170 +146,383 @@ def should_include_plan(region: str, plan: dict) -> bool:
     return True
 
 
-def scrape_region(region: str) -> tuple[pd.DataFrame, list]:
+def fetch_region_payload(region: str) -> http_cache.CachedResponse:
+    """Download (or revalidate) the raw API payload for `region`."""
     spec = REGION_SPECS[region]
-
     print(f"Fetching {region} plans from API...")
     url = build_api_url(spec.api_scope, spec.api_slug)
-
     headers = {"User-Agent": USER_AGENT}
-    resp = requests.get(url, headers=headers, timeout=60)
-    resp.raise_for_status()
-    data = resp.json()
+    return http_cache.fetch_json(url, headers=headers, timeout=60)
+
+
+def scrape_region(region: str, rates: exchange_rates.Rates | None = None) -> tuple[pd.DataFrame, list, delta_ingest.IngestResult]:
+    return normalize_region(region, fetch_region_payload(region), rates)
+
+
+def normalize_plans(plans: list[dict], provider_cache: dict) -> pd.DataFrame:
+    """Raw API plans -> output rows, one column at a time."""
+    def field(key: str, default=None) -> list:
+        return [plan.get(key, default) for plan in plans]
+
+    provider_id, provider_name = provider_columns(field("provider", ""), provider_cache)
+    en_name = pd.Series(field("enName"))
+    usd_price = pd.Series(field("usdPrice"))
+    usd_promo_price = pd.Series(field("usdPromoPrice"))
+    coverages = field("coverages", [])
+
+    # A promo price counts when it beats the regular one (or there is no regular price)
+    regular = usd_price.astype(float)
+    promo = usd_promo_price.astype(float)
+    is_promo = promo < regular.where(regular.notna() & (regular != 0), np.inf)
+
+    df = pd.DataFrame({
+        "plan_id": field("_id", ""),
+        "provider_id": provider_id,
+        "provider_name": provider_name,
+        "plan_name": en_name.where(en_name.notna() & (en_name != ""), pd.Series(field("name", ""))),
+        "data_mb": field("capacity", 0),
+        "validity_days": field("period", 0),
+        "data_cap_per": field("dataCapPer"),
+        "usd_price": usd_price,
+        "usd_promo_price": usd_promo_price,
+        "effective_price": promo.where(is_promo, regular),
+        "is_promo": is_promo,
+    })
+    for column, (key, default) in PLAN_ATTRIBUTES.items():
+        df[column] = field(key, default)
+    df["num_countries"] = [len(c) for c in coverages]
+    df["coverages"] = [sorted(c) for c in coverages]
+    return df
+
+
+def add_display_columns(df: pd.DataFrame) -> None:
+    """data_display ("1.5GB" / "512MB") and validity_display ("30 days" / "No expiry")."""
+    data_mb = df["data_mb"]
+    df["data_display"] = np.where(
+        data_mb >= 1024,
+        (data_mb / 1024).map("{:.1f}GB".format),
+        data_mb.astype(str) + "MB",
+    )
+    validity = df["validity_days"]
+    df["validity_display"] = np.where(validity > 0, validity.astype(str) + " days", "No expiry")
+
+
+def normalize_region(
+    region: str, cached: http_cache.CachedResponse, rates: exchange_rates.Rates | None = None
+) -> tuple[pd.DataFrame, list, delta_ingest.IngestResult]:
+    spec = REGION_SPECS[region]
+    data = cached.payload
 
     all_plans = data.get("plans", [])
-    print(f"Got {len(all_plans)} plans ({spec.api_slug})")
+    print(f"Got {len(all_plans)} plans ({spec.api_slug}, {cached.status})")
 
-    # Save raw for debugging
-    with open(spec.raw_json_file, "w", encoding="utf-8") as f:
-        json.dump(all_plans, f, indent=2)
-    print(f"Saved raw API response to {spec.raw_json_file}")
+    # Archive raw plans for debugging (only rewritten when the API data changed)
+    if cached.changed or not os.path.exists(raw_archive.archive_path(spec.raw_archive)):
+        path = raw_archive.write_plans(spec.raw_archive, all_plans)
+        print(f"Saved raw API response to {path}")
 
-    provider_cache = load_provider_cache(spec.provider_cache_file)
-    if not provider_cache:
-        provider_cache = fetch_providers()
-        if provider_cache:
-            save_provider_cache(spec.provider_cache_file, provider_cache)
+    directory = provider_directory.get_directory()
+    provider_cache = directory.names()
 
-    exchange_rates = get_live_rates()
+    if rates is None:
+        rates = exchange_rates.get_rates()
 
-    cleaned = []
-    kept = 0
+    included = [plan for plan in all_plans if should_include_plan(region, plan)]
 
-    for plan in all_plans:
-        if not should_include_plan(region, plan):
-            continue
+    # Only plans whose raw content changed since the last scrape are normalised again
+    context = delta_ingest.context_key(ROW_VERSION, provider_cache)
+    started = time.perf_counter()
+    delta = delta_ingest.ingest(
+        spec.slug, included, lambda plans: normalize_plans(plans, provider_cache), context, payload_sha=cached.sha256
+    )
+    df = delta.frame
+    print(delta.summary())
+
+    directory.learn(provider_cache)
+    print(f"Provider directory: {len(directory)} providers -> {directory.path}")
 
-        kept += 1
-
-        provider_id, provider_name = extract_provider_info(plan.get("provider", ""), provider_cache)
-
-        usd_price = plan.get("usdPrice")
-        usd_promo_price = plan.get("usdPromoPrice")
-
-        if usd_promo_price is not None and usd_promo_price < (usd_price or float("inf")):
-            effective_price = usd_promo_price
-            is_promo = True
-        else:
-            effective_price = usd_price
-            is_promo = False
-
-        coverages = plan.get("coverages", [])
-
-        cleaned.append(
-            {
-                "plan_id": plan.get("_id", ""),
-                "provider_id": provider_id,
-                "provider_name": provider_name,
-                "plan_name": plan.get("enName") or plan.get("name", ""),
-                "data_mb": plan.get("capacity", 0),
-                "validity_days": plan.get("period", 0),
-                "data_cap_per": plan.get("dataCapPer"),
-                "usd_price": usd_price,
-                "usd_promo_price": usd_promo_price,
-                "effective_price": effective_price,
-                "is_promo": is_promo,
-                "price_cad": effective_price * exchange_rates.get("CAD", 1.37) if effective_price else None,
-                "new_user_only": plan.get("newUserOnly", False),
-                "promo_enabled": plan.get("promoEnabled", False),
-                "can_top_up": plan.get("canTopUp"),
-                "subscription": plan.get("subscription", False),
-                "pay_as_you_go": plan.get("payAsYouGo", False),
-                "ekyc": plan.get("eKYC", False),
-                "speed_limit": plan.get("speedLimit"),
-                "reduced_speed": plan.get("reducedSpeed"),
-                "possible_throttling": plan.get("possibleThrottling", False),
-                "has_5g": plan.get("has5G", False),
-                "tethering": plan.get("tethering"),
-                "has_ads": plan.get("hasAds", False),
-                "num_countries": len(coverages),
-            }
-        )
-
-    save_provider_cache(spec.provider_cache_file, provider_cache)
-    print(f"Provider cache: {len(provider_cache)} providers -> {spec.provider_cache_file}")
-
-    df = pd.DataFrame(cleaned)
     if len(df) == 0:
         print(f"No plans kept after filtering for region '{region}'.")
-        return df, all_plans
+        return df, all_plans, delta
 
-    df["data_display"] = df.apply(
-        lambda x: f"{x['data_mb']/1024:.1f}GB" if x["data_mb"] >= 1024 else f"{x['data_mb']}MB",
-        axis=1,
-    )
-    df["validity_display"] = df["validity_days"].apply(lambda x: f"{x} days" if x > 0 else "No expiry")
+    price = df["effective_price"]
+    df.insert(df.columns.get_loc("is_promo") + 1, "price_cad", rates.from_usd(price.where(price != 0), "CAD"))
+    add_display_columns(df)
+    elapsed = time.perf_counter() - started
 
-    print(f"Kept {kept} plans after filtering")
-    return df, all_plans
+    print(f"Kept {len(df)} plans after filtering (normalised in {elapsed * 1000:.0f} ms)")
+    return df, all_plans, delta
 
 
-def save_region_outputs(region: str, df: pd.DataFrame) -> None:
+def save_region_outputs(region: str, df: pd.DataFrame, delta: delta_ingest.IngestResult | None = None) -> None:
     spec = REGION_SPECS[region]
 
     if len(df) == 0:
         return
 
-    df.to_csv(spec.output_csv, index=False)
-    print(f"Saved {len(df)} plans to {spec.output_csv}")
+    outputs = [spec.output_csv] + (["esim_plans_europe_filtered.csv"] if region == "europe" else [])
+
+    # Leave the CSV/store (and the snapshots and warehouse rows keyed on them) untouched when nothing changed
+    if delta is not None and not delta.dirty and delta_ingest.outputs_current(spec.slug, outputs):
+        print(f"No plan changes; {spec.output_csv} left as-is")
+        return
+
+    store = plan_store.save_plans(df, spec.output_csv)
+    print(f"Saved {len(df)} plans to {spec.output_csv} (+ {store})")
+
+    plan_warehouse.upsert_plans(df, region)
+    print(f"Upserted {len(df)} plans into {plan_warehouse.DB_PATH}")
 
     if region == "europe":
         # Mirror scrape_europe_plans.py filtering (DE/AT/CZ/SK)
         target_countries = EUROPE_TARGET_COUNTRIES
 
-        # We need coverages in order to compute this; the API provides it but we didn't store it.
-        # For compatibility, we re-fetch raw plans file and compute coverage filter there.
-        try:
-            with open(spec.raw_json_file, "r", encoding="utf-8") as f:
-                raw_plans = json.load(f)
-        except Exception:
-            raw_plans = []
-
-        id_to_covers = {}
-        for p in raw_plans:
-            pid = p.get("_id", "")
-            cov = p.get("coverages", [])
-            id_to_covers[pid] = all(c in cov for c in target_countries)
-
         df_filtered = df.copy()
-        df_filtered["covers_all_target"] = df_filtered["plan_id"].map(id_to_covers).fillna(False)
-        df_filtered = df_filtered[df_filtered["covers_all_target"] == True].copy()
+        df_filtered["covers_all_target"] = plan_store.covers_all(df_filtered["coverages"], target_countries)
+        df_filtered = df_filtered[df_filtered["covers_all_target"]].copy()
 
         filtered_path = "esim_plans_europe_filtered.csv"
-        df_filtered.to_csv(filtered_path, index=False)
+        plan_store.save_plans(df_filtered, filtered_path)
         print(f"Saved filtered plans to {filtered_path} (covers {', '.join(target_countries)})")
 
+    delta_ingest.record_outputs(spec.slug, outputs)
+
+
+async def _fetch_region_async(region: str) -> tuple[str, http_cache.CachedResponse | None, Exception | None]:
+    try:
+        return region, await asyncio.to_thread(fetch_region_payload, region), None
+    except Exception as e:
+        return region, None, e
+
+
+async def scrape_regions_async(regions: list[str]) -> dict[str, pd.DataFrame]:
+    """Fetch all regions concurrently and normalise each one as soon as it arrives.
+
+    Downloads run in worker threads over the shared pooled session, exchange
+    rates are fetched once alongside them, and a region that fails does not
+    stop the others.
+    """
+    rates_task = asyncio.create_task(asyncio.to_thread(exchange_rates.get_rates))
+    fetches = [asyncio.create_task(_fetch_region_async(region)) for region in regions]
+    results: dict[str, pd.DataFrame] = {}
+    for done in asyncio.as_completed(fetches):
+        region, cached, err = await done
+        print("\n" + "-" * 80)
+        print(f"Region: {region} (output: {REGION_SPECS[region].output_csv})")
+        print("-" * 80)
+        if err is not None:
+            print(f"ERROR scraping region '{region}': {err}")
+            continue
+        rates = await rates_task
+        try:
+            df, _, delta = normalize_region(region, cached, rates)
+            save_region_outputs(region, df, delta)
+            results[region] = df
+        except Exception as e:
+            print(f"ERROR scraping region '{region}': {e}")
+    return results
+
+
+# -------- Crawl mode (every country/region -> global index) -------- #
+
+def _collect_slugs(obj) -> set[str]:
+    slugs: set[str] = set()
+    if isinstance(obj, dict):
+        if isinstance(obj.get("slug"), str):
+            slugs.add(obj["slug"])
+        for val in obj.values():
+            if isinstance(val, (dict, list)):
+                slugs |= _collect_slugs(val)
+    elif isinstance(obj, list):
+        for item in obj:
+            slugs |= _collect_slugs(item)
+    return slugs
+
+
+def discover_slugs() -> dict[str, str]:
+    """Return every esimdb slug to crawl, mapped to its API scope ("countries" or "regions").
+
+    Uses the country/region list endpoints; if those yield nothing, falls back
+    to the single-segment links on the esimdb home page (slugs that are not
+    countries simply fail their data-plans request later).
+    """
+    slugs: dict[str, str] = {spec.api_slug: spec.api_scope for spec in REGION_SPECS.values()}
+    found = 0
+    for scope, url in SLUG_LIST_URLS.items():
+        try:
+            listed = _collect_slugs(http_cache.fetch_json(url, timeout=30).payload)
+        except Exception as e:
+            print(f"⚠ Could not list {scope}: {e}")
+            continue
+        for slug in listed:
+            slugs.setdefault(slug, scope)
+        found += len(listed)
+
+    if not found:
+        try:
+            resp = http_client.get("https://esimdb.com/", headers={"User-Agent": USER_AGENT}, timeout=30)
+            resp.raise_for_status()
+            for slug in re.findall(r'href="/([a-z][a-z0-9-]*)/?"', resp.text):
+                slugs.setdefault(slug, "countries")
+        except Exception as e:
+            print(f"⚠ Could not read esimdb home page: {e}")
+    return slugs
+
+
+def crawl_all(slugs: dict[str, str], concurrency: int = 8) -> dict:
+    """Fetch every slug's data-plans endpoint and build the global plan store and index.
+
+    At most `concurrency` requests are in flight, within the per-host rate of
+    request_scheduler; retries with backoff (429/5xx, connection errors) are
+    handled by the shared http_client session.
+    """
+    plans_by_id: dict[str, dict] = {}
+    index: dict[str, list[str]] = {}
+    failed: list[str] = []
+    total_bytes = 0
+    start = time.perf_counter()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(http_cache.fetch_json, build_api_url(scope, slug), {"User-Agent": USER_AGENT}, 60): slug
+            for slug, scope in slugs.items()
+        }
+        for done, fut in enumerate(concurrent.futures.as_completed(futures), 1):
+            slug = futures[fut]
+            elapsed = max(time.perf_counter() - start, 1e-9)
+            try:
+                cached = fut.result()
+            except Exception as e:
+                failed.append(slug)
+                print(f"[{done}/{len(futures)}] {slug}: ERROR {e}")
+                continue
+            payload = cached.payload
+            plans = payload.get("plans", []) if isinstance(payload, dict) else []
+            ids = []
+            for plan in plans:
+                pid = plan.get("_id")
+                if pid:
+                    plans_by_id.setdefault(pid, plan)
+                    ids.append(pid)
+            index[slug] = sorted(set(ids))
+            total_bytes += cached.downloaded
+            print(
+                f"[{done}/{len(futures)}] {slug}: {len(index[slug])} plans ({cached.status}) | "
+                f"{done / elapsed:.1f} req/s, {total_bytes / 1e6:.1f} MB downloaded, {len(plans_by_id)} unique plans"
+            )
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Crawled {len(index)}/{len(slugs)} slugs in {elapsed:.1f}s "
+        f"({len(slugs) / max(elapsed, 1e-9):.1f} req/s, {total_bytes / 1e6:.1f} MB); "
+        f"{len(plans_by_id)} unique plans"
+    )
+    if failed:
+        print(f"Failed slugs: {', '.join(sorted(failed))}")
+
+    return {
+        "generated_at": time.time(),
+        "scopes": {slug: slugs[slug] for slug in index},
+        "index": index,
+        "plans": plans_by_id,
+    }
+
+
+def save_global_index(data: dict, path: str = GLOBAL_INDEX_FILE) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    print(f"Saved global index ({len(data['index'])} slugs, {len(data['plans'])} plans) to {path}")
+
+
+def load_global_index(path: str = GLOBAL_INDEX_FILE) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def plans_for_itinerary(data: dict, slugs: list[str], cover_all: bool = True) -> list[dict]:
+    """Raw plans from the global index usable for an itinerary.
+
+    cover_all=True keeps plans listed for every slug (one eSIM for the whole
+    trip); otherwise plans listed for any of them.
+    """
+    id_sets = [set(data["index"].get(slug, [])) for slug in slugs]
+    if not id_sets:
+        return []
+    ids = set.intersection(*id_sets) if cover_all else set.union(*id_sets)
+    return [data["plans"][pid] for pid in sorted(ids)]
+
+
+def bench_normalize(json_path: str, repeat: int = 5) -> None:
+    """Time a full (non-incremental) normalisation of a saved payload and report it per 10k plans."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    plans = payload.get("plans", payload) if isinstance(payload, dict) else payload
+    provider_cache = provider_directory.get_directory().names()
+    rates = exchange_rates.get_rates(fetch=False)
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = normalize_plans(plans, dict(provider_cache))
+        price = df["effective_price"]
+        df.insert(df.columns.get_loc("is_promo") + 1, "price_cad", rates.from_usd(price.where(price != 0), "CAD"))
+        add_display_columns(df)
+        best = min(best, time.perf_counter() - start)
+    print(f"{len(plans)} plans normalised in {best * 1000:.1f} ms ({best * 1000 * 10000 / max(len(plans), 1):.1f} ms per 10k plans)")
+
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Unified ESIMDB region scraper")
     parser.add_argument("--region", choices=list(REGION_SPECS.keys()))
     parser.add_argument("--all", action="store_true", help="Scrape all regions")
+    parser.add_argument("--crawl", action="store_true", help=f"Crawl every esimdb country/region into {GLOBAL_INDEX_FILE}")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel requests in --crawl mode (default: 8)")
+    parser.add_argument("--bench-normalize", metavar="PAYLOAD", help="Time normalisation of a saved API payload (JSON) and exit")
     args = parser.parse_args()
 
+    if args.bench_normalize:
+        bench_normalize(args.bench_normalize)
+        return
+
+    if args.crawl:
+        print("=" * 80)
+        print("ESIMDB CRAWL")
+        print("=" * 80)
+        slugs = discover_slugs()
+        print(f"Discovered {len(slugs)} slugs")
+        save_global_index(crawl_all(slugs, concurrency=args.concurrency))
+        return
+
     regions: list[str]
     if args.all:
         regions = ["europe", "usa", "north-america", "global"]
     else:
         if not args.region:
-            parser.error("Must supply --region or --all")
+            parser.error("Must supply --region, --all or --crawl")
         regions = [args.region]
 
     print("=" * 80)
     print("ESIMDB UNIFIED SCRAPER")
     print("=" * 80)
 
+    if len(regions) > 1:
+        start = time.perf_counter()
+        results = asyncio.run(scrape_regions_async(regions))
+        print(f"\nScraped {len(results)}/{len(regions)} regions in {time.perf_counter() - start:.1f}s")
+        return
+
     for region in regions:
         spec = REGION_SPECS[region]
         print("\n" + "-" * 80)
         print(f"Region: {region}")
         print(f"API: {build_api_url(spec.api_scope, spec.api_slug)}")
         print(f"Output: {spec.output_csv}")
-        print(f"Provider cache: {spec.provider_cache_file}")
         print("-" * 80)
 
         try:
-            df, _ = scrape_region(region)
-            save_region_outputs(region, df)
+            df, _, delta = scrape_region(region)
+            save_region_outputs(region, df, delta)
         except Exception as e:
             print(f"ERROR scraping region '{region}': {e}")
 
@@ -7,25 +7,22 @@ Tags each plan with the countries it covers.
 
 Optimizations:
 - Parallel Fetching (ThreadPoolExecutor)
-- File-based Caching (scraped_data/*.json)
+- Conditional-GET caching shared with the other scrapers (http_cache.py)
 """
-import requests
 import pandas as pd
-import datetime
-import os
-import json
 import time
 import concurrent.futures
-from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.util.retry import Retry
+
+import exchange_rates
+import http_cache
+import plan_store
+import plan_warehouse
+import provider_directory
 
 # Configuration
 API_URL_TEMPLATE = "https://esimdb.com/api/client/countries/{slug}/data-plans?locale=en"
 REGIONAL_URL = "https://esimdb.com/api/client/regions/europe/data-plans?locale=en"
-PROVIDER_CACHE_FILE = "provider_cache.json"
 OUTPUT_FILE = "esim_plans_itinerary.csv"
-CACHE_DIR = "scraped_data"
-CACHE_DURATION_HOURS = 24
 
 # Target regions
 TARGET_COUNTRIES = {
@@ -37,80 +34,17 @@ TARGET_COUNTRIES = {
 # "europe" covers all of them (simplification for this specific trip)
 REGIONAL_COVERAGE = ["germany", "austria", "czechia", "slovakia"]
 
-# Exchange rates (static fallback)
-EXCHANGE_RATES = {"EUR": 1.05, "GBP": 1.25, "CAD": 0.73, "AUD": 0.65}
-
-def create_session():
-    session = requests.Session()
-    retry = Retry(connect=3, backoff_factor=1)
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-    return session
-
-SESSION = create_session()
-
-def get_exchange_rates():
-    try:
-        resp = requests.get("https://open.er-api.com/v6/latest/USD", timeout=5)
-        return resp.json().get("rates", {})
-    except:
-        return {}
-
-def get_cached_response(slug):
-    """Load response from cache if valid"""
-    if not os.path.exists(CACHE_DIR):
-        os.makedirs(CACHE_DIR)
-        
-    cache_path = os.path.join(CACHE_DIR, f"cache_{slug}.json")
-    if os.path.exists(cache_path):
-        # Check age
-        mtime = os.path.getmtime(cache_path)
-        if (time.time() - mtime) < (CACHE_DURATION_HOURS * 3600):
-            try:
-                with open(cache_path, "r") as f:
-                    return json.load(f)
-            except:
-                pass
-    return None
-
-def save_to_cache(slug, data):
-    """Save response to cache"""
-    if not os.path.exists(CACHE_DIR):
-        os.makedirs(CACHE_DIR)
-    
-    cache_path = os.path.join(CACHE_DIR, f"cache_{slug}.json")
-    try:
-        with open(cache_path, "w") as f:
-            json.dump(data, f)
-    except Exception as e:
-        print(f"Warning: Failed to cache data for {slug}: {e}")
-
 def fetch_plans_worker(args):
     """Worker for threaded fetching"""
     slug, is_regional = args
-    
-    # Try cache first
-    cached = get_cached_response(slug)
-    if cached:
-        print(f"[{slug}] Loaded from cache")
-        plans = cached.get("plans", [])
-        return slug, plans, is_regional
-        
-    # Fetch from API
     url = REGIONAL_URL if is_regional else API_URL_TEMPLATE.format(slug=slug)
     print(f"[{slug}] Fetching from API...")
     
     try:
-        resp = SESSION.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=30)
-        resp.raise_for_status()
-        data = resp.json()
-        plans = data.get("plans", [])
-        print(f"[{slug}] Got {len(plans)} plans")
-        
-        # Save to cache
-        save_to_cache(slug, data)
-        
+        # Conditional GET through the shared cache; unchanged data is not downloaded again
+        cached = http_cache.fetch_json(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=30)
+        plans = cached.payload.get("plans", [])
+        print(f"[{slug}] Got {len(plans)} plans ({cached.status})")
         return slug, plans, is_regional
     except Exception as e:
         print(f"[{slug}] Error: {e}")
@@ -179,19 +113,11 @@ def parse_plan(plan, coverage, scope, provider_cache, usd_rates):
     }
 
 def main():
-    rates_data = get_exchange_rates()
-    if rates_data:
-        usd_rates = {k: 1/v for k,v in rates_data.items() if v != 0}
-        print(f"Loaded live exchange rates (EUR={rates_data.get('EUR')})")
-    else:
-        usd_rates = EXCHANGE_RATES.copy()
-        print("Using static exchange rates fallback")
+    # Shared rates cache (USD per unit of each currency)
+    usd_rates = exchange_rates.get_rates().usd_factors()
 
-    # Load provider cache
-    provider_cache = {}
-    if os.path.exists(PROVIDER_CACHE_FILE):
-        with open(PROVIDER_CACHE_FILE, "r") as f:
-            provider_cache = json.load(f)
+    # Shared provider directory (refreshed when older than its TTL)
+    provider_cache = provider_directory.get_directory().names()
 
     all_plans_map = {}
     dropped_count = 0
@@ -251,10 +177,10 @@ def main():
             else:
                 dropped_count += 1
 
-    # Convert to list and serialize coverage
+    # Convert to list; coverage stays a native list column in the plan store
     final_rows = []
     for p in all_plans_map.values():
-        p["countries"] = json.dumps(list(p["countries"])) # Serialize for CSV
+        p["countries"] = sorted(p["countries"])
         final_rows.append(p)
         
     # Save
@@ -263,8 +189,9 @@ def main():
         return
     
     df = pd.DataFrame(final_rows)
-    df.to_csv(OUTPUT_FILE, index=False)
+    plan_store.save_plans(df, OUTPUT_FILE)
     print(f"Saved {len(df)} unique plans to {OUTPUT_FILE} (Dropped {dropped_count})")
+    plan_warehouse.upsert_plans(df, "itinerary")
 
 if __name__ == "__main__":
     main()
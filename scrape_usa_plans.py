@@ -1,88 +1,32 @@
 """
 ESIMDB USA Scraper - Fetches eSIM plan data from the ESIMDB API.
-Saves both raw JSON (for debugging) and cleaned CSV with essential columns.
+Saves both the raw plans (compressed, for debugging) and a cleaned CSV with essential columns.
 """
-import requests
 import pandas as pd
-import json
 import os
-from datetime import datetime
+
+import delta_ingest
+import exchange_rates
+import http_cache
+import plan_store
+import plan_warehouse
+import provider_directory
+import raw_archive
+import scrape_all_regions_plans
 
 # --- CONFIGURATION ---
 TARGET_COUNTRY = "US"  # United States country code
 # Country-specific endpoint matches https://esimdb.com/usa counts
 API_URL = "https://esimdb.com/api/client/countries/usa/data-plans?locale=en"
-PROVIDER_CACHE_FILE = "provider_cache_usa.json"
 # ---------------------
 
-def get_live_rates():
-    """Fetch live exchange rates with fallback (USD is base)"""
-    try:
-        resp = requests.get("https://open.er-api.com/v6/latest/USD", timeout=5)
-        data = resp.json()
-        if data.get("result") == "success":
-            print("✓ Got live exchange rates")
-            return data["rates"]
-    except:
-        pass
-    
-    print("⚠ Using fallback exchange rates")
-    return {"USD": 1.0, "CAD": 1.37, "EUR": 0.92, "GBP": 0.79}
-
-def load_provider_cache():
-    """Load cached provider ID -> name mapping"""
-    if os.path.exists(PROVIDER_CACHE_FILE):
-        try:
-            with open(PROVIDER_CACHE_FILE, "r", encoding="utf-8") as f:
-                cache = json.load(f)
-                if cache:  # Only return if not empty
-                    return cache
-        except:
-            pass
-    return {}
-
-def fetch_providers():
-    """Fetch provider names from the API"""
-    print("Fetching provider names from API...")
-    try:
-        resp = requests.get(
-            "https://esimdb.com/api/client/providers",
-            headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"},
-            timeout=30
-        )
-        resp.raise_for_status()
-        providers = resp.json()
-        
-        # Build ID -> name mapping
-        cache = {}
-        for p in providers:
-            if "_id" in p and "name" in p:
-                cache[p["_id"]] = p["name"]
-        
-        print(f"✓ Got {len(cache)} provider names")
-        return cache
-    except Exception as e:
-        print(f"⚠ Could not fetch providers: {e}")
-        return {}
-
-def save_provider_cache(cache):
-    """Save provider cache to disk"""
-    with open(PROVIDER_CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump(cache, f, indent=2)
-
-def extract_provider_info(provider_val, provider_cache):
-    """Extract provider ID and name from API response"""
-    if isinstance(provider_val, dict):
-        provider_id = provider_val.get("_id", "")
-        provider_name = provider_val.get("name", "")
-        if provider_name and provider_id:
-            provider_cache[provider_id] = provider_name
-        return provider_id, provider_name if provider_name else provider_id
-    else:
-        provider_id = str(provider_val) if provider_val else ""
-        # Check cache for name
-        provider_name = provider_cache.get(provider_id, provider_id)
-        return provider_id, provider_name
+def normalize_plans(plans, provider_cache):
+    """Convert raw API plans into output rows, one column at a time"""
+    df = scrape_all_regions_plans.normalize_plans(plans, provider_cache)
+    # Country endpoint is already USA-specific; do not filter by `coverages`.
+    df = df.drop(columns=["coverages"])
+    df["covers_usa"] = True
+    return df
 
 def scrape_usa_plans():
     """Fetch and parse eSIM plans from the ESIMDB API"""
@@ -90,123 +34,38 @@ def scrape_usa_plans():
     
     print("Fetching USA plans from API...")
     try:
-        resp = requests.get(API_URL, headers=headers, timeout=60)
-        resp.raise_for_status()
-        data = resp.json()
+        cached = http_cache.fetch_json(API_URL, headers=headers, timeout=60)
+        data = cached.payload
     except Exception as e:
         print(f"Error fetching API: {e}")
-        return [], []
+        return pd.DataFrame(), [], None
 
     all_plans = data.get("plans", [])
-    print(f"Got {len(all_plans)} plans (USA)")
+    print(f"Got {len(all_plans)} plans (USA) [{cached.status}]")
     
-    # Save raw JSON for debugging
-    with open("esim_api_usa_raw.json", "w", encoding="utf-8") as f:
-        json.dump(all_plans, f, indent=2)
-    print("Saved raw API response to esim_api_usa_raw.json")
-
-    # Load or fetch provider cache
-    provider_cache = load_provider_cache()
-    if not provider_cache:
-        provider_cache = fetch_providers()
-        if provider_cache:
-            save_provider_cache(provider_cache)
-    
-    exchange_rates = get_live_rates()
+    # Archive raw plans for debugging (only rewritten when the API data changed)
+    if cached.changed or not os.path.exists(raw_archive.archive_path("esim_api_usa_raw")):
+        path = raw_archive.write_plans("esim_api_usa_raw", all_plans)
+        print(f"Saved raw API response to {path}")
+
+    # Shared provider directory (refreshed when older than its TTL)
+    directory = provider_directory.get_directory()
+    provider_cache = directory.names()
     
-    clean_plans = []
-
-    for plan in all_plans:
-        # Country endpoint is already USA-specific; do not filter by `coverages`.
-        coverages = plan.get("coverages", [])
-
-        # Provider info
-        provider_id, provider_name = extract_provider_info(
-            plan.get("provider", ""), provider_cache
-        )
-
-        # Pricing - keep BOTH regular and promo prices
-        usd_price = plan.get("usdPrice")  # Regular price (always populated)
-        usd_promo_price = plan.get("usdPromoPrice")  # Promo price (may be None)
-        
-        # Determine the effective "best" price for first purchase
-        if usd_promo_price is not None and usd_promo_price < (usd_price or float('inf')):
-            effective_price = usd_promo_price
-            is_promo = True
-        else:
-            effective_price = usd_price
-            is_promo = False
-        
-        # Speed/throttling info
-        speed_limit = plan.get("speedLimit")  # Speed cap in kbps
-        reduced_speed = plan.get("reducedSpeed")  # Speed after data cap
-        possible_throttling = plan.get("possibleThrottling", False)
-        
-        # Plan features
-        can_top_up = plan.get("canTopUp")
-        new_user_only = plan.get("newUserOnly", False)
-        promo_enabled = plan.get("promoEnabled", False)
-        has_5g = plan.get("has5G", False)
-        ekyc = plan.get("eKYC", False)
-        tethering = plan.get("tethering")
-        subscription = plan.get("subscription", False)
-        pay_as_you_go = plan.get("payAsYouGo", False)
-        has_ads = plan.get("hasAds", False)
-        
-        # Data capacity (MB)
-        capacity = plan.get("capacity", 0)
-        period = plan.get("period", 0)
-        
-        # Additional info for display
-        data_cap_per = plan.get("dataCapPer")  # "day" if daily limit
-        
-        clean_plans.append({
-            # IDs
-            "plan_id": plan.get("_id", ""),
-            "provider_id": provider_id,
-            "provider_name": provider_name,
-            
-            # Plan details
-            "plan_name": plan.get("enName") or plan.get("name", ""),
-            "data_mb": capacity,
-            "validity_days": period,
-            "data_cap_per": data_cap_per,  # "day" if daily reset
-            
-            # Pricing (BOTH columns!)
-            "usd_price": usd_price,
-            "usd_promo_price": usd_promo_price,
-            "effective_price": effective_price,
-            "is_promo": is_promo,
-            "price_cad": effective_price * exchange_rates.get("CAD", 1.37) if effective_price else None,
-            
-            # Restrictions
-            "new_user_only": new_user_only,
-            "promo_enabled": promo_enabled,
-            "can_top_up": can_top_up,
-            "subscription": subscription,
-            "pay_as_you_go": pay_as_you_go,
-            "ekyc": ekyc,
-            
-            # Speed/throttling
-            "speed_limit": speed_limit,
-            "reduced_speed": reduced_speed,
-            "possible_throttling": possible_throttling,
-            
-            # Features
-            "has_5g": has_5g,
-            "tethering": tethering,
-            "has_ads": has_ads,
-            
-            # Coverage
-            "num_countries": len(coverages),
-            "covers_usa": True,
-        })
+    # Only plans whose raw content changed since the last scrape are normalised again
+    context = delta_ingest.context_key(scrape_all_regions_plans.ROW_VERSION, provider_cache)
+    delta = delta_ingest.ingest(
+        "usa_legacy", all_plans, lambda plans: normalize_plans(plans, provider_cache),
+        context, payload_sha=cached.sha256,
+    )
+    df = delta.frame
+    print(delta.summary())
 
-    # Save provider cache
-    save_provider_cache(provider_cache)
-    print(f"Provider cache: {len(provider_cache)} providers")
+    # Keep names seen inline in the plans
+    directory.learn(provider_cache)
+    print(f"Provider directory: {len(directory)} providers")
 
-    return clean_plans, all_plans
+    return df, all_plans, delta
 
 def main():
     print("="*80)
@@ -214,20 +73,19 @@ def main():
     print(f"Target country: {TARGET_COUNTRY} (using country endpoint)")
     print("="*80)
     
-    plans, raw_plans = scrape_usa_plans()
+    df, raw_plans, delta = scrape_usa_plans()
     
-    if not plans:
+    if len(df) == 0:
         print("No plans scraped.")
         return
 
-    df = pd.DataFrame(plans)
+    # CAD prices for the whole column at once
+    rates = exchange_rates.get_rates()
+    price = df["effective_price"]
+    df.insert(df.columns.get_loc("is_promo") + 1, "price_cad", rates.from_usd(price.where(price != 0), "CAD"))
 
     # Add display columns
-    df["data_display"] = df.apply(
-        lambda x: f"{x['data_mb']/1024:.1f}GB" if x['data_mb'] >= 1024 else f"{x['data_mb']}MB",
-        axis=1
-    )
-    df["validity_display"] = df["validity_days"].apply(lambda x: f"{x} days" if x > 0 else "No expiry")
+    scrape_all_regions_plans.add_display_columns(df)
     
     # Stats
     print(f"\nTotal USA plans: {len(df)}")
@@ -245,10 +103,18 @@ def main():
         print(f"  Has ads: {has_ads_pct*100:.1f}%")
         print(f"  Requires eKYC: {ekyc_pct*100:.1f}%")
     
-    # Save files
+    # Save files (left untouched, with the caches keyed on them, when no plan changed)
     output_file = "esim_plans_usa.csv"
-    df.to_csv(output_file, index=False)
+    if not delta.dirty and delta_ingest.outputs_current("usa_legacy", [output_file]):
+        print(f"\nNo plan changes; {output_file} left as-is")
+        return
+
+    plan_store.save_plans(df, output_file)
     print(f"\nSaved plans to {output_file}")
+    delta_ingest.record_outputs("usa_legacy", [output_file])
+
+    plan_warehouse.upsert_plans(df, "usa", plan_warehouse.coverage_from_raw(raw_plans))
+    print(f"Upserted {len(df)} plans into {plan_warehouse.DB_PATH}")
     
     print("\nRun optimize_esim_plans.py next to find the best combinations.")
 
@@ -0,0 +1,78 @@
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+
+import workflow_france
+
+# Small France-style catalogue (same fields as scraped_data/esimdb_plans_france.json);
+# greedy covers a 10-day, 500 MB/day trip with these
+def _plan(plan_id, provider, capacity, period, price):
+    return {
+        "provider": provider, "provider_id": plan_id + "-provider", "provider_slug": provider.lower(),
+        "plan_title": "", "capacity": capacity, "period": period,
+        "price": price, "price_usd_promo": price, "price_usd_base": price,
+        "promo_zero_any": False, "base_zero_any": False, "coverage_count": 0, "scope_pref": 0,
+        "plan_id": plan_id,
+    }
+
+
+PLANS = [
+    _plan("p1", "Alpha", "10000 MB", "7 Days", 6.3),
+    _plan("p2", "Beta", "3000 MB", "30 Days", 4.5),
+    _plan("p3", "Gamma", "Unlimited", "10 Days", 19.0),
+]
+
+
+def stopped_at_time_limit(c, constraints=None, integrality=None, bounds=None, options=None):
+    """Stand-in for scipy's milp that stops at its time limit with an incumbent that covers nothing."""
+    return SimpleNamespace(
+        x=np.zeros(len(c)),
+        status=1,
+        message="Time limit reached. (HiGHS Status 13: Time limit reached)",
+        mip_gap=1.0,
+    )
+
+
+def test_exact_time_limit_falls_back_to_greedy():
+    print("TESTING EXACT SOLVER TIME-LIMIT FALLBACK")
+    print("========================================")
+    if workflow_france.milp is None:
+        print("SciPy not installed; exact mode unavailable, nothing to check.")
+        return
+
+    greedy_selections, greedy_stats = workflow_france.build_trip_solution(PLANS, 10, 500)
+    assert greedy_stats["ok"], greedy_stats
+
+    real_milp = workflow_france.milp
+    workflow_france.milp = stopped_at_time_limit
+    try:
+        selections, stats = workflow_france.solve_trip_exact(PLANS, 10, 500, time_limit=1)
+    finally:
+        workflow_france.milp = real_milp
+
+    assert stats["mode"] == "greedy", stats
+    assert stats["total_cost"] == greedy_stats["total_cost"], stats
+    assert stats["exact_cost"] == 0, stats
+    assert "Time limit" in stats["exact_status"], stats
+    # The returned plan is greedy's, so nothing was saved against greedy
+    assert stats["savings_vs_greedy"] == 0, stats
+    assert stats["gap_to_greedy"] is None, stats
+    assert [s["cost_total"] for s in selections] == [s["cost_total"] for s in greedy_selections]
+    print(f"Fallback kept greedy's ${stats['total_cost']:.2f} plan ({stats['exact_status']})")
+    print("PASS")
+
+
+def check_france(time_limit: float = 20.0):
+    """The real case: France, 90 days, 500 MB/day, from scraped_data/esimdb_plans_france.json."""
+    import json
+    with open("scraped_data/esimdb_plans_france.json", "r", encoding="utf-8") as f:
+        plans = json.load(f)
+    selections, stats = workflow_france.solve_trip_exact(plans, 90, 500, time_limit=time_limit)
+    print(f"mode={stats.get('mode')} total=${stats.get('total_cost', 0):.2f} exact_cost={stats.get('exact_cost')} ({stats.get('exact_status')})")
+
+
+if __name__ == "__main__":
+    test_exact_time_limit_falls_back_to_greedy()
+    if "--france" in sys.argv:
+        check_france()
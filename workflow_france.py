@@ -2,16 +2,28 @@ import os
 import re
 import json
 import math
+import functools
+import hashlib
+import inspect
 import time
 import argparse
-from typing import List, Dict, Any, Optional
+import concurrent.futures
+from typing import List, Dict, Any, Optional, Tuple
 
-import requests
 import pandas as pd
 import numpy as np
 from bs4 import BeautifulSoup
 
-# -------- Scraper utilities (France) -------- #
+import http_cache
+import http_client
+
+try:
+    from scipy import sparse
+    from scipy.optimize import milp, LinearConstraint, Bounds
+except ImportError:
+    milp = None
+
+# -------- Scraper utilities -------- #
 
 def get_user_agent() -> Dict[str, str]:
     return {
@@ -23,7 +35,7 @@ def get_user_agent() -> Dict[str, str]:
 
 def get_provider_slugs(country_url: str) -> List[str]:
     """Discover provider slugs from the country page (e.g., '/france/<slug>')."""
-    resp = requests.get(country_url, headers=get_user_agent(), timeout=60)
+    resp = http_client.get(country_url, headers=get_user_agent())
     resp.raise_for_status()
     soup = BeautifulSoup(resp.text, "html.parser")
     slugs = set()
@@ -53,7 +65,45 @@ def find_plan_list(obj: Any) -> List[Dict[str, Any]]:
     return []
 
 
-# -------- Country API (preferred for France) -------- #
+# -------- Country API -------- #
+
+# ISO 3166 alpha-2 code -> esimdb country slug. Anything not listed here is
+# passed through unchanged, so full slugs (e.g. "united-kingdom") also work.
+COUNTRY_SLUGS: Dict[str, str] = {
+    "at": "austria",
+    "be": "belgium",
+    "ch": "switzerland",
+    "cz": "czechia",
+    "de": "germany",
+    "dk": "denmark",
+    "es": "spain",
+    "fi": "finland",
+    "fr": "france",
+    "gb": "united-kingdom",
+    "gr": "greece",
+    "hr": "croatia",
+    "hu": "hungary",
+    "ie": "ireland",
+    "is": "iceland",
+    "it": "italy",
+    "jp": "japan",
+    "nl": "netherlands",
+    "no": "norway",
+    "pl": "poland",
+    "pt": "portugal",
+    "se": "sweden",
+    "sk": "slovakia",
+    "tr": "turkey",
+    "uk": "united-kingdom",
+    "us": "usa",
+}
+
+
+def resolve_country_slug(country: str) -> str:
+    """Map an ISO code or slug (case-insensitive) to the esimdb country slug."""
+    key = country.strip().lower()
+    return COUNTRY_SLUGS.get(key, key)
+
 
 def _extract_price_from_plan_dict(plan: Dict[str, Any]) -> str:
     """Deprecated: kept for fallback. Prefer _extract_usd_prices."""
@@ -279,75 +329,34 @@ def scrape_country_via_api(country_slug: str = "france") -> List[Dict[str, Any]]
     os.makedirs("scraped_data", exist_ok=True)
     cache_raw = os.path.join("scraped_data", f"esimdb_{country_slug}_raw.json")
 
-    # If a cached raw JSON exists, use it to allow offline runs
-    if os.path.exists(cache_raw):
+    base_urls = [
+        f"https://esimdb.com/api/client/countries/{country_slug}/data-plans?locale=en",
+        f"https://www.esimdb.com/api/client/countries/{country_slug}/data-plans?locale=en",
+    ]
+    payload = None
+    last_err = None
+    for base in base_urls:
+        print(f"Fetching full JSON from country API: {base}")
+        # Conditional GET (ETag/Last-Modified); unchanged data is served from the shared HTTP cache
+        try:
+            cached = http_cache.fetch_json(base, headers=get_user_agent(), timeout=180)
+        except Exception as e:
+            last_err = e
+            print(f"Fetch failed: {e}")
+            continue
+        payload = cached.payload
+        if cached.status in (http_cache.NOT_MODIFIED, http_cache.UNCHANGED):
+            print("Server data unchanged; using cached payload.")
+        break
+    if payload is None and os.path.exists(cache_raw):
+        # Manually downloaded JSON allows offline runs
         print(f"Loading cached raw JSON: {cache_raw}")
         with open(cache_raw, "r", encoding="utf-8") as f:
             payload = json.load(f)
-    else:
-        base_urls = [
-            f"https://esimdb.com/api/client/countries/{country_slug}/data-plans?locale=en",
-            f"https://www.esimdb.com/api/client/countries/{country_slug}/data-plans?locale=en",
-        ]
-        payload = None
-        last_err = None
-        for base in base_urls:
-            print(f"Fetching full JSON from country API: {base}")
-            # Conditional fetch using ETag/Last-Modified if available
-            meta_path = os.path.join("scraped_data", f"esimdb_{country_slug}_meta.json")
-            etag = None
-            last_mod = None
-            if os.path.exists(meta_path):
-                try:
-                    with open(meta_path, "r", encoding="utf-8") as mf:
-                        meta = json.load(mf)
-                        etag = meta.get("etag")
-                        last_mod = meta.get("last_modified")
-                except Exception:
-                    pass
-            headers = get_user_agent().copy()
-            if etag:
-                headers["If-None-Match"] = etag
-            if last_mod:
-                headers["If-Modified-Since"] = last_mod
-
-            for attempt in range(1, 6):
-                try:
-                    r = requests.get(base, headers=headers, timeout=180)
-                    if r.status_code == 304 and os.path.exists(cache_raw):
-                        print("Server reports Not Modified (304); using cached raw JSON.")
-                        with open(cache_raw, "r", encoding="utf-8") as f:
-                            payload = json.load(f)
-                        break
-                    r.raise_for_status()
-                    payload = r.json()
-                    # Cache raw payload for reuse/offline
-                    with open(cache_raw, "w", encoding="utf-8") as f:
-                        json.dump(payload, f, ensure_ascii=False)
-                    # Update meta
-                    try:
-                        new_meta = {
-                            "etag": r.headers.get("ETag"),
-                            "last_modified": r.headers.get("Last-Modified"),
-                            "fetched_at": time.time(),
-                            "totalPlans": payload.get("totalPlans") if isinstance(payload, dict) else None,
-                        }
-                        with open(meta_path, "w", encoding="utf-8") as mf:
-                            json.dump(new_meta, mf, ensure_ascii=False, indent=2)
-                    except Exception:
-                        pass
-                    break
-                except Exception as e:
-                    last_err = e
-                    wait = min(2 ** attempt, 30)
-                    print(f"Attempt {attempt} failed: {e}. Retrying in {wait}s ...")
-                    time.sleep(wait)
-            if payload is not None:
-                break
-        if payload is None:
-            print("Country API scrape failed: {}".format(last_err))
-            print(f"If the error persists, download the JSON manually from one of the URLs above and save it to: {cache_raw}")
-            return []
+    if payload is None:
+        print("Country API scrape failed: {}".format(last_err))
+        print(f"If the error persists, download the JSON manually from one of the URLs above and save it to: {cache_raw}")
+        return []
 
     # Build providers data
     provider_map = _provider_name_lookup(payload)
@@ -441,7 +450,7 @@ def scrape_country_via_api(country_slug: str = "france") -> List[Dict[str, Any]]
 
 
 def scrape_country(country_slug: str = "france") -> List[Dict[str, Any]]:
-    # Prefer country API for France. If it fails or yields nothing, we can extend with fallbacks later.
+    # Prefer the country API. If it fails or yields nothing, we can extend with fallbacks later.
     try:
         plans = scrape_country_via_api(country_slug)
         if plans:
@@ -673,32 +682,46 @@ def _days_covered_at_R(row: pd.Series, daily_need_mb: float) -> int:
     return int(min(validity, max_days_by_data))
 
 
-def build_trip_solution(plans: List[Dict[str, Any]], trip_days: int, daily_need_mb: Optional[float], exclude_providers: Optional[List[str]] = None, exclude_title_keywords: Optional[List[str]] = None):
-    # Normalize first (similar to analyze_plans but without filtering rows out)
+# Parameter-independent normalisation, keyed by payload hash and normaliser
+# version. Only the columns that depend on trip_days / R are recomputed per
+# solve (see _apply_trip_params).
+NORMALIZED_CACHE_DIR = os.path.join("scraped_data", "normalized_cache")
+# Bump when the normalised table changes for reasons outside the functions
+# hashed by _normalizer_digest (e.g. a helper they call)
+NORMALIZE_VERSION = 1
+_NORMALIZED_MEMO: Dict[str, pd.DataFrame] = {}
+# id(plans) -> (plans, key) for the last few payloads; holding the list keeps its id from being reused
+_PLANS_KEYS: Dict[int, Tuple[List[Dict[str, Any]], str]] = {}
+_PLANS_KEYS_MAX = 8
+
+
+@functools.lru_cache(maxsize=1)
+def _normalizer_digest() -> str:
+    """Version, pandas version and the source of the normalisation functions, so editing them invalidates cached frames."""
+    parts = [str(NORMALIZE_VERSION), pd.__version__]
+    for func in (convert_to_mb, convert_to_days, _normalize_trip_plans_uncached):
+        try:
+            parts.append(inspect.getsource(func))
+        except (OSError, TypeError):
+            parts.append(func.__qualname__)
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def _plans_hash(plans: List[Dict[str, Any]]) -> str:
+    """Cache key for a payload, serialised and hashed once per list (payloads are not mutated once loaded)."""
+    memo = _PLANS_KEYS.get(id(plans))
+    if memo is not None and memo[0] is plans:
+        return memo[1]
+    blob = json.dumps(plans, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    key = hashlib.sha256(_normalizer_digest().encode("ascii") + blob).hexdigest()
+    if len(_PLANS_KEYS) >= _PLANS_KEYS_MAX:
+        _PLANS_KEYS.pop(next(iter(_PLANS_KEYS)))
+    _PLANS_KEYS[id(plans)] = (plans, key)
+    return key
+
+
+def _normalize_trip_plans_uncached(plans: List[Dict[str, Any]]) -> pd.DataFrame:
     df = pd.DataFrame(plans)
-    if df.empty:
-        return [], {"ok": False, "reason": "No plans scraped"}
-
-    # Exclude providers if requested
-    if exclude_providers:
-        ex = [e.strip().lower() for e in exclude_providers if e.strip()]
-        if ex:
-            prov_norm = df.get("provider", "").astype(str).str.lower()
-            mask = ~prov_norm.apply(lambda p: any(e in p for e in ex))
-            df = df[mask]
-            if df.empty:
-                return [], {"ok": False, "reason": "All plans excluded by provider filter"}
-
-    # Exclude plan title keywords (e.g., when ineligible for specific promos)
-    if exclude_title_keywords:
-        exk = [e.strip().lower() for e in exclude_title_keywords if e.strip()]
-        if exk:
-            title_norm = df.get("plan_title", "").astype(str).str.lower()
-            mask = ~title_norm.apply(lambda t: any(k in t for k in exk))
-            df = df[mask]
-            if df.empty:
-                return [], {"ok": False, "reason": "All plans excluded by title filter"}
-
     df["data_mb"] = df.get("capacity", "").apply(convert_to_mb)
     df["validity_days"] = df.get("period", "").apply(convert_to_days)
     # Use numeric USD-derived price directly when available; fall back to price
@@ -708,89 +731,15 @@ def build_trip_solution(plans: List[Dict[str, Any]], trip_days: int, daily_need_
     df["is_daily_quota"] = cap_str.str.contains(r"/\s*day|per\s*day|daily", regex=True)
 
     # Effective total data across own validity
-    def effective_total(row):
-        data = row.get("data_mb", np.nan)
-        validity = row.get("validity_days", np.nan)
-        if pd.isna(data) or pd.isna(validity):
-            return np.nan
-        if data == float("inf") or validity == float("inf"):
-            return float("inf")
-        if row.get("is_daily_quota", False):
-            return data * validity if validity > 0 else 0.0
-        return data
-
-    df["plan_total_data_mb"] = df.apply(effective_total, axis=1)
-
-    # Max data usable within the trip window (independent of R)
-    def plan_max_data_trip(row):
-        validity = row.get("validity_days", np.nan)
-        if pd.isna(validity) or validity <= 0:
-            return 0.0
-        if np.isinf(validity):
-            effective_days = trip_days
-        else:
-            effective_days = min(int(validity), int(trip_days))
-        data = row.get("data_mb", np.nan)
-        if pd.isna(data):
-            return 0.0
-        if row.get("is_daily_quota", False):
-            # Daily quota plans: at most daily_quota * min(validity, trip_days)
-            if np.isinf(data):
-                return float("inf")
-            return float(data) * float(effective_days)
-        # Non-daily plans: full bucket available during validity within trip
-        total = row.get("plan_total_data_mb", np.nan)
-        if pd.isna(total):
-            return 0.0
-        return float(total)
-
-    df["plan_max_data_trip_mb"] = df.apply(plan_max_data_trip, axis=1)
-
-    # Daily requirement used in effective validity and data_possible metrics
-    R = daily_need_mb if (daily_need_mb is not None) else 1.0
-
-    # Effective validity in days at R (not bounded by trip)
-    def eff_valid_days(row):
-        v = row.get("validity_days", np.nan)
-        if pd.isna(v) or v <= 0:
-            return 0.0
-        vdays = float('inf') if np.isinf(v) else float(v)
-        total = row.get("plan_total_data_mb", np.nan)
-        if pd.isna(total):
-            return 0.0
-        if R <= 0:
-            return vdays
-        # days until data exhaust at R
-        days_by_data = float('inf') if np.isinf(total) else (total / R)
-        return float(min(vdays, days_by_data))
-
-    df["effective_validity_days_at_R"] = df.apply(eff_valid_days, axis=1)
-    df["effective_validity_days_at_R_trip"] = df["effective_validity_days_at_R"].apply(lambda x: min(x, float(trip_days)))
-
-    # Data possible at R (not bounded by trip) and within trip
-    def data_possible_at_R(row):
-        v = row.get("validity_days", np.nan)
-        total = row.get("plan_total_data_mb", np.nan)
-        if pd.isna(v) or pd.isna(total):
-            return 0.0
-        vdays = float('inf') if np.isinf(v) else float(v)
-        if np.isinf(total):
-            return float('inf') if np.isinf(vdays) else R * vdays
-        return min(total, R * vdays)
-
-    def data_possible_at_R_trip(row):
-        v = row.get("validity_days", np.nan)
-        total = row.get("plan_total_data_mb", np.nan)
-        if pd.isna(v) or pd.isna(total):
-            return 0.0
-        vdays = float('inf') if np.isinf(v) else float(v)
-        vdays_trip = min(vdays, float(trip_days))
-        if np.isinf(total):
-            return float('inf') if np.isinf(vdays_trip) else R * vdays_trip
-        return min(total, R * vdays_trip)
-
-    df["data_possible_mb_at_R"] = df.apply(data_possible_at_R, axis=1)
-    df["data_possible_mb_at_R_trip"] = df.apply(data_possible_at_R_trip, axis=1)
+    data = df["data_mb"].to_numpy(dtype=float)
+    validity = df["validity_days"].to_numpy(dtype=float)
+    is_daily = df["is_daily_quota"].to_numpy(dtype=bool)
+    with np.errstate(invalid="ignore"):
+        df["plan_total_data_mb"] = np.select(
+            [np.isnan(data) | np.isnan(validity), np.isinf(data) | np.isinf(validity), is_daily],
+            [np.nan, np.inf, np.where(validity > 0, data * validity, 0.0)],
+            default=data,
+        )
 
     # Determine free and Firsty
     # Coerce promo/base to numeric then detect free
@@ -807,54 +756,195 @@ def build_trip_solution(plans: List[Dict[str, Any]], trip_days: int, daily_need_
     df.loc[df["is_free"], "plan_cost"] = 0.0
 
     prov = df.get("provider", "").astype(str).str.lower()
-    title = df.get("plan_title", "").astype(str).str.lower()
     # Firsty Free detection: either provider exactly "firsty free" OR (provider contains "firsty" AND cost == 0)
     prov_norm = prov.str.strip()
     exact_firsty_free = prov_norm.eq("firsty free")
     firsty_and_zero_cost = prov_norm.str.contains("firsty") & (df["plan_cost"].fillna(0) <= 1e-9)
     df["is_firsty_free"] = exact_firsty_free | firsty_and_zero_cost
+    return df
+
+
+def normalize_trip_plans(plans: List[Dict[str, Any]], use_disk_cache: bool = True) -> pd.DataFrame:
+    """Return the parameter-independent plan table, cached in memory and on disk by payload hash.
+
+    The returned frame is shared; callers must copy before mutating.
+    """
+    key = _plans_hash(plans)
+    cached = _NORMALIZED_MEMO.get(key)
+    if cached is not None:
+        return cached
+    cache_path = os.path.join(NORMALIZED_CACHE_DIR, f"{key}.pkl")
+    if use_disk_cache and os.path.exists(cache_path):
+        try:
+            cached = pd.read_pickle(cache_path)
+        except Exception:
+            cached = None
+    if cached is None:
+        cached = _normalize_trip_plans_uncached(plans)
+        if use_disk_cache:
+            try:
+                os.makedirs(NORMALIZED_CACHE_DIR, exist_ok=True)
+                cached.to_pickle(cache_path)
+            except Exception as e:
+                print(f"Warning: failed to write normalisation cache: {e}")
+    _NORMALIZED_MEMO[key] = cached
+    return cached
+
+
+def _apply_trip_params(df: pd.DataFrame, trip_days: int, R: float) -> pd.DataFrame:
+    """Add the columns that depend on trip_days and the daily requirement R (vectorised)."""
+    validity = df["validity_days"].to_numpy(dtype=float)
+    data = df["data_mb"].to_numpy(dtype=float)
+    total = df["plan_total_data_mb"].to_numpy(dtype=float)
+    is_daily = df["is_daily_quota"].to_numpy(dtype=bool)
+    trip = float(trip_days)
+
+    with np.errstate(invalid="ignore"):
+        no_validity = np.isnan(validity) | (validity <= 0)
+
+        # Max data usable within the trip window (independent of R)
+        effective_days = np.where(np.isinf(validity), trip, np.minimum(np.floor(validity), trip))
+        daily_max = np.where(np.isinf(data), np.inf, data * effective_days)
+        max_trip = np.where(is_daily, daily_max, total)
+        max_trip = np.where(no_validity | np.isnan(data) | np.isnan(max_trip), 0.0, max_trip)
+        df["plan_max_data_trip_mb"] = max_trip
+
+        # Effective validity in days at R (not bounded by trip)
+        if R <= 0:
+            eff_valid = validity.copy()
+        else:
+            eff_valid = np.minimum(validity, total / R)
+        eff_valid = np.where(no_validity | np.isnan(total), 0.0, eff_valid)
+        df["effective_validity_days_at_R"] = eff_valid
+        df["effective_validity_days_at_R_trip"] = np.minimum(eff_valid, trip)
+
+        # Data possible at R (not bounded by trip) and within trip
+        missing = np.isnan(validity) | np.isnan(total)
+        r_window = R * validity
+        r_window = np.where(np.isnan(r_window), np.inf, r_window)  # R == 0 with unlimited validity
+        df["data_possible_mb_at_R"] = np.where(missing, 0.0, np.minimum(total, r_window))
+        df["data_possible_mb_at_R_trip"] = np.where(missing, 0.0, np.minimum(total, R * np.minimum(validity, trip)))
+    return df
+
+
+def _selection_entry(row: pd.Series, R: float, delivered: float, days_cov: int, price: float, promo_used_flag: bool) -> Dict[str, Any]:
+    """Build the reporting record for one purchase of the plan in `row`."""
+    # For reporting, data_delivered_mb should reflect plan's possible data at R within trip (even if sums exceed need)
+    plan_possible = row.get("data_possible_mb_at_R_trip", delivered)
+    eff_valid_trip = row.get("effective_validity_days_at_R_trip", 0.0)
+    eff_cost_per_day = 0.0
+    try:
+        eff_cost_per_day = float(price) / eff_valid_trip if eff_valid_trip > 0 else (0.0 if float(price) == 0.0 else float('inf'))
+    except Exception:
+        eff_cost_per_day = 0.0
+    sel = {
+        "provider": row.get("provider", ""),
+        "provider_id": row.get("provider_id", ""),
+        "provider_slug": row.get("provider_slug", ""),
+        "plan_id": row.get("plan_id", ""),
+        "plan_title": row.get("plan_title", ""),
+        "price": row.get("plan_cost", 0.0),
+        "purchase_count": 1,
+        "days_covered": days_cov,
+        "data_delivered_mb": plan_possible,
+        "used_mb_for_feasibility": delivered,
+        "cost_total": float(price),
+        "plan_effective_days_at_R": _days_covered_at_R(row, R),
+        "plan_total_data_mb": row.get("plan_total_data_mb", np.nan),
+        "validity_days": row.get("validity_days", np.nan),
+        "effective_validity_days_at_R": row.get("effective_validity_days_at_R", 0.0),
+        "effective_validity_days_at_R_trip": eff_valid_trip,
+        "effective_cost_per_day_at_R_trip": eff_cost_per_day,
+        "promo_used": bool(promo_used_flag),
+    }
+    return sel
+
+
+def _prepare_trip_table(plans: List[Dict[str, Any]], trip_days: int, daily_need_mb: Optional[float], exclude_providers: Optional[List[str]] = None, exclude_title_keywords: Optional[List[str]] = None):
+    """Normalised, filtered plan table with the trip-dependent columns. Returns (df, R, error_stats)."""
+    # Normalize first (similar to analyze_plans but without filtering rows out)
+    if not plans:
+        return None, None, {"ok": False, "reason": "No plans scraped"}
+    df = normalize_trip_plans(plans)
+    if df.empty:
+        return None, None, {"ok": False, "reason": "No plans scraped"}
+
+    # Exclude providers if requested
+    if exclude_providers:
+        ex = [e.strip().lower() for e in exclude_providers if e.strip()]
+        if ex:
+            prov_norm = df.get("provider", "").astype(str).str.lower()
+            mask = ~prov_norm.apply(lambda p: any(e in p for e in ex))
+            df = df[mask]
+            if df.empty:
+                return None, None, {"ok": False, "reason": "All plans excluded by provider filter"}
+
+    # Exclude plan title keywords (e.g., when ineligible for specific promos)
+    if exclude_title_keywords:
+        exk = [e.strip().lower() for e in exclude_title_keywords if e.strip()]
+        if exk:
+            title_norm = df.get("plan_title", "").astype(str).str.lower()
+            mask = ~title_norm.apply(lambda t: any(k in t for k in exk))
+            df = df[mask]
+            if df.empty:
+                return None, None, {"ok": False, "reason": "All plans excluded by title filter"}
+
+    # Daily requirement used in effective validity and data_possible metrics
+    R = daily_need_mb if (daily_need_mb is not None) else 1.0
+    df = _apply_trip_params(df.copy(), trip_days, R)
+    return df, R, None
+
+
+def build_trip_solution(plans: List[Dict[str, Any]], trip_days: int, daily_need_mb: Optional[float], exclude_providers: Optional[List[str]] = None, exclude_title_keywords: Optional[List[str]] = None):
+    df, R, error = _prepare_trip_table(plans, trip_days, daily_need_mb, exclude_providers, exclude_title_keywords)
+    if error is not None:
+        return [], error
 
     # Daily requirement already defined above for metrics
 
     N = int(trip_days)
     remaining_need = [R] * N
+    # Days that still need data, kept sorted; its length is the unsatisfied-day count
+    active_days: List[int] = [d for d in range(N) if remaining_need[d] > 1e-9]
     selections: List[Dict[str, Any]] = []
 
-    def simulate_plan(row: pd.Series, rem: List[float]) -> (List[float], float, int):
-        # Returns per-day contributions, total delivered, days_covered (any contribution),
+    def simulate_plan(row: pd.Series, rem: List[float]) -> (Dict[int, float], float, int):
+        # Returns per-day contributions {day: MB}, total delivered, days_covered (any contribution),
         # while allowing best activation shift within trip window.
         valid = row.get("validity_days", np.nan)
         if pd.isna(valid) or valid <= 0:
-            return [0.0]*N, 0.0, 0
+            return {}, 0.0, 0
         days_valid = N if np.isinf(valid) else min(int(valid), N)
         is_daily = bool(row.get("is_daily_quota", False))
         data = row.get("data_mb", np.nan)
         total_bucket = float('inf') if (not is_daily and (np.isinf(data))) else row.get("plan_total_data_mb", 0.0)
+        dq = data if not pd.isna(data) else 0.0
 
-        best_contrib = [0.0]*N
+        best_contrib: Dict[int, float] = {}
         best_delivered = 0.0
         best_days_cov = 0
-        # Try all possible activation starts
-        for start in range(0, N):
-            end = min(N, start + days_valid)
-            contrib = [0.0]*N
+        # Only activations on a day that still needs data matter: any other start
+        # covers a subset of the needy days reached by starting on the next needy day.
+        n_active = len(active_days)
+        for i in range(n_active):
+            end = min(N, active_days[i] + days_valid)
+            contrib: Dict[int, float] = {}
             delivered_sum = 0.0
             days_cov = 0
             bucket = total_bucket if not pd.isna(total_bucket) else 0.0
-            for d in range(start, end):
+            j = i
+            while j < n_active and active_days[j] < end:
+                d = active_days[j]
+                j += 1
                 need = rem[d]
-                if need <= 1e-9:
-                    continue
                 if is_daily:
-                    dq = data if not pd.isna(data) else 0.0
                     delivered = max(0.0, min(need, dq))
                 else:
                     if pd.isna(bucket) or bucket <= 0.0:
-                        delivered = 0.0
-                    else:
-                        delivered = max(0.0, min(need, R, bucket))
+                        break
+                    delivered = max(0.0, min(need, R, bucket))
                 if delivered > 0:
-                    contrib[d] += delivered
+                    contrib[d] = delivered
                     delivered_sum += delivered
                     days_cov += 1
                     if not is_daily and not np.isinf(bucket):
@@ -866,40 +956,13 @@ def build_trip_solution(plans: List[Dict[str, Any]], trip_days: int, daily_need_
                 best_days_cov = days_cov
         return best_contrib, best_delivered, best_days_cov
 
-    def apply_selection(row: pd.Series, contrib: List[float], delivered: float, days_cov: int, price: float, promo_used_flag: bool):
-        nonlocal remaining_need
+    def apply_selection(row: pd.Series, contrib: Dict[int, float], delivered: float, days_cov: int, price: float, promo_used_flag: bool):
+        nonlocal active_days
         # subtract per-day
-        for d in range(N):
-            if contrib[d] > 0:
-                remaining_need[d] = max(0.0, remaining_need[d] - contrib[d])
-        # For reporting, data_delivered_mb should reflect plan's possible data at R within trip (even if sums exceed need)
-        plan_possible = row.get("data_possible_mb_at_R_trip", delivered)
-        eff_valid_trip = row.get("effective_validity_days_at_R_trip", 0.0)
-        eff_cost_per_day = 0.0
-        try:
-            eff_cost_per_day = float(price) / eff_valid_trip if eff_valid_trip > 0 else (0.0 if float(price) == 0.0 else float('inf'))
-        except Exception:
-            eff_cost_per_day = 0.0
-        sel = {
-            "provider": row.get("provider", ""),
-            "provider_id": row.get("provider_id", ""),
-            "provider_slug": row.get("provider_slug", ""),
-            "plan_id": row.get("plan_id", ""),
-            "plan_title": row.get("plan_title", ""),
-            "price": row.get("plan_cost", 0.0),
-            "purchase_count": 1,
-            "days_covered": days_cov,
-            "data_delivered_mb": plan_possible,
-            "used_mb_for_feasibility": delivered,
-            "cost_total": float(price),
-            "plan_effective_days_at_R": _days_covered_at_R(row, R),
-            "plan_total_data_mb": row.get("plan_total_data_mb", np.nan),
-            "validity_days": row.get("validity_days", np.nan),
-            "effective_validity_days_at_R": row.get("effective_validity_days_at_R", 0.0),
-            "effective_validity_days_at_R_trip": eff_valid_trip,
-            "effective_cost_per_day_at_R_trip": eff_cost_per_day,
-            "promo_used": bool(promo_used_flag),
-        }
+        for d, amount in contrib.items():
+            remaining_need[d] = max(0.0, remaining_need[d] - amount)
+        active_days = [d for d in active_days if remaining_need[d] > 1e-9]
+        sel = _selection_entry(row, R, delivered, days_cov, price, promo_used_flag)
         _merge_or_add_selection(selections, sel)
 
     # 1) Non-Firsty free plans (one per provider)
@@ -916,9 +979,7 @@ def build_trip_solution(plans: List[Dict[str, Any]], trip_days: int, daily_need_
             free_df["effective_validity_days_at_R_trip"] = 0.0
         used_providers = set()
         # Greedy loop: keep selecting the best remaining free plan that contributes > 0
-        while True:
-            if all(n <= 1e-9 for n in remaining_need):
-                break
+        while active_days:
             best_idx = None
             best_row = None
             best_rank = None  # tuple for sorting
@@ -963,7 +1024,7 @@ def build_trip_solution(plans: List[Dict[str, Any]], trip_days: int, daily_need_
     paid_df = df[~(df["is_free"] | df["is_free_via_promo"] | df["is_free_via_base"])].copy()
     # Track promo consumption per plan_id (also used in free step)
     promo_consumed_by_plan: Dict[str, bool] = {}
-    while not all(n <= 1e-9 for n in remaining_need) and not paid_df.empty:
+    while active_days and not paid_df.empty:
         best = None
         best_cpm = None
         best_days_cov = 0
@@ -1001,9 +1062,9 @@ def build_trip_solution(plans: List[Dict[str, Any]], trip_days: int, daily_need_
 
     total_cost = sum(s["cost_total"] for s in selections)
     used_total = sum(s.get("used_mb_for_feasibility", 0.0) for s in selections)
-    days_met = sum(1 for n in remaining_need if n <= 1e-9)
+    days_met = N - len(active_days)
 
-    ok = (days_met >= trip_days and used_total + 1e-6 >= trip_days * R and all(n <= 1e-9 for n in remaining_need))
+    ok = (days_met >= trip_days and used_total + 1e-6 >= trip_days * R and not active_days)
     stats = {
         "ok": ok,
         "total_cost": total_cost,
@@ -1015,6 +1076,255 @@ def build_trip_solution(plans: List[Dict[str, Any]], trip_days: int, daily_need_
     return selections, stats
 
 
+# -------- Exact solver (day-grid MILP) -------- #
+
+def _pareto_keep(dv: np.ndarray, amount: np.ndarray, price: np.ndarray) -> np.ndarray:
+    """Boolean mask of items not dominated by another with >= validity, >= amount and <= price."""
+    order = np.lexsort((-amount, -dv, price))
+    keep = np.zeros(len(price), dtype=bool)
+    kept_dv = np.empty(0)
+    kept_amount = np.empty(0)
+    for i in order:
+        if kept_dv.size and np.any((kept_dv >= dv[i]) & (kept_amount >= amount[i] - 1e-9)):
+            continue
+        keep[i] = True
+        kept_dv = np.append(kept_dv, dv[i])
+        kept_amount = np.append(kept_amount, amount[i])
+    return keep
+
+
+def _dominated_by(items: pd.DataFrame, others: pd.DataFrame, ignore_amount: bool = False) -> np.ndarray:
+    """Mask of `items` rows for which some row in `others` has >= dv, >= amount and <= price."""
+    if items.empty or others.empty:
+        return np.zeros(len(items), dtype=bool)
+    dv_ok = others["dv"].to_numpy()[None, :] >= items["dv"].to_numpy()[:, None]
+    price_ok = others["price"].to_numpy()[None, :] <= items["price"].to_numpy()[:, None]
+    ok = dv_ok & price_ok
+    if not ignore_amount:
+        ok &= others["amount"].to_numpy()[None, :] >= items["amount"].to_numpy()[:, None] - 1e-9
+    return ok.any(axis=1)
+
+
+def _exact_items(df: pd.DataFrame, N: int, R: float) -> pd.DataFrame:
+    """Collapse the plan table into purchasable items for the MILP.
+
+    Each item has a window length `dv` (days, capped at the trip) and either a
+    fixed per-day fraction of R ("cover") or a bucket worth `amount` days of R
+    that can be spread over the window ("bucket"). Items with the same shape are
+    merged and dominated ones dropped, so the model size depends on the number
+    of distinct plan shapes rather than the catalogue size.
+    """
+    validity = df["validity_days"].to_numpy(dtype=float)
+    data = df["data_mb"].to_numpy(dtype=float)
+    total = df["plan_total_data_mb"].to_numpy(dtype=float)
+    is_daily = df["is_daily_quota"].to_numpy(dtype=bool)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        usable = ~(np.isnan(validity) | (validity <= 0)) & ~df["is_firsty_free"].to_numpy(dtype=bool)
+        dv = np.where(np.isinf(validity), N, np.minimum(np.nan_to_num(np.floor(validity)), N)).astype(int)
+        daily_frac = np.where(np.isinf(data), 1.0, np.minimum(np.nan_to_num(data), R) / R)
+        bucket_days = np.where(np.isinf(total) | (np.isinf(data) & ~is_daily), np.inf, np.nan_to_num(total) / R)
+    is_bucket = ~is_daily & (bucket_days < dv)
+    amount = np.where(is_daily, daily_frac, np.where(is_bucket, bucket_days, 1.0))
+    usable &= (dv >= 1) & (amount > 1e-9)
+
+    is_free = df["is_free"].to_numpy(dtype=bool)
+    base = df["price_usd_base"].to_numpy(dtype=float)
+    base = np.where(np.isnan(base), df["plan_cost"].to_numpy(dtype=float), base)
+    promo = df["price_usd_promo"].to_numpy(dtype=float)
+    provider = df.get("provider_id", pd.Series("", index=df.index)).astype(str).str.strip().str.lower()
+    provider = provider.where(provider != "", df.get("provider", pd.Series("", index=df.index)).astype(str).str.strip().str.lower())
+
+    common = pd.DataFrame({
+        "label": df.index,
+        "kind": np.where(is_bucket, "bucket", "cover"),
+        "dv": dv,
+        "amount": np.round(amount, 6),
+        "provider": provider.to_numpy(),
+    })
+    free = common[usable & is_free].assign(price=0.0, limit="free")
+    paid = usable & ~is_free
+    base_items = common[paid & ~np.isnan(base)].assign(price=base[paid & ~np.isnan(base)], limit="none")
+    has_promo = paid & ~np.isnan(promo) & (promo < np.where(np.isnan(base), np.inf, base))
+    promo_items = common[has_promo].assign(price=promo[has_promo], limit="promo")
+
+    shape = ["kind", "dv", "amount"]
+    # Unlimited repurchases: one cheapest item per shape, then Pareto-prune per kind.
+    base_items = base_items.sort_values("price", kind="stable").drop_duplicates(shape)
+    parts = []
+    for _, grp in base_items.groupby("kind"):
+        mask = _pareto_keep(grp["dv"].to_numpy(float), grp["amount"].to_numpy(float), grp["price"].to_numpy(float))
+        parts.append(grp[mask])
+    base_items = pd.concat(parts) if parts else base_items
+    # A full-day cover item also dominates any bucket with a window no longer than its own.
+    full_cover = base_items[(base_items["kind"] == "cover") & (base_items["amount"] >= 1.0 - 1e-9)]
+    if not full_cover.empty:
+        bucket_mask = (base_items["kind"] == "bucket").to_numpy()
+        dominated = _dominated_by(base_items[bucket_mask], full_cover, ignore_amount=True)
+        drop = np.zeros(len(base_items), dtype=bool)
+        drop[np.flatnonzero(bucket_mask)[dominated]] = True
+        base_items = base_items[~drop]
+    # Promo prices are single-use per plan, so keep up to N cheapest per shape,
+    # and only where no repurchasable item is at least as good for the price.
+    promo_items = promo_items.sort_values("price", kind="stable").groupby(shape, sort=False).head(N)
+    keep = np.ones(len(promo_items), dtype=bool)
+    for kind, grp in base_items.groupby("kind"):
+        mask = (promo_items["kind"] == kind).to_numpy()
+        keep[np.flatnonzero(mask)[_dominated_by(promo_items[mask], grp)]] = False
+    promo_items = promo_items[keep]
+    # Free plans: one per provider, so only distinct shapes per provider matter.
+    free = free.drop_duplicates(["provider"] + shape)
+
+    items = pd.concat([free, promo_items, base_items], ignore_index=True)
+    return items
+
+
+def solve_trip_exact(plans: List[Dict[str, Any]], trip_days: int, daily_need_mb: Optional[float], exclude_providers: Optional[List[str]] = None, exclude_title_keywords: Optional[List[str]] = None, time_limit: float = 30.0):
+    """Exact per-day coverage solve with scipy.optimize.milp (HiGHS).
+
+    Integer x[item, start] counts purchases activated on day `start`. "cover"
+    items contribute a fixed fraction of R on every day of their window;
+    "bucket" items get continuous y[item, start, day] in [0, 1] whose sum is
+    capped by the bucket size. Every trip day must reach a full R. Falls back to
+    the greedy builder if SciPy is unavailable. Stats include the gap to greedy.
+    """
+    greedy_selections, greedy_stats = build_trip_solution(plans, trip_days, daily_need_mb, exclude_providers, exclude_title_keywords)
+    if milp is None:
+        print("SciPy not installed; exact mode unavailable, using greedy solution.")
+        return greedy_selections, dict(greedy_stats, mode="greedy")
+
+    df, R, error = _prepare_trip_table(plans, trip_days, daily_need_mb, exclude_providers, exclude_title_keywords)
+    if error is not None:
+        return [], error
+
+    t_build = time.perf_counter()
+    N = int(trip_days)
+    items = _exact_items(df, N, R)
+    if items.empty or R <= 0:
+        return greedy_selections, dict(greedy_stats, mode="greedy")
+
+    # Columns: every item at every activation start that is not dominated by an earlier one.
+    dv = items["dv"].to_numpy(int)
+    n_starts = N - dv + 1
+    col_item = np.repeat(np.arange(len(items)), n_starts)
+    col_start = np.arange(n_starts.sum()) - np.repeat(np.cumsum(n_starts) - n_starts, n_starts)
+    n_cols = len(col_item)
+    col_dv = dv[col_item]
+    col_is_bucket = (items["kind"].to_numpy() == "bucket")[col_item]
+
+    # Expand each column into its window days.
+    cell_col = np.repeat(np.arange(n_cols), col_dv)
+    cell_day = col_start[cell_col] + (np.arange(col_dv.sum()) - np.repeat(np.cumsum(col_dv) - col_dv, col_dv))
+    cell_bucket = col_is_bucket[cell_col]
+
+    # Variable layout: [x (n_cols) | y (one per bucket cell)]
+    y_cells = np.flatnonzero(cell_bucket)
+    n_y = len(y_cells)
+    n_vars = n_cols + n_y
+    amount = items["amount"].to_numpy(float)
+
+    # Day coverage rows: sum(frac * x) + sum(y) >= 1
+    cover_cells = np.flatnonzero(~cell_bucket)
+    cov_rows = np.concatenate([cell_day[cover_cells], cell_day[y_cells]])
+    cov_cols = np.concatenate([cell_col[cover_cells], n_cols + np.arange(n_y)])
+    cov_vals = np.concatenate([amount[col_item[cell_col[cover_cells]]], np.ones(n_y)])
+    A_cov = sparse.csr_matrix((cov_vals, (cov_rows, cov_cols)), shape=(N, n_vars))
+    constraints = [LinearConstraint(A_cov, lb=np.ones(N) - 1e-9, ub=np.inf)]
+
+    # Bucket capacity rows: sum(y over window) - amount * x <= 0
+    bucket_cols = np.flatnonzero(col_is_bucket)
+    if len(bucket_cols):
+        row_of_col = np.full(n_cols, -1)
+        row_of_col[bucket_cols] = np.arange(len(bucket_cols))
+        rows = np.concatenate([row_of_col[cell_col[y_cells]], row_of_col[bucket_cols]])
+        cols = np.concatenate([n_cols + np.arange(n_y), bucket_cols])
+        vals = np.concatenate([np.ones(n_y), -amount[col_item[bucket_cols]]])
+        A_cap = sparse.csr_matrix((vals, (rows, cols)), shape=(len(bucket_cols), n_vars))
+        constraints.append(LinearConstraint(A_cap, lb=-np.inf, ub=0.0))
+
+    # Single-use rows: each promo item at most once; at most one free plan per provider.
+    limit = items["limit"].to_numpy()
+    group_key = np.where(limit == "promo", "promo:" + items.index.astype(str), np.where(limit == "free", "free:" + items["provider"].astype(str), ""))
+    limited = group_key[col_item] != ""
+    if limited.any():
+        codes, group_idx = np.unique(group_key[col_item][limited], return_inverse=True)
+        A_lim = sparse.csr_matrix((np.ones(limited.sum()), (group_idx, np.flatnonzero(limited))), shape=(len(codes), n_vars))
+        constraints.append(LinearConstraint(A_lim, lb=-np.inf, ub=1.0))
+
+    # Objective: price, plus a tiny per-purchase term to prefer fewer eSIMs on ties.
+    c = np.concatenate([items["price"].to_numpy(float)[col_item] + 1e-4, np.zeros(n_y)])
+    integrality = np.concatenate([np.ones(n_cols), np.zeros(n_y)])
+    ub = np.concatenate([np.where(limited, 1.0, float(N)), np.ones(n_y)])
+    build_seconds = time.perf_counter() - t_build
+    print(f"Exact model: {len(items)} items, {n_cols} purchase columns, {n_y} bucket cells, built in {build_seconds*1000:.0f} ms")
+
+    t_solve = time.perf_counter()
+    res = milp(c, constraints=constraints, integrality=integrality, bounds=Bounds(np.zeros(n_vars), ub), options={"time_limit": time_limit, "disp": False})
+    solve_seconds = time.perf_counter() - t_solve
+    if res.x is None:
+        print(f"Exact solver found no solution ({res.message}); using greedy solution.")
+        return greedy_selections, dict(greedy_stats, mode="greedy", exact_status=res.message)
+
+    # Decode purchases in activation order, attributing per-day delivery like the greedy report.
+    x = np.round(res.x[:n_cols]).astype(int)
+    y = res.x[n_cols:]
+    y_of_cell = np.zeros(len(cell_col))
+    y_of_cell[y_cells] = y
+    remaining_need = np.full(N, float(R))
+    selections: List[Dict[str, Any]] = []
+    for col in sorted(np.flatnonzero(x > 0), key=lambda k: (col_start[k], col_item[k])):
+        item = items.iloc[col_item[col]]
+        row = df.loc[item["label"]]
+        cells = np.flatnonzero(cell_col == col)
+        days = cell_day[cells]
+        for _ in range(x[col]):
+            if item["kind"] == "bucket":
+                offer = y_of_cell[cells] * R / x[col]
+            else:
+                offer = np.full(len(days), item["amount"] * R)
+            contrib = np.minimum(remaining_need[days], offer)
+            if contrib.sum() <= 1e-9:
+                continue  # solver slack (e.g. after a time limit); the purchase adds nothing
+            remaining_need[days] -= contrib
+            promo_used = item["limit"] == "promo" or (item["limit"] == "free" and bool(row.get("is_free_via_promo", False)))
+            sel = _selection_entry(row, R, float(contrib.sum()), int((contrib > 1e-9).sum()), float(item["price"]), promo_used)
+            _merge_or_add_selection(selections, sel)
+
+    total_cost = sum(s["cost_total"] for s in selections)
+    used_total = sum(s.get("used_mb_for_feasibility", 0.0) for s in selections)
+    days_met = int((remaining_need <= 1e-6 * max(R, 1.0)).sum())
+    greedy_cost = greedy_stats.get("total_cost") if greedy_stats.get("ok") else None
+    stats = {
+        "ok": days_met >= trip_days,
+        "total_cost": total_cost,
+        "total_data_mb": used_total,
+        "required_data_mb": trip_days * R,
+        "days_covered": days_met,
+        "trip_days": trip_days,
+        "mode": "exact",
+        "exact_status": res.message,
+        "exact_optimal": res.status == 0,
+        "mip_gap": getattr(res, "mip_gap", None),
+        "greedy_cost": greedy_cost,
+        "savings_vs_greedy": (greedy_cost - total_cost) if greedy_cost is not None else None,
+        "gap_to_greedy": ((greedy_cost - total_cost) / greedy_cost) if greedy_cost else None,
+        "build_seconds": build_seconds,
+        "solve_seconds": solve_seconds,
+    }
+    if greedy_cost is not None and (not stats["ok"] or total_cost > greedy_cost + 1e-9):
+        # Not proven optimal within the time limit and still worse than greedy: keep greedy's plan.
+        if stats["ok"]:
+            print(f"Exact solve stopped at ${total_cost:.2f} ({res.message}); greedy is cheaper at ${greedy_cost:.2f}.")
+        else:
+            print(f"Exact solve stopped covering {days_met}/{trip_days} days ({res.message}); using greedy at ${greedy_cost:.2f}.")
+        # Greedy's figures win; exact-only fields (status, gap, timings) are kept for the report,
+        # but the comparison with greedy no longer applies to the plan being returned
+        stats = {**stats, **greedy_stats}
+        stats.update(mode="greedy", exact_cost=total_cost, savings_vs_greedy=0.0, gap_to_greedy=None)
+        return greedy_selections, stats
+    return selections, stats
+
+
 # -------- File writing helpers -------- #
 
 def _unique_path(path: str) -> str:
@@ -1039,19 +1349,165 @@ def _safe_write_csv(df: pd.DataFrame, path: str):
     return path
 
 
+def _json_default(value: Any):
+    # numpy scalars leak into selections via DataFrame rows
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
 def _safe_write_json(obj: Any, path: str):
     try:
         with open(path, "w", encoding="utf-8") as f:
-            json.dump(obj, f, ensure_ascii=False, indent=2)
+            json.dump(obj, f, ensure_ascii=False, indent=2, default=_json_default)
     except PermissionError:
         alt = _unique_path(path)
         print(f"Permission denied writing {path}. Trying alternate filename: {alt}")
         with open(alt, "w", encoding="utf-8") as f:
-            json.dump(obj, f, ensure_ascii=False, indent=2)
+            json.dump(obj, f, ensure_ascii=False, indent=2, default=_json_default)
         return alt
     return path
 
 
+# -------- Solution output -------- #
+
+SOLUTION_COLUMNS = [
+    "provider","provider_id","provider_slug","plan_id","plan_title","price",
+    "purchase_count","days_covered","data_delivered_mb","used_mb_for_feasibility",
+    "plan_total_data_mb","validity_days",
+    "effective_validity_days_at_R","effective_validity_days_at_R_trip","effective_cost_per_day_at_R_trip",
+    "promo_used","price_usd_promo","price_usd_base","promo_zero_any","base_zero_any",
+    "cost_total","plan_effective_days_at_R"
+]
+
+
+def _usage_tag(daily_mb: Optional[float]) -> str:
+    return f"{int(daily_mb)}mbpd" if (daily_mb is not None and not math.isinf(daily_mb)) else "unbounded"
+
+
+def write_solution_files(country_slug: str, trip_days: int, daily_mb: Optional[float], selections: List[Dict[str, Any]], stats: Dict[str, Any]) -> Tuple[str, str]:
+    """Write the per-country selections CSV and stats JSON. Returns the paths actually written."""
+    os.makedirs("scraped_data", exist_ok=True)
+    base = os.path.join("scraped_data", f"trip_solution_{country_slug}_{trip_days}days_{_usage_tag(daily_mb)}")
+
+    sel_df = pd.DataFrame(selections)
+    sel_df = sel_df[[c for c in SOLUTION_COLUMNS if c in sel_df.columns]]
+    out_csv_written = _safe_write_csv(sel_df, base + ".csv")
+    stats_written = _safe_write_json({"stats": stats, "selections": selections}, base + ".json")
+    return out_csv_written, stats_written
+
+
+def print_solution_summary(stats: Dict[str, Any]):
+    print(f"- Feasible: {stats['ok']}")
+    print(f"- Trip days: {stats['trip_days']}")
+    print(f"- Required data (MB): {int(stats['required_data_mb'])}")
+    print(f"- Delivered data (MB): {int(stats['total_data_mb'])}")
+    print(f"- Total cost: ${stats['total_cost']:.2f}")
+    if stats.get("greedy_cost") is not None:
+        optimal = "optimal" if stats.get("exact_optimal") else f"MIP gap {100 * (stats.get('mip_gap') or 0):.1f}%"
+        gap = stats.get("gap_to_greedy")
+        gap_txt = f", {100 * gap:.1f}% below greedy" if gap else ""
+        print(f"- Solver: {stats.get('mode')} ({optimal}); greedy cost ${stats['greedy_cost']:.2f}{gap_txt}")
+
+
+def solve_trip(plans: List[Dict[str, Any]], trip_days: int, daily_need_mb: Optional[float], exclude_providers: Optional[List[str]] = None, exclude_title_keywords: Optional[List[str]] = None, exact: bool = False, time_limit: float = 30.0):
+    """Dispatch to the greedy builder or the exact MILP solver."""
+    if exact:
+        return solve_trip_exact(plans, trip_days, daily_need_mb, exclude_providers, exclude_title_keywords, time_limit=time_limit)
+    return build_trip_solution(plans, trip_days=trip_days, daily_need_mb=daily_need_mb, exclude_providers=exclude_providers, exclude_title_keywords=exclude_title_keywords)
+
+
+# -------- Batch mode (multiple countries) -------- #
+
+def _solve_country_job(job: Tuple[str, List[Dict[str, Any]], int, Optional[float], Optional[List[str]], Optional[List[str]], bool, float]):
+    """Process-pool worker: solve one country and write its solution files."""
+    country_slug, plans, trip_days, daily_mb, exclude_providers, exclude_keywords, exact, time_limit = job
+    t0 = time.perf_counter()
+    selections, stats = solve_trip(plans, trip_days, daily_mb, exclude_providers, exclude_keywords, exact=exact, time_limit=time_limit)
+    csv_path = json_path = None
+    if selections:
+        csv_path, json_path = write_solution_files(country_slug, trip_days, daily_mb, selections, stats)
+    return country_slug, selections, stats, csv_path, json_path, time.perf_counter() - t0
+
+
+def run_batch(countries: List[str], trip_days: int, daily_mb: Optional[float], exclude_providers: Optional[List[str]] = None, exclude_keywords: Optional[List[str]] = None, fetch_workers: int = 4, solve_workers: Optional[int] = None, exact: bool = False, time_limit: float = 30.0) -> List[Dict[str, Any]]:
+    """Fetch, normalise and solve several countries concurrently.
+
+    Payloads are fetched on a bounded thread pool; each country is handed to a
+    process pool for build_trip_solution as soon as its plans are ready, so the
+    wall time tracks the slowest single country rather than the sum.
+    """
+    slugs = list(dict.fromkeys(resolve_country_slug(c) for c in countries if c.strip()))
+    t_start = time.perf_counter()
+    summary: List[Dict[str, Any]] = []
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, fetch_workers)) as fetch_pool, \
+            concurrent.futures.ProcessPoolExecutor(max_workers=solve_workers) as solve_pool:
+        fetch_futures = {fetch_pool.submit(scrape_country, slug): slug for slug in slugs}
+        solve_futures = []
+        for fut in concurrent.futures.as_completed(fetch_futures):
+            slug = fetch_futures[fut]
+            try:
+                plans = fut.result()
+            except Exception as e:
+                print(f"[{slug}] Scrape failed: {e}")
+                plans = []
+            if not plans:
+                summary.append({"country": slug, "ok": False, "reason": "No plans scraped"})
+                continue
+            print(f"[{slug}] {len(plans)} plans ready; solving ...")
+            solve_futures.append(solve_pool.submit(_solve_country_job, (slug, plans, trip_days, daily_mb, exclude_providers, exclude_keywords, exact, time_limit)))
+
+        for fut in concurrent.futures.as_completed(solve_futures):
+            try:
+                slug, selections, stats, csv_path, json_path, elapsed = fut.result()
+            except Exception as e:
+                print(f"Solver failed: {e}")
+                continue
+            print(f"[{slug}] Solved in {elapsed:.2f}s: feasible={stats.get('ok')} cost=${stats.get('total_cost', 0.0):.2f}")
+            summary.append({
+                "country": slug,
+                "ok": bool(stats.get("ok")),
+                "reason": stats.get("reason", ""),
+                "total_cost": stats.get("total_cost"),
+                "total_data_mb": stats.get("total_data_mb"),
+                "required_data_mb": stats.get("required_data_mb"),
+                "days_covered": stats.get("days_covered"),
+                "num_plans": len(selections),
+                "solver": stats.get("mode", "greedy"),
+                "greedy_cost": stats.get("greedy_cost"),
+                "gap_to_greedy": stats.get("gap_to_greedy"),
+                "solve_seconds": round(elapsed, 3),
+                "solution_csv": csv_path,
+                "solution_json": json_path,
+            })
+
+    order = {slug: i for i, slug in enumerate(slugs)}
+    summary.sort(key=lambda r: order.get(r["country"], len(order)))
+    wall = time.perf_counter() - t_start
+
+    os.makedirs("scraped_data", exist_ok=True)
+    summary_base = os.path.join("scraped_data", f"trip_solution_summary_{trip_days}days_{_usage_tag(daily_mb)}")
+    summary_csv = _safe_write_csv(pd.DataFrame(summary), summary_base + ".csv")
+    summary_json = _safe_write_json({
+        "trip_days": trip_days,
+        "daily_mb": daily_mb,
+        "wall_seconds": wall,
+        "countries": summary,
+    }, summary_base + ".json")
+
+    print("\nBatch summary:")
+    for row in summary:
+        if row.get("total_cost") is not None:
+            print(f"- {row['country']}: feasible={row['ok']} cost=${row['total_cost']:.2f} ({row['num_plans']} plans)")
+        else:
+            print(f"- {row['country']}: {row.get('reason') or 'failed'}")
+    print(f"Wall time: {wall:.2f}s for {len(slugs)} countries")
+    print(f"Saved summary CSV to: {summary_csv}")
+    print(f"Saved summary JSON to: {summary_json}")
+    return summary
+
+
 # -------- Orchestrator (interactive) -------- #
 
 def prompt_float(prompt: str, allow_blank: bool = False) -> Optional[float]:
@@ -1082,14 +1538,7 @@ def prompt_int(prompt: str) -> int:
             print("Invalid integer. Try again.")
 
 
-def main():
-    print("=== eSIM Plan Workflow (France) ===")
-
-    # Country is fixed to France per request, but keep here for future flexibility
-    country_slug = "france"
-    print("Country: France")
-
-    # Prompt for trip parameters
+def prompt_trip_params() -> Tuple[int, Optional[float]]:
     trip_days = prompt_int("How many days is the trip? ")
     print("Provide either daily usage (MB/day) OR monthly usage (MB/month). Leave one blank.")
     daily_mb = prompt_float("Estimated data usage per day (MB/day), or press Enter to skip: ", allow_blank=True)
@@ -1101,6 +1550,64 @@ def main():
 
     if daily_mb is None:
         print("No usage provided. Assuming unlimited data requirement (may exclude many plans).")
+    return trip_days, daily_mb
+
+
+def _split_csv_arg(value: Optional[str]) -> Optional[List[str]]:
+    if not value:
+        return None
+    items = [s.strip() for s in value.split(",") if s.strip()]
+    return items or None
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="eSIM trip solution workflow (any esimdb country)")
+    parser.add_argument("--country", default="france", help="Country slug or ISO code for interactive mode (default: france)")
+    parser.add_argument("--countries", help="Batch mode: comma-separated slugs or ISO codes, e.g. fr,it,es")
+    parser.add_argument("--trip-days", type=int, help="Trip length in days (batch mode)")
+    parser.add_argument("--daily-mb", type=float, help="Daily data need in MB (batch mode)")
+    parser.add_argument("--monthly-mb", type=float, help="Monthly data need in MB, used when --daily-mb is omitted")
+    parser.add_argument("--exclude-providers", help="Comma-separated provider names to exclude")
+    parser.add_argument("--exclude-keywords", help="Comma-separated plan title keywords to exclude")
+    parser.add_argument("--fetch-workers", type=int, default=4, help="Concurrent payload downloads in batch mode (default: 4)")
+    parser.add_argument("--solve-workers", type=int, default=None, help="Solver processes in batch mode (default: CPU count)")
+    parser.add_argument("--exact", action="store_true", help="Solve the day-grid integer program (needs scipy) and report the gap to greedy")
+    parser.add_argument("--time-limit", type=float, default=30.0, help="Time limit in seconds for --exact (default: 30)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+
+    if args.countries:
+        if not args.trip_days or args.trip_days <= 0:
+            raise SystemExit("--trip-days (> 0) is required with --countries")
+        daily_mb = args.daily_mb
+        if daily_mb is None and args.monthly_mb is not None:
+            daily_mb = args.monthly_mb / 30.0
+        print("=== eSIM Plan Workflow (batch) ===")
+        summary = run_batch(
+            _split_csv_arg(args.countries) or [],
+            trip_days=args.trip_days,
+            daily_mb=daily_mb,
+            exclude_providers=_split_csv_arg(args.exclude_providers),
+            exclude_keywords=_split_csv_arg(args.exclude_keywords),
+            fetch_workers=args.fetch_workers,
+            solve_workers=args.solve_workers,
+            exact=args.exact,
+            time_limit=args.time_limit,
+        )
+        if not any(row.get("num_plans") for row in summary):
+            raise SystemExit(1)
+        return
+
+    country_slug = resolve_country_slug(args.country)
+    country_name = country_slug.replace("-", " ").title()
+    print(f"=== eSIM Plan Workflow ({country_name}) ===")
+    print(f"Country: {country_name}")
+
+    # Prompt for trip parameters
+    trip_days, daily_mb = prompt_trip_params()
 
     # Scrape
     plans = scrape_country(country_slug)
@@ -1112,41 +1619,28 @@ def main():
     exk_input = input("Exclude plan title keywords (comma-separated, optional): ").strip()
     exclude_keywords = [s.strip() for s in exk_input.split(",")] if exk_input else None
 
-    selections, stats = build_trip_solution(plans, trip_days=trip_days, daily_need_mb=daily_mb, exclude_providers=exclude_list, exclude_title_keywords=exclude_keywords)
+    while True:
+        t0 = time.perf_counter()
+        selections, stats = solve_trip(plans, trip_days, daily_mb, exclude_list, exclude_keywords, exact=args.exact, time_limit=args.time_limit)
+        solve_ms = (time.perf_counter() - t0) * 1000.0
 
-    os.makedirs("scraped_data", exist_ok=True)
-    usage_tag = f"{int(daily_mb)}mbpd" if (daily_mb is not None and not math.isinf(daily_mb)) else "unbounded"
-    out_csv = os.path.join("scraped_data", f"trip_solution_{country_slug}_{trip_days}days_{usage_tag}.csv")
+        if not selections:
+            print("No feasible trip solution could be constructed.")
+            raise SystemExit(1)
 
-    if not selections:
-        print("No feasible trip solution could be constructed.")
-        raise SystemExit(1)
+        out_csv_written, stats_written = write_solution_files(country_slug, trip_days, daily_mb, selections, stats)
 
-    # Write selections CSV
-    sel_df = pd.DataFrame(selections)
-    sel_df = sel_df[[c for c in [
-        "provider","provider_id","provider_slug","plan_id","plan_title","price",
-        "purchase_count","days_covered","data_delivered_mb","used_mb_for_feasibility",
-        "plan_total_data_mb","validity_days",
-        "effective_validity_days_at_R","effective_validity_days_at_R_trip","effective_cost_per_day_at_R_trip",
-        "promo_used","price_usd_promo","price_usd_base","promo_zero_any","base_zero_any",
-        "cost_total","plan_effective_days_at_R"
-    ] if c in sel_df.columns]]
-    out_csv_written = _safe_write_csv(sel_df, out_csv)
-
-    # Also write a JSON with stats
-    stats_path = os.path.join("scraped_data", f"trip_solution_{country_slug}_{trip_days}days_{usage_tag}.json")
-    stats_written = _safe_write_json({"stats": stats, "selections": selections}, stats_path)
-
-    print("\nTrip solution summary:")
-    print(f"- Feasible: {stats['ok']}")
-    print(f"- Trip days: {stats['trip_days']}")
-    print(f"- Required data (MB): {int(stats['required_data_mb'])}")
-    print(f"- Delivered data (MB): {int(stats['total_data_mb'])}")
-    print(f"- Total cost: ${stats['total_cost']:.2f}")
-    print(f"Saved CSV to: {out_csv_written}")
-    print(f"Saved JSON to: {stats_written}")
+        print("\nTrip solution summary:")
+        print_solution_summary(stats)
+        print(f"- Solved in: {solve_ms:.0f} ms")
+        print(f"Saved CSV to: {out_csv_written}")
+        print(f"Saved JSON to: {stats_written}")
 
+        # Plans stay normalised in memory, so re-solving only recomputes the trip-dependent columns.
+        again = input("\nTry different trip parameters? (y/N): ").strip().lower()
+        if again not in ("y", "yes"):
+            break
+        trip_days, daily_mb = prompt_trip_params()
 
 if __name__ == "__main__":
     main()